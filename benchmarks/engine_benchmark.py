@@ -0,0 +1,484 @@
+"""
+Times the battle engine on a corpus of positions and reports the results as JSON
+
+Run from the root of the project:
+    python -m benchmarks.engine_benchmark --output results.json
+    python -m benchmarks.engine_benchmark --compare baseline.json
+
+With --compare, the benchmarks whose median time or peak memory grew by more than --tolerance
+compared to the baseline are reported and the exit code is 1
+
+Positions can be captured from the debug logs of a bot that played real games:
+    python -m benchmarks.engine_benchmark capture bot.log --category hazards
+"""
+
+import os
+import sys
+import ast
+import json
+import time
+import hashlib
+import argparse
+import platform
+from datetime import datetime
+
+import config
+import constants
+from data.mods.apply_mods import apply_mods
+from showdown.battle import Pokemon
+from showdown.battle_bots.nash_equilibrium.main import BattleBot as NashEquilibriumBattleBot
+from showdown.battle_bots.safest.main import BattleBot as SafestBattleBot
+from showdown.engine import instrumentation
+from showdown.engine.objects import State
+from showdown.engine.objects import StateMutator
+from showdown.engine.evaluate import evaluate
+from showdown.engine.damage_calculator import calculate_damage
+from showdown.engine.find_state_instructions import get_all_state_instructions
+from showdown.engine.find_state_instructions import state_instruction_cache
+from showdown.engine.move_ordering import MoveOrdering
+from showdown.engine.select_best_move import get_payoff_matrix
+from showdown.engine.transposition_table import TranspositionTable
+
+try:
+    import resource
+except ImportError:
+    # not available on windows
+    resource = None
+
+
+POSITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'positions.json')
+
+# the line the bots log before searching a state
+CAPTURED_STATE_PREFIX = "Searching through the state: "
+
+# the settings that change what is searched are part of the results so that results can be compared fairly
+SETTINGS = (
+    'search_depth',
+    'damage_calc_type',
+    'transposition_table_size',
+    'state_instruction_cache_size',
+    'outcome_probability_threshold',
+    'merge_dropped_outcomes',
+    'merge_reordered_outcomes',
+    'move_ordering',
+)
+
+
+def load_corpus(path=POSITIONS_FILE):
+    """Returns the positions file: the pokemon mode that every position is from and the list of positions
+
+    A position has a name, a category, and either a 'state' (a serialized State) or a 'battle'
+    The bots can only be benchmarked on the positions that are battles"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def state_from_dict(state_dict):
+    # JSON has no tuples so they are restored before the state is made
+    state = State.from_dict(state_dict)
+    for side in (state.self, state.opponent):
+        side.wish = tuple(side.wish)
+        for pkmn in [side.active] + list(side.reserve.values()):
+            pkmn.evs = tuple(pkmn.evs)
+    return state
+
+
+def _create_pokemon(pokemon_description):
+    pkmn = Pokemon(pokemon_description['name'], pokemon_description.get('level', 100))
+    for move_name in pokemon_description.get('moves', []):
+        pkmn.add_move(move_name)
+    pkmn.item = pokemon_description.get('item', pkmn.item)
+    pkmn.ability = pokemon_description.get('ability', pkmn.ability)
+    pkmn.hp = round(pkmn.max_hp * pokemon_description.get('hp', 1))
+    pkmn.fainted = pkmn.hp <= 0
+    pkmn.status = pokemon_description.get('status')
+    pkmn.volatile_statuses = list(pokemon_description.get('volatile_statuses', []))
+    pkmn.boosts.update(pokemon_description.get('boosts', {}))
+    return pkmn
+
+
+def create_battle(position, battle_bot_class=SafestBattleBot):
+    """Returns a battle made from the 'battle' of a position, in `config.pokemon_mode`
+
+    A battle is described by its turn and field, and each side's pokemon and side conditions
+    A pokemon is described by its name, level, known moves, item, ability, status, boosts, and hp as a
+    fraction of its maximum hp. Anything that is not given is unknown or the default"""
+    battle_description = position['battle']
+
+    battle = battle_bot_class('battle-{}-{}'.format(config.pokemon_mode, position['name']))
+    battle.battle_type = constants.RANDOM_BATTLE if 'random' in config.pokemon_mode else constants.STANDARD_BATTLE
+    battle.generation = config.pokemon_mode[:4]
+    battle.started = True
+    battle.turn = battle_description.get('turn', 1)
+    battle.weather = battle_description.get('weather')
+    battle.field = battle_description.get('field')
+    battle.trick_room = battle_description.get('trick_room', False)
+
+    for battler, side_description in ((battle.user, battle_description['user']), (battle.opponent, battle_description['opponent'])):
+        battler.active = _create_pokemon(side_description['active'])
+        battler.reserve = [_create_pokemon(p) for p in side_description.get('reserve', [])]
+        battler.side_conditions.update(side_description.get('side_conditions', {}))
+
+    # the position of each of the bot's pokemon in its team, which the bot's decision refers to
+    for index, pkmn in enumerate([battle.user.active] + battle.user.reserve):
+        pkmn.index = index + 1
+
+    return battle
+
+
+def get_state(position):
+    """Returns the state of a position
+
+    A position that is a battle is searched as the bots would search it - from the state of its first
+    battle with the opponent's unknowns filled in"""
+    if 'state' in position:
+        return state_from_dict(position['state'])
+
+    battle = create_battle(position).prepare_battles(join_moves_together=True)[0]
+    return battle.create_state()
+
+
+def capture_states(log_lines):
+    """Returns the states that the bots logged before searching them, without duplicates"""
+    states = []
+    for line in log_lines:
+        _, prefix, state_string = line.partition(CAPTURED_STATE_PREFIX)
+        if not prefix:
+            continue
+        try:
+            state_dict = ast.literal_eval(state_string.strip())
+        except (ValueError, SyntaxError):
+            continue
+        if state_dict not in states:
+            states.append(state_dict)
+    return states
+
+
+def capture_positions(log_path, category, positions_path=POSITIONS_FILE):
+    # adds the states found in a bot's log to the positions - returns the number of positions that were added
+    corpus = load_corpus(positions_path)
+    positions = corpus['positions']
+    known_states = [p['state'] for p in positions if 'state' in p]
+
+    with open(log_path) as f:
+        captured_states = capture_states(f)
+
+    added = 0
+    for state_dict in captured_states:
+        # compared as JSON so that tuples and lists are the same
+        state_dict = json.loads(json.dumps(state_dict))
+        if state_dict in known_states:
+            continue
+        positions.append({
+            'name': '{}-captured-{}'.format(category, len([p for p in positions if p['category'] == category]) + 1),
+            'category': category,
+            'state': state_dict
+        })
+        known_states.append(state_dict)
+        added += 1
+
+    with open(positions_path, 'w') as f:
+        json.dump(corpus, f, indent=2)
+        f.write('\n')
+
+    return added
+
+
+# each benchmark makes the sample of a position: a function taking no arguments that does the work being timed
+# the work is done again from scratch each time the sample is called
+
+
+def instructions_sample(position):
+    # the instructions of every pair of options in the position
+    state = get_state(position)
+    mutator = StateMutator(state)
+    user_options, opponent_options = state.get_all_options()
+
+    def sample():
+        state_instruction_cache.clear()
+        for user_option in user_options:
+            for opponent_option in opponent_options:
+                get_all_state_instructions(mutator, user_option, opponent_option)
+
+    return sample
+
+
+def payoff_matrix_sample(depth):
+    # the search done by the safest bot for a single battle
+    def make_sample(position):
+        state = get_state(position)
+        mutator = StateMutator(state)
+        user_options, opponent_options = state.get_all_options()
+
+        def sample():
+            state_instruction_cache.clear()
+            get_payoff_matrix(
+                mutator,
+                user_options,
+                opponent_options,
+                depth=depth,
+                prune=True,
+                transposition_table=TranspositionTable(config.transposition_table_size),
+                move_ordering=MoveOrdering(config.move_ordering)
+            )
+
+        return sample
+
+    return make_sample
+
+
+def evaluate_sample(position):
+    state = get_state(position)
+    return lambda: evaluate(state)
+
+
+def damage_sample(position):
+    # the damage of every move of both active pokemon
+    state = get_state(position)
+    attacks = [(constants.SELF, m[constants.ID]) for m in state.self.active.moves]
+    attacks += [(constants.OPPONENT, m[constants.ID]) for m in state.opponent.active.moves]
+
+    def sample():
+        for side, move in attacks:
+            calculate_damage(state, side, move, constants.DO_NOTHING_MOVE, calc_type=config.damage_calc_type)
+
+    return sample
+
+
+def bot_sample(battle_bot_class):
+    # a whole decision of a bot, starting from the battle
+    def make_sample(position):
+        if 'battle' not in position:
+            return None
+
+        def sample():
+            state_instruction_cache.clear()
+            create_battle(position, battle_bot_class).find_best_move()
+
+        return sample
+
+    return make_sample
+
+
+# name -> (makes the sample of a position, samples taken for each --repeat, whether it is a search)
+BENCHMARKS = {
+    'get_all_state_instructions': (instructions_sample, 5, False),
+    'get_payoff_matrix_depth_1': (payoff_matrix_sample(1), 3, True),
+    'get_payoff_matrix_depth_2': (payoff_matrix_sample(2), 1, True),
+    'get_payoff_matrix_depth_3': (payoff_matrix_sample(3), 1, True),
+    'evaluate': (evaluate_sample, 200, False),
+    'calculate_damage': (damage_sample, 50, False),
+    'safest_bot': (bot_sample(SafestBattleBot), 1, True),
+    'nash_equilibrium_bot': (bot_sample(NashEquilibriumBattleBot), 1, True),
+}
+
+
+def percentile(values, percent):
+    # the nearest-rank percentile
+    values = sorted(values)
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def get_peak_rss_kb():
+    # the most memory this process has used so far
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macos reports bytes and linux reports kilobytes
+    return peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+
+
+def time_sample(sample, repeat, count_nodes):
+    # returns the time of each call and the number of search nodes of one call
+    # the nodes are counted in a call of their own because counting them slows down the engine
+    nodes = 0
+    if count_nodes:
+        with instrumentation.recording() as record:
+            sample()
+        nodes = record.to_dict()['nodes']
+
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        sample()
+        times.append(time.perf_counter() - start_time)
+
+    return times, nodes
+
+
+def run_benchmark(name, positions, repeat):
+    make_sample, samples_per_repeat, is_search = BENCHMARKS[name]
+
+    times = []
+    nodes = 0
+    searched_nodes = 0
+    position_medians = dict()
+    for position in positions:
+        sample = make_sample(position)
+        if sample is None:
+            continue
+        position_times, position_nodes = time_sample(sample, repeat * samples_per_repeat, is_search)
+        times.extend(position_times)
+        nodes += position_nodes
+        searched_nodes += position_nodes * len(position_times)
+        position_medians[position['name']] = round(percentile(position_times, 50) * 1000, 4)
+
+    if not times:
+        return None, position_medians
+
+    total_time = sum(times)
+    result = {
+        'samples': len(times),
+        'samples_per_second': round(len(times) / total_time, 2),
+        'p50_ms': round(percentile(times, 50) * 1000, 4),
+        'p99_ms': round(percentile(times, 99) * 1000, 4),
+        'mean_ms': round(total_time / len(times) * 1000, 4),
+        'peak_rss_kb': get_peak_rss_kb(),
+    }
+    if is_search:
+        # the nodes of one sample of each position - this only changes when the search itself changes
+        result['nodes'] = nodes
+        result['nodes_per_second'] = round(searched_nodes / total_time, 2)
+
+    return result, position_medians
+
+
+def get_corpus_hash(positions):
+    return hashlib.sha1(json.dumps(positions, sort_keys=True).encode()).hexdigest()
+
+
+def run_benchmarks(positions, benchmark_names, repeat, log=None):
+    # `config.pokemon_mode` must be the mode of the positions and its mods must be applied
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': {'pokemon_mode': config.pokemon_mode, 'positions': len(positions), 'sha1': get_corpus_hash(positions)},
+        'settings': {name: getattr(config, name) for name in SETTINGS},
+        'repeat': repeat,
+        'benchmarks': dict(),
+        'positions': {p['name']: dict() for p in positions},
+    }
+
+    for name in benchmark_names:
+        if log is not None:
+            log("Running {}".format(name))
+        result, position_medians = run_benchmark(name, positions, repeat)
+        if result is None:
+            continue
+        results['benchmarks'][name] = result
+        for position_name, median in position_medians.items():
+            results['positions'][position_name][name] = median
+
+    # the peak of the whole run - the peak of a benchmark includes the benchmarks that ran before it
+    results['peak_rss_kb'] = get_peak_rss_kb()
+    return results
+
+
+def compare_results(results, baseline, tolerance):
+    """Returns the ratio of each measure in `results` to the same measure in `baseline`, and a description of each regression
+
+    A benchmark regressed if its median time is more than `tolerance` times larger than in the baseline
+    The peak memory of the run regressed if it grew by more than `tolerance` and the same benchmarks were run"""
+    differences = dict()
+    regressions = []
+
+    if set(results['benchmarks']) == set(baseline['benchmarks']) and results['peak_rss_kb'] and baseline.get('peak_rss_kb'):
+        differences['peak_rss_kb'] = round(results['peak_rss_kb'] / baseline['peak_rss_kb'], 4)
+        if differences['peak_rss_kb'] > 1 + tolerance:
+            regressions.append("peak_rss_kb: {} -> {} ({}x)".format(baseline['peak_rss_kb'], results['peak_rss_kb'], differences['peak_rss_kb']))
+
+    for name, result in results['benchmarks'].items():
+        baseline_result = baseline['benchmarks'].get(name)
+        if baseline_result is None:
+            continue
+
+        difference = dict()
+        for measure in ('p50_ms', 'p99_ms', 'nodes', 'nodes_per_second'):
+            if result.get(measure) and baseline_result.get(measure):
+                difference[measure] = round(result[measure] / baseline_result[measure], 4)
+        differences[name] = difference
+
+        if difference.get('p50_ms', 1) > 1 + tolerance:
+            regressions.append("{} p50_ms: {} -> {} ({}x)".format(name, baseline_result['p50_ms'], result['p50_ms'], difference['p50_ms']))
+
+    return differences, regressions
+
+
+def get_comparison_warnings(results, baseline):
+    # results are only comparable when the same positions were searched in the same way
+    warnings = []
+    if results['corpus']['sha1'] != baseline['corpus']['sha1']:
+        warnings.append("The positions are not the same as the baseline's positions")
+    for name, value in results['settings'].items():
+        baseline_value = baseline['settings'].get(name)
+        if json.loads(json.dumps(value)) != baseline_value:
+            warnings.append("{} is {} but was {} in the baseline".format(name, value, baseline_value))
+    for name, result in results['benchmarks'].items():
+        baseline_nodes = baseline['benchmarks'].get(name, {}).get('nodes')
+        if baseline_nodes is not None and result.get('nodes') != baseline_nodes:
+            # nodes per second are not comparable when a different number of nodes is searched
+            warnings.append("{} searched {} nodes but searched {} in the baseline".format(name, result['nodes'], baseline_nodes))
+    return warnings
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(description="Times the battle engine on a corpus of positions")
+    subparsers = parser.add_subparsers(dest='command')
+
+    capture_parser = subparsers.add_parser('capture', help="add the states searched in a bot's debug log to the positions")
+    capture_parser.add_argument('log', help="a log written with LOG_LEVEL=DEBUG")
+    capture_parser.add_argument('--category', required=True)
+    capture_parser.add_argument('--positions', default=POSITIONS_FILE)
+
+    parser.add_argument('--positions', default=POSITIONS_FILE)
+    parser.add_argument('--category', action='append', help="only use positions of this category - can be given more than once")
+    parser.add_argument('--benchmark', action='append', choices=list(BENCHMARKS), help="only run this benchmark - can be given more than once")
+    parser.add_argument('--repeat', type=int, default=3, help="a multiplier for the number of samples taken of each position")
+    parser.add_argument('--output', help="write the results to this file instead of stdout")
+    parser.add_argument('--compare', help="the results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="the growth allowed before a benchmark is a regression")
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    args = parse_args(args)
+
+    if args.command == 'capture':
+        added = capture_positions(args.log, args.category, args.positions)
+        print("Added {} positions to {}".format(added, args.positions))
+        return 0
+
+    corpus = load_corpus(args.positions)
+    positions = corpus['positions']
+    if args.category:
+        positions = [p for p in positions if p['category'] in args.category]
+
+    config.pokemon_mode = corpus['pokemon_mode']
+    apply_mods(config.pokemon_mode)
+    results = run_benchmarks(positions, args.benchmark or list(BENCHMARKS), args.repeat, log=lambda m: print(m, file=sys.stderr))
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for warning in get_comparison_warnings(results, baseline):
+            print("Warning: {}".format(warning), file=sys.stderr)
+        results['comparison'], regressions = compare_results(results, baseline, args.tolerance)
+        for regression in regressions:
+            print("Regression: {}".format(regression), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+            f.write('\n')
+    else:
+        print(json.dumps(results, indent=2))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -10,14 +10,34 @@ team_name = None
 pokemon_mode = None
 run_count = None
 user_to_challenge = None
-gambit_exe_path = ""
 greeting_message = 'hf'
 battle_ending_message = 'gg'
 room_name = None
+max_concurrent_battles = 1
 
 use_relative_weights = False
 damage_calc_type = 'average'
 search_depth = 2
+transposition_table_size = 5000
+state_instruction_cache_size = 0
+outcome_probability_threshold = 0.0
+merge_dropped_outcomes = False
+merge_reordered_outcomes = False
+move_ordering = ()
+search_time_budget = None
+search_processes = 1
+engine_processes = 1
+debug_incremental_evaluation = False
+search_instrumentation_file = None
+search_profile_decisions = 0
+smogon_stats_source = None
+opponent_set_samples = 0
+opponent_set_sample_probability = 1.0
+mcts_iterations = 1000
+mcts_selection = 'uct'
+mcts_exploration = 1.4
+mcts_rollout_depth = 0
+mcts_tree_reuse = True
 
 save_replay = False
 
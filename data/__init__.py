@@ -1,19 +1,38 @@
 import os
 import json
 
+from . import read_only
+from .bundle import load_bundle
+from .read_only import freeze
+from .random_battle_set_index import build_random_battle_set_index
+
 PWD = os.path.dirname(os.path.abspath(__file__))
 
 move_json_location = os.path.join(PWD, 'moves.json')
-with open(move_json_location) as f:
-    all_move_json = json.load(f)
-
 pkmn_json_location = os.path.join(PWD, 'pokedex.json')
-with open(pkmn_json_location, 'r') as f:
-    pokedex = json.loads(f.read())
-
 random_battle_set_location = os.path.join(PWD, 'random_battle_sets.json')
-with open(random_battle_set_location, 'r') as f:
-    random_battle_sets = json.load(f)
 
 
+def load_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def build_base_bundle():
+    # move and pokedex records are read-only so that nothing can modify them during a battle
+    return freeze(load_json(move_json_location)), freeze(load_json(pkmn_json_location)), load_json(random_battle_set_location)
+
+
+# the code that builds a bundle is one of its sources so that changing it re-builds the bundle
+bundle_source_code_locations = [os.path.abspath(__file__), os.path.abspath(read_only.__file__)]
+
+all_move_json, pokedex, random_battle_sets = load_bundle(
+    'base',
+    bundle_source_code_locations + [move_json_location, pkmn_json_location, random_battle_set_location],
+    build_base_bundle
+)
+
+# built once here instead of every time a random-battle pokemon's set is looked up
+random_battle_set_index = build_random_battle_set_index(random_battle_sets)
+
 pokemon_sets = random_battle_sets
@@ -0,0 +1,64 @@
+import os
+import pickle
+import hashlib
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+PWD = os.path.dirname(os.path.abspath(__file__))
+
+# pickled copies of the json data are kept here so that they do not need to be parsed every time the bot starts
+# a bundle is re-built whenever the contents of one of its source files change
+BUNDLE_DIRECTORY = os.path.join(PWD, 'bundles')
+
+
+def hash_files(paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def get_bundle_path(name):
+    return os.path.join(BUNDLE_DIRECTORY, '{}.pickle'.format(name))
+
+
+def read_bundle(name, source_hash):
+    # the hash is stored before the data so a stale bundle is found without loading the rest of the file
+    try:
+        with open(get_bundle_path(name), 'rb') as f:
+            if pickle.load(f) != source_hash:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+        return None
+
+
+def write_bundle(name, source_hash, bundle):
+    # written to a temporary file first so another process never reads a partially written bundle
+    path = get_bundle_path(name)
+    temporary_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        os.makedirs(BUNDLE_DIRECTORY, exist_ok=True)
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(source_hash, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(bundle, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+    except OSError as e:
+        logger.debug("Could not save the {} data bundle: {}".format(name, e))
+
+
+def load_bundle(name, source_files, build):
+    """Returns the bundle called `name`
+
+    The saved bundle is used if it was built from the current contents of `source_files`
+    Otherwise the bundle is created by calling `build()` and saved for next time"""
+    source_hash = hash_files(source_files)
+    bundle = read_bundle(name, source_hash)
+    if bundle is None:
+        logger.debug("Building the {} data bundle".format(name))
+        bundle = build()
+        write_bundle(name, source_hash, bundle)
+    return bundle
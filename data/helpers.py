@@ -2,8 +2,9 @@ import constants
 
 import data
 from data import pokedex
-from data.parse_smogon_stats import get_smogon_stats_file_name
-from data.parse_smogon_stats import get_pokemon_information
+from data.parse_smogon_stats import filter_pokemon_information
+from data.smogon_stats import get_smogon_stats
+from data.smogon_stats import async_get_smogon_stats
 
 from data.parse_smogon_stats import MOVES_STRING
 from data.parse_smogon_stats import SPREADS_STRING
@@ -34,6 +35,9 @@ PASS_ABILITIES = {
 
 MAX_STANDARD_BATTLE_MOVES = 6
 
+# the usage stats of a format without its own are combined from these, lower tiers first
+ALL_STANDARD_BATTLE_MODES = ["gen8lc", "gen8pu", "gen8nu", "gen8ru", "gen8uu", "gen8ou", "gen8ubers"]
+
 
 def get_pokemon_sets(pkmn):
     try:
@@ -48,65 +52,49 @@ def get_pokemon_sets(pkmn):
             return data.pokemon_sets[new_name]
 
 
-def get_all_possible_moves_for_random_battle(pkmn_name, known_moves):
+def get_random_battle_set_index(pkmn_name):
     try:
-        sets = data.random_battle_sets[pkmn_name]
+        return data.random_battle_set_index[pkmn_name]
     except KeyError:
         logger.warning("{} not in the random-battle sets lookup".format(pkmn_name))
-        return []
+        return None
 
-    new_moves = list()
-    for key in sets[constants.SETS]:
-        this_set_moves = key.split('|')
-        if all(m in this_set_moves for m in known_moves):
-            for m in filter(lambda x: x not in new_moves + known_moves, this_set_moves):
-                new_moves.append(m)
 
-    if not new_moves:
-        for m, _ in sets[constants.MOVES]:
-            if m not in known_moves:
-                new_moves.append(m)
+def get_all_possible_moves_for_random_battle(pkmn_name, known_moves):
+    set_index = get_random_battle_set_index(pkmn_name)
+    if set_index is None:
+        return []
 
-    return new_moves
+    return set_index.get_possible_moves(known_moves)
 
 
 def get_most_likely_ability_for_random_battle(pkmn_name):
-    try:
-        sets = data.random_battle_sets[pkmn_name]
-    except KeyError:
-        logger.warning("{} not in the random-battle sets lookup".format(pkmn_name))
+    set_index = get_random_battle_set_index(pkmn_name)
+    if set_index is None:
         return None
 
-    abilities = sets[constants.ABILITIES]
-    if not abilities:
-        logger.warning("{} has no abilities in the random-battle lookup!")
+    if not set_index.abilities:
+        logger.warning("{} has no abilities in the random-battle lookup!".format(pkmn_name))
         return None
 
-    best_ability = None
-    best_value = float('-inf')
-    for ability, value in sorted(abilities, key=lambda x: x[1], reverse=True):
-        if value > best_value and ability not in PASS_ABILITIES:
-            best_value = value
-            best_ability = ability
-
-    return best_ability
+    return set_index.get_most_likely_ability(pass_abilities=PASS_ABILITIES)
 
 
 def get_most_likely_item_for_random_battle(pkmn_name):
-    try:
-        sets = data.random_battle_sets[pkmn_name]
-    except KeyError:
-        logger.warning("{} not in the random-battle sets lookup".format(pkmn_name))
+    set_index = get_random_battle_set_index(pkmn_name)
+    if set_index is None:
         return None
 
-    best_item = None
-    best_value = float('-inf')
-    for item, value in sets[constants.ITEMS]:
-        if value > best_value and item not in PASS_ITEMS:
-            best_item = item
-            best_value = value
+    return set_index.get_most_likely_item(pass_items=PASS_ITEMS)
 
-    return best_item
+
+def get_random_battle_move_candidates(pkmn_name, known_moves):
+    """Returns the (moves, weight) of every random-battle set that has all of `known_moves`"""
+    set_index = get_random_battle_set_index(pkmn_name)
+    if set_index is None:
+        return []
+
+    return set_index.get_move_candidates(known_moves)
 
 
 def get_all_likely_moves(pkmn_name, known_moves):
@@ -163,31 +151,35 @@ def get_most_likely_spread(pkmn_name):
     return sets[SPREADS_STRING][0]
 
 
-def get_standard_battle_sets(battle_mode, pokemon_names=None):
+def get_standard_battle_modes(battle_mode):
     if any(battle_mode.endswith(s) for s in constants.SMOGON_HAS_STATS_PAGE_SUFFIXES):
-        smogon_stats_file_name = get_smogon_stats_file_name(battle_mode)
-        logger.debug("Making HTTP request to {} for usage stats".format(smogon_stats_file_name))
-        smogon_usage_data = get_pokemon_information(smogon_stats_file_name, pkmn_names=pokemon_names)
+        return [battle_mode]
     else:
         # use ALL data for a mode like battle-factory
-        logger.debug("Making HTTP request for ALL usage stats\nplease wait...")
-        ubers_data = get_pokemon_information(get_smogon_stats_file_name("gen8ubers"), pkmn_names=pokemon_names)
-        ou_data = get_pokemon_information(get_smogon_stats_file_name("gen8ou"), pkmn_names=pokemon_names)
-        uu_data = get_pokemon_information(get_smogon_stats_file_name("gen8uu"), pkmn_names=pokemon_names)
-        ru_data = get_pokemon_information(get_smogon_stats_file_name("gen8ru"), pkmn_names=pokemon_names)
-        nu_data = get_pokemon_information(get_smogon_stats_file_name("gen8nu"), pkmn_names=pokemon_names)
-        pu_data = get_pokemon_information(get_smogon_stats_file_name("gen8pu"), pkmn_names=pokemon_names)
-        lc_data = get_pokemon_information(get_smogon_stats_file_name("gen8lc"), pkmn_names=pokemon_names)
-
-        smogon_usage_data = lc_data
-        for pkmn_data in [pu_data, nu_data, ru_data, uu_data, ou_data, ubers_data]:
-            for pkmn_name in pkmn_data:
-                if pkmn_name not in smogon_usage_data:
-                    smogon_usage_data[pkmn_name] = pkmn_data[pkmn_name]
+        return ALL_STANDARD_BATTLE_MODES
+
+
+def combine_standard_battle_sets(all_smogon_stats, pokemon_names=None):
+    # a pokemon's sets come from the first mode that has it
+    smogon_usage_data = dict()
+    for smogon_stats in all_smogon_stats:
+        for pkmn_name, pkmn_data in filter_pokemon_information(smogon_stats, pkmn_names=pokemon_names).items():
+            if pkmn_name not in smogon_usage_data:
+                smogon_usage_data[pkmn_name] = pkmn_data
 
     return smogon_usage_data
 
 
+def get_standard_battle_sets(battle_mode, pokemon_names=None):
+    all_smogon_stats = [get_smogon_stats(m) for m in get_standard_battle_modes(battle_mode)]
+    return combine_standard_battle_sets(all_smogon_stats, pokemon_names=pokemon_names)
+
+
+async def async_get_standard_battle_sets(battle_mode, pokemon_names=None):
+    all_smogon_stats = await async_get_smogon_stats(get_standard_battle_modes(battle_mode))
+    return combine_standard_battle_sets(all_smogon_stats, pokemon_names=pokemon_names)
+
+
 def get_mega_pkmn_name(pkmn_name):
     mega_name = "{}mega".format(pkmn_name)
     if mega_name in pokedex:
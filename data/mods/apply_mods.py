@@ -1,10 +1,14 @@
 import os
-import json
 import logging
+from functools import partial
+
 import constants
 import data
 from data import all_move_json
 from data import pokedex
+from data.bundle import load_bundle
+from data.read_only import freeze
+from data.random_battle_set_index import build_random_battle_set_index
 from showdown.engine import damage_calculator
 
 logger = logging.getLogger(__name__)
@@ -34,90 +38,120 @@ PRE_PHYSICAL_SPECIAL_SPLIT_CATEGORY_LOOKUP = {
 }
 
 
-def apply_move_mods(gen_number):
+def get_move_mod_locations(gen_number):
+    return ["{}/gen{}_move_mods.json".format(PWD, gen_number) for gen_number in reversed(range(gen_number, CURRENT_GEN))]
+
+
+def get_pokedex_mod_locations(gen_number):
+    # no pokedex mods in gen3 (apparently)
+    if gen_number == 3:
+        return []
+    return ["{}/gen{}_pokedex_mods.json".format(PWD, gen_number) for gen_number in reversed(range(gen_number, CURRENT_GEN))]
+
+
+def get_random_battle_set_location(use_gen7_sets):
+    if use_gen7_sets:
+        return "{}/random_battle_sets_gen7.json".format(PWD)
+    return data.random_battle_set_location
+
+
+def apply_move_mods(gen_number, move_json):
     logger.debug("Applying move mod for gen {}".format(gen_number))
-    for gen_number in reversed(range(gen_number, CURRENT_GEN)):
-        with open("{}/gen{}_move_mods.json".format(PWD, gen_number), 'r') as f:
-            move_mods = json.load(f)
+    for location in get_move_mod_locations(gen_number):
+        move_mods = data.load_json(location)
         for move, modifications in move_mods.items():
-            all_move_json[move].update(modifications)
+            move_json[move].update(modifications)
 
 
-def apply_pokedex_mods(gen_number):
+def apply_pokedex_mods(gen_number, pokedex_json):
     logger.debug("Applying dex mod for gen {}".format(gen_number))
-    for gen_number in reversed(range(gen_number, CURRENT_GEN)):
-        with open("{}/gen{}_pokedex_mods.json".format(PWD, gen_number), 'r') as f:
-            pokedex_mods = json.load(f)
+    for location in get_pokedex_mod_locations(gen_number):
+        pokedex_mods = data.load_json(location)
         for pokemon, modifications in pokedex_mods.items():
-            pokedex[pokemon].update(modifications)
+            pokedex_json[pokemon].update(modifications)
 
 
-def set_random_battle_sets(gen_number):
-    logger.debug("Setting random battle sets for gen {}".format(gen_number))
-    with open("{}/random_battle_sets_gen{}.json".format(PWD, gen_number), 'r') as f:
-        data.random_battle_sets = json.load(f)
+def undo_physical_special_split(move_json):
+    for move_name, move_data in move_json.items():
+        if move_data[constants.CATEGORY] in constants.DAMAGING_CATEGORIES:
+            try:
+                move_data[constants.CATEGORY] = PRE_PHYSICAL_SPECIAL_SPLIT_CATEGORY_LOOKUP[move_data[constants.TYPE]]
+            except KeyError:
+                pass
 
 
-def apply_gen_3_mods():
-    # no pokedex mods in gen3 (apparently)
-    constants.HIDDEN_POWER_TYPE_STRING_INDEX = -2
-    constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.HIDDEN_POWER_RESERVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(3)
-    undo_physical_special_split()
+def get_mod_generation(game_mode):
+    # the generation whose mods are applied, or None if the current generation's data is used
+    for gen_number in range(3, CURRENT_GEN):
+        if "gen{}".format(gen_number) in game_mode:
+            return gen_number
+    return None
 
 
-def apply_gen_4_mods():
-    constants.HIDDEN_POWER_TYPE_STRING_INDEX = -2
-    constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.HIDDEN_POWER_RESERVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(4)
-    apply_pokedex_mods(4)
+def uses_gen7_random_battle_sets(game_mode):
+    return str(CURRENT_GEN) not in game_mode[:4]
 
 
-def apply_gen_5_mods():
-    constants.HIDDEN_POWER_TYPE_STRING_INDEX = -2
-    constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.HIDDEN_POWER_RESERVE_MOVE_BASE_DAMAGE_STRING = "70"
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(5)
-    apply_pokedex_mods(5)
+def build_generation_data(gen_number, use_gen7_sets):
+    # built from the original json files because the loaded records are read-only
+    move_json = data.load_json(data.move_json_location)
+    pokedex_json = data.load_json(data.pkmn_json_location)
+    if gen_number is not None:
+        apply_move_mods(gen_number, move_json)
+        apply_pokedex_mods(gen_number, pokedex_json)
+        if gen_number == 3:
+            undo_physical_special_split(move_json)
 
+    logger.debug("Setting random battle sets for gen {}".format(7 if use_gen7_sets else CURRENT_GEN))
+    random_battle_sets = data.load_json(get_random_battle_set_location(use_gen7_sets))
 
-def apply_gen_6_mods():
-    constants.REQUEST_DICT_ABILITY = "baseAbility"
-    apply_move_mods(6)
-    apply_pokedex_mods(6)
+    return freeze(move_json), freeze(pokedex_json), random_battle_sets
 
 
-def apply_gen_7_mods():
-    apply_move_mods(7)
-    apply_pokedex_mods(7)
+def load_generation_data(game_mode):
+    """Returns the (moves, pokedex, random battle sets) used in `game_mode` with every mod already applied
 
+    The data is saved as a bundle the first time it is built for a generation"""
+    gen_number = get_mod_generation(game_mode)
+    use_gen7_sets = uses_gen7_random_battle_sets(game_mode)
 
-def undo_physical_special_split():
-    for move_name, move_data in all_move_json.items():
-        if move_data[constants.CATEGORY] in constants.DAMAGING_CATEGORIES:
-            try:
-                move_data[constants.CATEGORY] = PRE_PHYSICAL_SPECIAL_SPLIT_CATEGORY_LOOKUP[move_data[constants.TYPE]]
-            except KeyError:
-                pass
+    source_files = data.bundle_source_code_locations + [os.path.abspath(__file__), data.move_json_location, data.pkmn_json_location, get_random_battle_set_location(use_gen7_sets)]
+    if gen_number is not None:
+        source_files += get_move_mod_locations(gen_number) + get_pokedex_mod_locations(gen_number)
 
+    name = "gen{}".format(gen_number or CURRENT_GEN)
+    if use_gen7_sets:
+        name += "_gen7_random_battle_sets"
 
-def apply_mods(game_mode):
-    if "gen3" in game_mode:
-        apply_gen_3_mods()
-    if "gen4" in game_mode:
-        apply_gen_4_mods()
-    elif "gen5" in game_mode:
-        apply_gen_5_mods()
-    elif "gen6" in game_mode:
-        apply_gen_6_mods()
-    elif "gen7" in game_mode:
-        apply_gen_7_mods()
-
-    if str(CURRENT_GEN) not in game_mode[:4]:
-        set_random_battle_sets(7)  # use random battle sets from gen7 if we are not in gen8
+    return load_bundle(name, source_files, partial(build_generation_data, gen_number, use_gen7_sets))
+
+
+def apply_constant_mods(gen_number, use_gen7_sets):
+    if gen_number is not None and gen_number <= 5:
+        constants.HIDDEN_POWER_TYPE_STRING_INDEX = -2
+        constants.HIDDEN_POWER_ACTIVE_MOVE_BASE_DAMAGE_STRING = "70"
+        constants.HIDDEN_POWER_RESERVE_MOVE_BASE_DAMAGE_STRING = "70"
+    if gen_number is not None and gen_number <= 6:
+        constants.REQUEST_DICT_ABILITY = "baseAbility"
+    if use_gen7_sets:
         damage_calculator.TERRAIN_DAMAGE_BOOST = 1.5  # terrain gave a 1.5x damage boost prior to gen8
+
+
+def apply_mods(game_mode):
+    gen_number = get_mod_generation(game_mode)
+    use_gen7_sets = uses_gen7_random_battle_sets(game_mode)
+    apply_constant_mods(gen_number, use_gen7_sets)
+
+    if gen_number is None and not use_gen7_sets:
+        return
+
+    move_json, pokedex_json, random_battle_sets = load_generation_data(game_mode)
+
+    # the move and pokedex tables are read-only but other modules hold references to them
+    # so their contents are replaced using the methods of `dict`
+    dict.clear(all_move_json)
+    dict.update(all_move_json, move_json)
+    dict.clear(pokedex)
+    dict.update(pokedex, pokedex_json)
+    data.random_battle_sets = random_battle_sets
+    data.random_battle_set_index = build_random_battle_set_index(random_battle_sets)
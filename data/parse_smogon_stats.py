@@ -1,10 +1,7 @@
 import logging
-import ntpath
 from datetime import datetime
 from dateutil import relativedelta
 
-import requests
-
 from showdown.engine.helpers import spreads_are_alike
 from showdown.engine.helpers import normalize_name
 
@@ -17,24 +14,33 @@ SPREADS_STRING = "spreads"
 ABILITY_STRING = "abilities"
 
 
-def get_smogon_stats_file_name(game_mode, month_delta=1):
-    """
-    Gets the smogon stats url based on the game mode
-    Uses the previous-month's statistics
-    """
+SMOGON_STATS_URL = "https://www.smogon.com/stats"
+
 
+def get_smogon_stats_game_mode(game_mode):
     # blitz comes and goes - use the non-blitz version
     if game_mode.endswith('blitz'):
         game_mode = game_mode[:-5]
+    return game_mode
 
-    # always use the `-0` file - the higher ladder is for noobs
-    smogon_url = "https://www.smogon.com/stats/{}-{}/chaos/{}-0.json"
 
+def get_smogon_stats_month(month_delta=1):
     previous_month = datetime.now() - relativedelta.relativedelta(months=month_delta)
-    year = previous_month.year
-    month = "{:02d}".format(previous_month.month)
+    return "{}-{:02d}".format(previous_month.year, previous_month.month)
 
-    return smogon_url.format(year, month, game_mode)
+
+def get_smogon_stats_file_name(game_mode, month_delta=1, stats_url=SMOGON_STATS_URL):
+    """
+    Gets the smogon stats url based on the game mode
+    Uses the previous-month's statistics
+    """
+
+    # always use the `-0` file - the higher ladder is for noobs
+    return "{}/{}/chaos/{}-0.json".format(
+        stats_url,
+        get_smogon_stats_month(month_delta),
+        get_smogon_stats_game_mode(game_mode)
+    )
 
 
 def pokemon_is_similar(normalized_name, list_of_pkmn_names):
@@ -44,26 +50,27 @@ def pokemon_is_similar(normalized_name, list_of_pkmn_names):
     )
 
 
-def get_pokemon_information(smogon_stats_url, pkmn_names=None):
-    r = requests.get(smogon_stats_url)
-    if r.status_code == 404:
-        r = requests.get(get_smogon_stats_file_name(ntpath.basename(smogon_stats_url.replace('-0.json', '')), month_delta=2))
+def filter_pokemon_information(pokemon_information, pkmn_names=None):
+    # if `pkmn_names` is provided, only keep data on pkmn in that list
+    if not pkmn_names:
+        return dict(pokemon_information)
 
-    infos = r.json()['data']
+    final_infos = {}
+    for normalized_name, pkmn_information in pokemon_information.items():
+        if normalized_name in pkmn_names or pokemon_is_similar(normalized_name, pkmn_names):
+            logger.debug("Adding {} to sets lookup for this battle".format(normalized_name))
+            final_infos[normalized_name] = pkmn_information
+
+    return final_infos
+
+
+def parse_pokemon_information(infos):
+    """Converts the `data` of a smogon chaos stats file into the sets lookup used by the bot
+    Only the spreads, items, moves and abilities of each pokemon are kept"""
     final_infos = {}
     for pkmn_name, pkmn_information in infos.items():
         normalized_name = normalize_name(pkmn_name)
 
-        # if `pkmn_names` is provided, only find data on pkmn in that list
-        if (
-            pkmn_names and
-            normalized_name not in pkmn_names and
-            not pokemon_is_similar(normalized_name, pkmn_names)
-        ):
-            continue
-        else:
-            logger.debug("Adding {} to sets lookup for this battle".format(normalized_name))
-
         spreads = []
         items = []
         moves = []
@@ -0,0 +1,96 @@
+import constants
+
+
+class RandomBattleSetIndex:
+    """The random-battle sets of one species, arranged so that they can be queried with bitmasks
+
+    Every move the species can have is given a bit and each set is the mask of its moves
+    Items and abilities are not linked to a set in the data so they are kept as tables sorted by frequency"""
+
+    __slots__ = ('move_bits', 'moves', 'sets', 'set_moves', 'moves_by_frequency', 'abilities', 'items')
+
+    def __init__(self, pkmn_sets):
+        self.move_bits = dict()
+        self.moves = list()
+        self.sets = list()
+
+        # the (move, bit) of each set's moves in the order they are listed in the set
+        self.set_moves = dict()
+
+        for key, weight in pkmn_sets[constants.SETS].items():
+            mask = 0
+            moves = key.split('|')
+            for move in moves:
+                if move not in self.move_bits:
+                    self.move_bits[move] = 1 << len(self.moves)
+                    self.moves.append(move)
+                mask |= self.move_bits[move]
+            self.sets.append((mask, weight))
+            self.set_moves[mask] = tuple((m, self.move_bits[m]) for m in moves)
+
+        self.moves_by_frequency = tuple(m for m, _ in pkmn_sets[constants.MOVES])
+        self.abilities = tuple(sorted((tuple(a) for a in pkmn_sets[constants.ABILITIES]), key=lambda x: x[1], reverse=True))
+        self.items = tuple(sorted((tuple(i) for i in pkmn_sets[constants.ITEMS]), key=lambda x: x[1], reverse=True))
+
+    def get_moves_mask(self, moves):
+        # None if one of the moves is not in any set
+        mask = 0
+        for move in moves:
+            try:
+                mask |= self.move_bits[move]
+            except KeyError:
+                return None
+        return mask
+
+    def get_moves(self, mask):
+        return [m for i, m in enumerate(self.moves) if mask >> i & 1]
+
+    def get_consistent_sets(self, known_moves):
+        """Returns the (mask, weight) of every set that has all of `known_moves`"""
+        known_mask = self.get_moves_mask(known_moves)
+        if known_mask is None:
+            return []
+        return [(mask, weight) for mask, weight in self.sets if mask & known_mask == known_mask]
+
+    def get_possible_moves(self, known_moves):
+        """Returns the moves of every set consistent with `known_moves` that are not already known
+        If no set is consistent, every move the species can have is possible"""
+        # moves are listed in the order they first appear in the consistent sets
+        new_moves = list()
+        seen_mask = self.get_moves_mask(m for m in known_moves if m in self.move_bits)
+        for mask, _ in self.get_consistent_sets(known_moves):
+            if mask & ~seen_mask:
+                for move, bit in self.set_moves[mask]:
+                    if not seen_mask & bit:
+                        new_moves.append(move)
+                        seen_mask |= bit
+
+        if new_moves:
+            return new_moves
+
+        return [m for m in self.moves_by_frequency if m not in known_moves]
+
+    def get_most_likely_ability(self, pass_abilities=()):
+        for ability, _ in self.abilities:
+            if ability not in pass_abilities:
+                return ability
+        return None
+
+    def get_most_likely_item(self, pass_items=()):
+        for item, _ in self.items:
+            if item not in pass_items:
+                return item
+        return None
+
+    def get_move_candidates(self, known_moves):
+        """Returns the (moves, weight) of every set consistent with `known_moves`
+        The weights add up to 1"""
+        consistent_sets = self.get_consistent_sets(known_moves)
+        total_weight = sum(weight for _, weight in consistent_sets)
+        if not total_weight:
+            return []
+        return [(self.get_moves(mask), weight / total_weight) for mask, weight in consistent_sets]
+
+
+def build_random_battle_set_index(random_battle_sets):
+    return {pkmn_name: RandomBattleSetIndex(pkmn_sets) for pkmn_name, pkmn_sets in random_battle_sets.items()}
@@ -0,0 +1,38 @@
+class ReadOnlyDict(dict):
+    """A dictionary that raises TypeError when it is modified
+
+    `copy()` returns a regular dictionary so a record can be changed by copying it first"""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("{} cannot be modified".format(type(self).__name__))
+
+    __setitem__ = _read_only
+    __delitem__ = _read_only
+    __ior__ = _read_only
+    clear = _read_only
+    pop = _read_only
+    popitem = _read_only
+    setdefault = _read_only
+    update = _read_only
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # every value is also read-only so a copy can share them
+        return self
+
+
+def freeze(value):
+    # dictionaries become ReadOnlyDicts and lists become tuples
+    if isinstance(value, dict):
+        return ReadOnlyDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
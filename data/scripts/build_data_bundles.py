@@ -0,0 +1,16 @@
+"""
+Builds the data bundle of every generation ahead of time so that no process has to build one when it starts
+A bundle is re-built automatically when its source files change, so running this is optional
+
+Run from the root of the project:
+    python -m data.scripts.build_data_bundles
+"""
+
+from data.mods.apply_mods import CURRENT_GEN
+from data.mods.apply_mods import load_generation_data
+
+
+if __name__ == '__main__':
+    # the current generation uses the base bundle that is built when `data` is imported
+    for gen_number in range(3, CURRENT_GEN):
+        load_generation_data("gen{}".format(gen_number))
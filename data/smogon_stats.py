@@ -0,0 +1,157 @@
+import os
+import json
+import asyncio
+import logging
+
+import requests
+
+import config
+
+from . import parse_smogon_stats
+from .bundle import hash_files
+from .bundle import read_bundle
+from .bundle import write_bundle
+from .parse_smogon_stats import SMOGON_STATS_URL
+from .parse_smogon_stats import get_smogon_stats_game_mode
+from .parse_smogon_stats import get_smogon_stats_month
+from .parse_smogon_stats import parse_pokemon_information
+
+
+logger = logging.getLogger(__name__)
+
+
+# stats published for a month never change, so the parsed stats are saved as a bundle named after the format and month
+# the bundle is re-built if the code that parses the stats or the place they come from changes
+SMOGON_STATS_BUNDLE_NAME = "smogon_stats_{}_{}"
+
+# the most recent month's stats are not published for the first few days of a month
+# the month before that is used until they are
+SMOGON_STATS_MONTH_DELTAS = (1, 2)
+
+# stats loaded by this process keyed by (source location, format, month)
+# a month that is not available is kept as None so it is not requested again
+_loaded_stats = dict()
+
+_parser_hash = None
+
+
+class SmogonStatsNotFoundError(Exception):
+    pass
+
+
+class SmogonStatsWebsite:
+    """Requests the chaos stats files from smogon.com, or a website with the same layout"""
+
+    def __init__(self, url=SMOGON_STATS_URL):
+        self.location = url.rstrip('/')
+
+    def fetch(self, game_mode, month):
+        # always use the `-0` file - the higher ladder is for noobs
+        url = "{}/{}/chaos/{}-0.json".format(self.location, month, game_mode)
+        logger.debug("Making HTTP request to {} for usage stats".format(url))
+        r = requests.get(url)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.json()['data']
+
+
+class SmogonStatsDirectory:
+    """Reads the chaos stats files from a local directory
+
+    A file is looked for at `<month>/chaos/<format>-0.json` like the website,
+    then at `<format>-0.json` for stats that are used for every month"""
+
+    def __init__(self, directory):
+        self.location = os.path.abspath(directory)
+
+    def fetch(self, game_mode, month):
+        file_name = "{}-0.json".format(game_mode)
+        for path in [os.path.join(self.location, month, 'chaos', file_name), os.path.join(self.location, file_name)]:
+            if os.path.isfile(path):
+                logger.debug("Reading usage stats from {}".format(path))
+                with open(path, 'r') as f:
+                    return json.load(f)['data']
+        return None
+
+
+class SmogonStatsFile:
+    """Reads a single chaos stats file that is used for every format and month"""
+
+    def __init__(self, path):
+        self.location = os.path.abspath(path)
+
+    def fetch(self, game_mode, month):
+        logger.debug("Reading usage stats from {}".format(self.location))
+        with open(self.location, 'r') as f:
+            return json.load(f)['data']
+
+
+def get_smogon_stats_source(location=None):
+    """Returns the source for `location`: a website's url, a directory or a single file
+    smogon.com is used when no location is given"""
+    if not location:
+        return SmogonStatsWebsite()
+    elif location.startswith('http://') or location.startswith('https://'):
+        return SmogonStatsWebsite(location)
+    elif os.path.isdir(location):
+        return SmogonStatsDirectory(location)
+    elif os.path.isfile(location):
+        return SmogonStatsFile(location)
+    else:
+        raise ValueError("Smogon stats source does not exist: {}".format(location))
+
+
+def get_parser_hash():
+    global _parser_hash
+    if _parser_hash is None:
+        _parser_hash = hash_files([os.path.abspath(parse_smogon_stats.__file__)])
+    return _parser_hash
+
+
+def read_or_fetch_smogon_stats(game_mode, month, source):
+    name = SMOGON_STATS_BUNDLE_NAME.format(game_mode, month)
+    bundle_hash = (get_parser_hash(), source.location)
+
+    stats = read_bundle(name, bundle_hash)
+    if stats is None:
+        infos = source.fetch(game_mode, month)
+        if infos is None:
+            logger.debug("No usage stats for {} in {}".format(game_mode, month))
+            return None
+        stats = parse_pokemon_information(infos)
+        write_bundle(name, bundle_hash, stats)
+
+    return stats
+
+
+def load_smogon_stats(game_mode, month, source):
+    key = (source.location, game_mode, month)
+    if key not in _loaded_stats:
+        _loaded_stats[key] = read_or_fetch_smogon_stats(game_mode, month, source)
+    return _loaded_stats[key]
+
+
+def get_smogon_stats(game_mode, source=None):
+    """Returns the parsed usage stats of every pokemon in `game_mode` from the most recent month that has them
+    The stats come from `source`, or the one given by `config.smogon_stats_source`"""
+    source = source or get_smogon_stats_source(config.smogon_stats_source)
+    game_mode = get_smogon_stats_game_mode(game_mode)
+
+    for month_delta in SMOGON_STATS_MONTH_DELTAS:
+        stats = load_smogon_stats(game_mode, get_smogon_stats_month(month_delta), source)
+        if stats is not None:
+            return stats
+
+    raise SmogonStatsNotFoundError("No usage stats found for {}".format(game_mode))
+
+
+async def async_get_smogon_stats(game_modes, source=None):
+    """Returns the usage stats of each of `game_modes`
+    They are loaded at the same time in threads so that other battles are not blocked"""
+    source = source or get_smogon_stats_source(config.smogon_stats_source)
+    loop = asyncio.get_event_loop()
+    return await asyncio.gather(*[
+        loop.run_in_executor(None, get_smogon_stats, game_mode, source)
+        for game_mode in game_modes
+    ])
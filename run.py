@@ -1,6 +1,4 @@
 import asyncio
-import json
-from copy import deepcopy
 
 from environs import Env
 
@@ -11,10 +9,12 @@ import logging
 
 from teams import load_team
 from showdown.run_battle import pokemon_battle
+from showdown.engine_pool import start_engine_pool
+from showdown.engine_pool import shutdown_engine_pool
+from showdown.engine.parallel_search import shutdown_search_pool
 from showdown.websocket_client import PSWebsocketClient
+from showdown.websocket_client import MessageRouter
 
-from data import all_move_json
-from data import pokedex
 from data.mods.apply_mods import apply_mods
 
 
@@ -28,8 +28,28 @@ def parse_configs():
     config.battle_bot_module = env("BATTLE_BOT", 'safest')
     config.save_replay = env.bool("SAVE_REPLAY", config.save_replay)
     config.use_relative_weights = env.bool("USE_RELATIVE_WEIGHTS", config.use_relative_weights)
-    config.gambit_exe_path = env("GAMBIT_PATH", config.gambit_exe_path)
     config.search_depth = int(env("MAX_SEARCH_DEPTH", config.search_depth))
+    config.transposition_table_size = int(env("TRANSPOSITION_TABLE_SIZE", config.transposition_table_size))
+    config.state_instruction_cache_size = int(env("STATE_INSTRUCTION_CACHE_SIZE", config.state_instruction_cache_size))
+    config.outcome_probability_threshold = env.float("OUTCOME_PROBABILITY_THRESHOLD", config.outcome_probability_threshold)
+    config.merge_dropped_outcomes = env.bool("MERGE_DROPPED_OUTCOMES", config.merge_dropped_outcomes)
+    config.merge_reordered_outcomes = env.bool("MERGE_REORDERED_OUTCOMES", config.merge_reordered_outcomes)
+    config.move_ordering = [h.strip() for h in env.list("MOVE_ORDERING", config.move_ordering)]
+    config.search_time_budget = env.float("SEARCH_TIME_BUDGET", config.search_time_budget)
+    config.search_processes = int(env("SEARCH_PROCESSES", config.search_processes))
+    config.engine_processes = int(env("ENGINE_PROCESSES", config.engine_processes))
+    config.debug_incremental_evaluation = env.bool("DEBUG_INCREMENTAL_EVALUATION", config.debug_incremental_evaluation)
+    config.search_instrumentation_file = env("SEARCH_INSTRUMENTATION_FILE", config.search_instrumentation_file)
+    config.search_profile_decisions = int(env("SEARCH_PROFILE_DECISIONS", config.search_profile_decisions))
+    config.opponent_set_samples = int(env("OPPONENT_SET_SAMPLES", config.opponent_set_samples))
+    config.opponent_set_sample_probability = env.float("OPPONENT_SET_SAMPLE_PROBABILITY", config.opponent_set_sample_probability)
+    config.smogon_stats_source = env("SMOGON_STATS_SOURCE", config.smogon_stats_source)
+    config.mcts_iterations = int(env("MCTS_ITERATIONS", config.mcts_iterations))
+    config.mcts_selection = env("MCTS_SELECTION", config.mcts_selection)
+    config.mcts_exploration = env.float("MCTS_EXPLORATION", config.mcts_exploration)
+    config.mcts_rollout_depth = int(env("MCTS_ROLLOUT_DEPTH", config.mcts_rollout_depth))
+    config.mcts_tree_reuse = env.bool("MCTS_TREE_REUSE", config.mcts_tree_reuse)
+    config.max_concurrent_battles = int(env("MAX_CONCURRENT_BATTLES", config.max_concurrent_battles))
     config.greeting_message = env("GREETING_MESSAGE", config.greeting_message)
     config.battle_ending_message = env("BATTLE_OVER_MESSAGE", config.battle_ending_message)
     config.websocket_uri = env("WEBSOCKET_URI", "sim.smogon.com:8000")
@@ -46,24 +66,18 @@ def parse_configs():
     init_logging(env("LOG_LEVEL", "DEBUG"))
 
 
-def check_dictionaries_are_unmodified(original_pokedex, original_move_json):
-    # The bot should not modify the data dictionaries
-    # This is a "just-in-case" check to make sure and will stop the bot if it mutates either of them
-    if original_move_json != all_move_json:
-        logger.critical("Move JSON changed!\nDumping modified version to `modified_moves.json`")
-        with open("modified_moves.json", 'w') as f:
-            json.dump(all_move_json, f, indent=4)
-        exit(1)
+async def find_battle(lobby, router):
+    team = load_team(config.team_name)
+    if config.bot_mode == constants.CHALLENGE_USER:
+        await lobby.challenge_user(config.user_to_challenge, config.pokemon_mode, team)
+    elif config.bot_mode == constants.ACCEPT_CHALLENGE:
+        await lobby.accept_challenge(config.pokemon_mode, team, config.room_name)
+    elif config.bot_mode == constants.SEARCH_LADDER:
+        await lobby.search_for_match(config.pokemon_mode, team)
     else:
-        logger.debug("Move JSON unmodified!")
+        raise ValueError("Invalid Bot Mode")
 
-    if original_pokedex != pokedex:
-        logger.critical("Pokedex JSON changed!\nDumping modified version to `modified_pokedex.json`")
-        with open("modified_pokedex.json", 'w') as f:
-            json.dump(pokedex, f, indent=4)
-        exit(1)
-    else:
-        logger.debug("Pokedex JSON unmodified!")
+    return await router.get_new_battle_connection()
 
 
 async def showdown():
@@ -71,40 +85,62 @@ async def showdown():
 
     apply_mods(config.pokemon_mode)
 
-    original_pokedex = deepcopy(pokedex)
-    original_move_json = deepcopy(all_move_json)
-
-    ps_websocket_client = await PSWebsocketClient.create(config.username, config.password, config.websocket_uri)
-    await ps_websocket_client.login()
-
-    battles_run = 0
+    # started before connecting so the engine processes do not inherit the connection
+    start_engine_pool()
+    try:
+        ps_websocket_client = await PSWebsocketClient.create(config.username, config.password, config.websocket_uri)
+        await ps_websocket_client.login()
+        await play_battles(ps_websocket_client)
+    finally:
+        shutdown_engine_pool()
+        shutdown_search_pool()
+
+
+async def play_battles(ps_websocket_client):
+    # every battle reads its own messages from the router so that several battles can be played at once
+    router = MessageRouter(ps_websocket_client)
+    router.start()
+    lobby = router.get_global_connection()
+
+    battles = dict()
+    battles_started = 0
     wins = 0
     losses = 0
-    while True:
-        team = load_team(config.team_name)
-        if config.bot_mode == constants.CHALLENGE_USER:
-            await ps_websocket_client.challenge_user(config.user_to_challenge, config.pokemon_mode, team)
-        elif config.bot_mode == constants.ACCEPT_CHALLENGE:
-            await ps_websocket_client.accept_challenge(config.pokemon_mode, team, config.room_name)
-        elif config.bot_mode == constants.SEARCH_LADDER:
-            await ps_websocket_client.search_for_match(config.pokemon_mode, team)
-        else:
-            raise ValueError("Invalid Bot Mode")
-
-        winner = await pokemon_battle(ps_websocket_client, config.pokemon_mode)
-
-        if winner == config.username:
-            wins += 1
-        else:
-            losses += 1
-
-        logger.info("W: {}\tL: {}".format(wins, losses))
-
-        check_dictionaries_are_unmodified(original_pokedex, original_move_json)
-
-        battles_run += 1
-        if battles_run >= config.run_count:
-            break
+    try:
+        while battles_started < config.run_count or battles:
+            if len(battles) < config.max_concurrent_battles and battles_started < config.run_count:
+                find_task = asyncio.ensure_future(find_battle(lobby, router))
+                done, _ = await asyncio.wait([find_task, router.task], return_when=asyncio.FIRST_COMPLETED)
+                if find_task not in done:
+                    find_task.cancel()
+                    # raises the error that stopped the router, such as the connection closing
+                    router.task.result()
+                battle_connection = find_task.result()
+                battle_task = asyncio.ensure_future(pokemon_battle(battle_connection, config.pokemon_mode))
+                battles[battle_task] = battle_connection.battle_tag
+                battles_started += 1
+                continue
+
+            done, _ = await asyncio.wait(list(battles) + [router.task], return_when=asyncio.FIRST_COMPLETED)
+            if router.task in done:
+                # raises the error that stopped the router, such as the connection closing
+                router.task.result()
+                done.remove(router.task)
+
+            for battle_task in done:
+                router.finish_battle(battles.pop(battle_task))
+                winner = battle_task.result()
+
+                if winner == config.username:
+                    wins += 1
+                else:
+                    losses += 1
+
+                logger.info("W: {}\tL: {}".format(wins, losses))
+    finally:
+        for battle_task in battles:
+            battle_task.cancel()
+        router.stop()
 
 
 if __name__ == "__main__":
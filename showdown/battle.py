@@ -26,7 +26,10 @@ from data.helpers import get_most_likely_item
 from data.helpers import get_most_likely_ability
 from data.helpers import get_most_likely_spread
 from data.helpers import get_all_possible_moves_for_random_battle
+from data.helpers import get_random_battle_move_candidates
 
+from showdown.engine.instrumentation import timed_phase
+from showdown.engine.instrumentation import PREPARE_BATTLES
 from showdown.engine.objects import State
 from showdown.engine.objects import Side
 from showdown.engine.objects import Pokemon as TransposePokemon
@@ -34,6 +37,7 @@ from showdown.engine.objects import Pokemon as TransposePokemon
 from showdown.engine.helpers import remove_duplicate_spreads
 from showdown.engine.helpers import get_pokemon_info_from_condition
 from showdown.engine.helpers import set_makes_sense
+from showdown.engine.helpers import product_by_weight
 from showdown.engine.helpers import normalize_name
 from showdown.engine.helpers import calculate_stats
 
@@ -94,10 +98,7 @@ class Battle(ABC):
     def mega_evolve_possible(self):
         return any(g in self.generation for g in constants.MEGA_EVOLVE_GENERATIONS) or 'nationaldex' in config.pokemon_mode
 
-    def prepare_battles(self, guess_mega_evo_opponent=True, join_moves_together=False):
-        """Returns a list of battles based on this one
-        The battles have the opponent's reserve pokemon's unknowns filled in
-        The opponent's active pokemon in each of the battles has a different set"""
+    def _prepare_battle_copy(self, guess_mega_evo_opponent):
         battle_copy = deepcopy(self)
         battle_copy.opponent.lock_moves()
         battle_copy.user.lock_active_pkmn_first_turn_moves()
@@ -116,6 +117,40 @@ class Battle(ABC):
         for pkmn in filter(lambda x: x.is_alive(), battle_copy.opponent.reserve):
             pkmn.guess_most_likely_attributes()
 
+        return battle_copy
+
+    def clone_for_opponent_set(self):
+        """Returns a copy of this battle that only owns the opponent's active pokemon
+        Everything else is shared with this battle and must not be modified through the copy"""
+        new_battle = copy(self)
+        new_battle.opponent = copy(self.opponent)
+        new_battle.opponent.active = self.opponent.active.copy()
+        return new_battle
+
+    @staticmethod
+    def _create_battle_with_opponent_set(battle_copy, spread, item, ability, expected_moves, chance_moves):
+        # every battle made from `battle_copy` differs only by the opponent's active pokemon
+        new_battle = battle_copy.clone_for_opponent_set()
+        new_battle.opponent.active.set_spread(spread[0], spread[1])
+        if new_battle.opponent.active.name == 'ditto':
+            new_battle.opponent.active.stats = battle_copy.opponent.active.stats
+        new_battle.opponent.active.item = item
+        new_battle.opponent.active.ability = ability
+        for m in expected_moves:
+            new_battle.opponent.active.add_move(m)
+        for m in chance_moves:
+            new_battle.opponent.active.add_move(m)
+
+        new_battle.opponent.lock_moves()
+        return new_battle
+
+    @timed_phase(PREPARE_BATTLES)
+    def prepare_battles(self, guess_mega_evo_opponent=True, join_moves_together=False):
+        """Returns a list of battles based on this one
+        The battles have the opponent's reserve pokemon's unknowns filled in
+        The opponent's active pokemon in each of the battles has a different set"""
+        battle_copy = self._prepare_battle_copy(guess_mega_evo_opponent)
+
         try:
             pokemon_sets = get_pokemon_sets(battle_copy.opponent.active.name)
         except KeyError:
@@ -144,31 +179,111 @@ class Battle(ABC):
         # create battle clones for each of the combinations
         battles = list()
         for c in combinations:
-            new_battle = deepcopy(battle_copy)
-
-            all_moves = [m.name for m in new_battle.opponent.active.moves]
+            all_moves = [m.name for m in battle_copy.opponent.active.moves]
             all_moves += expected_moves
             all_moves += c[3]
             all_moves = [Move(m) for m in all_moves]
 
             if join_moves_together or set_makes_sense(c[0][0], c[0][1], c[1], c[2], all_moves):
-                new_battle.opponent.active.set_spread(c[0][0], c[0][1])
-                if new_battle.opponent.active.name == 'ditto':
-                    new_battle.opponent.active.stats = battle_copy.opponent.active.stats
-                new_battle.opponent.active.item = c[1]
-                new_battle.opponent.active.ability = c[2]
-                for m in expected_moves:
-                    new_battle.opponent.active.add_move(m)
-                for m in c[3]:
-                    new_battle.opponent.active.add_move(m)
-
+                new_battle = self._create_battle_with_opponent_set(battle_copy, c[0], c[1], c[2], expected_moves, c[3])
                 logger.debug("Possible set for opponent's {}:\t{} {} {} {} {}".format(battle_copy.opponent.active.name, c[0][0], c[0][1], c[1], c[2], all_moves))
                 battles.append(new_battle)
 
-            new_battle.opponent.lock_moves()
-
         return battles if battles else [battle_copy]
 
+    def _get_weighted_chance_moves(self, battle_copy, possible_moves, expected_moves, chance_moves, join_moves_together):
+        if join_moves_together:
+            return [(tuple(chance_moves), 1)]
+
+        known_moves = [m.name for m in battle_copy.opponent.active.moves]
+        if battle_copy.battle_type == constants.RANDOM_BATTLE and len(known_moves) < 4:
+            # only the moves of a random-battle set that has all of the known moves are possible together
+            move_candidates = get_random_battle_move_candidates(battle_copy.opponent.active.name, known_moves)
+            if move_candidates:
+                return [(tuple(m for m in moves if m not in known_moves), weight) for moves, weight in move_candidates]
+
+        move_weights = {m: percentage / 100 for m, percentage in possible_moves}
+        number_of_unknown_moves = max(4 - len(known_moves) - len(expected_moves), 0)
+        weighted_combinations = list()
+        for combination in itertools.combinations(chance_moves, number_of_unknown_moves):
+            weight = 1
+            for m in combination:
+                weight *= move_weights.get(m, 1)
+            weighted_combinations.append((combination, weight))
+
+        return weighted_combinations
+
+    @timed_phase(PREPARE_BATTLES)
+    def prepare_weighted_battles(self, max_battles, min_probability=1.0, guess_mega_evo_opponent=True, join_moves_together=False):
+        """Returns battles like `prepare_battles`, and the probability of the opponent having the set in each of them
+
+        The opponent's sets are made in descending probability from the usage data
+        No more than `max_battles` battles are made, and no more sets are looked at once
+        the ones already looked at make up `min_probability` of all of the possible sets
+        Sets that give the same pokemon (for example two spreads with the same stats) are combined into one battle"""
+        battle_copy = self._prepare_battle_copy(guess_mega_evo_opponent)
+
+        try:
+            pokemon_sets = get_pokemon_sets(battle_copy.opponent.active.name)
+        except KeyError:
+            logger.warning("No sets for {}, trying to find most likely attributes".format(battle_copy.opponent.active.name))
+            battle_copy.opponent.active.guess_most_likely_attributes()
+            return [battle_copy], [1.0]
+
+        opponent_active = battle_copy.opponent.active
+        possible_spreads = sorted(pokemon_sets[SPREADS_STRING], key=lambda x: x[2], reverse=True)
+        possible_abilities = sorted(pokemon_sets[ABILITY_STRING], key=lambda x: x[1], reverse=True)
+        possible_items = sorted(pokemon_sets[ITEM_STRING], key=lambda x: x[1], reverse=True)
+        possible_moves = sorted(pokemon_sets[MOVES_STRING], key=lambda x: x[1], reverse=True)
+
+        expected_moves, chance_moves = opponent_active.get_possible_moves(possible_moves, battle_copy.battle_type)
+
+        # an option that is not in the usage data (e.g. a revealed item) is the only option so its weight does not matter
+        spread_weights = {tuple(s[:2]): s[2] / 100 for s in possible_spreads}
+        item_weights = {i: percentage / 100 for i, percentage in possible_items}
+        ability_weights = {a: percentage / 100 for a, percentage in possible_abilities}
+        weighted_options = [
+            [(tuple(s), spread_weights.get(tuple(s), 1)) for s in opponent_active.get_possible_spreads(possible_spreads)],
+            [(i, item_weights.get(i, 1)) for i in opponent_active.get_possible_items(possible_items)],
+            [(a, ability_weights.get(a, 1)) for a in opponent_active.get_possible_abilities(possible_abilities)],
+            self._get_weighted_chance_moves(battle_copy, possible_moves, expected_moves, chance_moves, join_moves_together)
+        ]
+        for options in weighted_options:
+            options.sort(key=lambda x: x[1], reverse=True)
+
+        total_weight = 1
+        for options in weighted_options:
+            total_weight *= sum(w for _, w in options)
+
+        known_moves = [m.name for m in opponent_active.moves]
+        battles = list()
+        weights = list()
+        battle_indices = dict()
+        weight_looked_at = 0
+        for (spread, item, ability, moves), weight in product_by_weight(*weighted_options):
+            weight_looked_at += weight
+            all_moves = known_moves + expected_moves + list(moves)
+
+            if join_moves_together or set_makes_sense(spread[0], spread[1], item, ability, [Move(m) for m in all_moves]):
+                stats = calculate_stats(opponent_active.base_stats, opponent_active.level, evs=[int(e) for e in spread[1].split(',')], nature=spread[0])
+                equivalent_set = (tuple(sorted(stats.items())), item, ability, frozenset(all_moves))
+                if equivalent_set in battle_indices:
+                    weights[battle_indices[equivalent_set]] += weight
+                else:
+                    logger.debug("Possible set for opponent's {}:\t{} {} {} {} {}".format(opponent_active.name, spread[0], spread[1], item, ability, all_moves))
+                    battle_indices[equivalent_set] = len(battles)
+                    battles.append(self._create_battle_with_opponent_set(battle_copy, spread, item, ability, expected_moves, moves))
+                    weights.append(weight)
+
+            if len(battles) >= max_battles or weight_looked_at >= min_probability * total_weight:
+                break
+
+        if not battles:
+            return [battle_copy], [1.0]
+
+        total_battle_weight = sum(weights)
+        return battles, [w / total_battle_weight for w in weights]
+
     def create_state(self):
         user_active = TransposePokemon.from_state_pokemon_dict(self.user.active.to_dict())
         user_reserve = dict()
@@ -180,8 +295,9 @@ class Battle(ABC):
         for mon in self.opponent.reserve:
             opponent_reserve[mon.name] = TransposePokemon.from_state_pokemon_dict(mon.to_dict())
 
-        user = Side(user_active, user_reserve, copy(self.user.wish), copy(self.user.side_conditions))
-        opponent = Side(opponent_active, opponent_reserve, copy(self.opponent.wish), copy(self.opponent.side_conditions))
+        # defaultdict(int) instead of a lambda default so that the state can be pickled and sent to other processes
+        user = Side(user_active, user_reserve, copy(self.user.wish), defaultdict(int, self.user.side_conditions))
+        opponent = Side(opponent_active, opponent_reserve, copy(self.opponent.wish), defaultdict(int, self.opponent.side_conditions))
 
         state = State(user, opponent, self.weather, self.field, self.trick_room)
         return state
@@ -249,7 +365,7 @@ class Battler:
     def __init__(self):
         self.active = None
         self.reserve = []
-        self.side_conditions = defaultdict(lambda: 0)
+        self.side_conditions = defaultdict(int)
 
         self.name = None
         self.trapped = False
@@ -423,14 +539,14 @@ class Pokemon:
             self.hp = 1
 
         self.ability = None
-        self.types = pokedex[self.name][constants.TYPES]
+        self.types = list(pokedex[self.name][constants.TYPES])
         self.item = constants.UNKNOWN_ITEM
 
         self.fainted = False
         self.moves = []
         self.status = None
         self.volatile_statuses = []
-        self.boosts = defaultdict(lambda: 0)
+        self.boosts = defaultdict(int)
         self.can_mega_evo = False
         self.can_ultra_burst = False
         self.can_dynamax = False
@@ -442,6 +558,16 @@ class Pokemon:
         self.can_have_life_orb = True
         self.can_have_heavydutyboots = True
 
+    def copy(self):
+        # the attributes that are modified in place are copied and everything else is shared
+        new_pkmn = copy(self)
+        new_pkmn.moves = [copy(m) for m in self.moves]
+        new_pkmn.stats = dict(self.stats)
+        new_pkmn.types = list(self.types)
+        new_pkmn.volatile_statuses = list(self.volatile_statuses)
+        new_pkmn.boosts = copy(self.boosts)
+        return new_pkmn
+
     def forme_change(self, new_pkmn_name):
         hp_percent = float(self.hp) / self.max_hp
         moves = self.moves
@@ -1,4 +1,10 @@
 import constants
+import config
+
+
+# only this fraction of the time left in the turn is given to the search
+# the rest is left for the other work that must happen before the decision is sent
+TIME_REMAINING_SEARCH_FRACTION = 0.3
 
 
 def format_decision(battle, decision):
@@ -29,3 +35,15 @@ def format_decision(battle, decision):
             message = "{} {}".format(message, constants.ZMOVE)
 
     return [message, str(battle.rqid)]
+
+
+def get_search_time_budget(battle):
+    # The number of seconds the search may use for this decision
+    # None means the search is not time-budgeted and searches to `config.search_depth`
+    if not config.search_time_budget:
+        return None
+
+    if battle.time_remaining is None:
+        return config.search_time_budget
+
+    return min(config.search_time_budget, battle.time_remaining * TIME_REMAINING_SEARCH_FRACTION)
@@ -0,0 +1,153 @@
+import time
+import random
+import logging
+from collections import defaultdict
+
+import config
+from showdown.battle import Battle
+from showdown.engine.mcts import EXP3
+from showdown.engine.mcts import EXP3_GAMMA
+from showdown.engine.mcts import MonteCarloTreeSearch
+from showdown.engine.objects import StateMutator
+from showdown.engine.lru_cache import LRUCache
+from showdown.engine import instrumentation
+from showdown.engine.parallel_search import get_mcts_statistics_in_parallel
+
+from ..helpers import format_decision
+from ..helpers import get_search_time_budget
+
+
+logger = logging.getLogger(__name__)
+
+
+# the number of battles whose searches are kept in this process so the next decision can continue them
+MAX_BATTLES_WITH_SAVED_SEARCHES = 20
+
+# battle_tag -> the searches of the last decision in that battle
+_saved_searches = LRUCache(MAX_BATTLES_WITH_SAVED_SEARCHES)
+
+
+def split_iterations(iterations, weights):
+    # more likely battles are given more of the iterations
+    if not iterations:
+        return [None] * len(weights)
+    return [max(1, int(round(iterations * w))) for w in weights]
+
+
+@instrumentation.timed_phase(instrumentation.SEARCH)
+def get_root_statistics_from_battles(battles, weights, deadline=None, previous_searches=()):
+    """Returns the statistics of the bot's options at the root of a search of each battle,
+    along with the searches so they can be continued on the next decision
+
+    Searches in other processes are not returned"""
+    iterations = split_iterations(config.mcts_iterations, weights)
+
+    if config.search_processes > 1:
+        # each battle has every process to itself so each one can search until the deadline
+        searches = [(b.create_state(), i) for b, i in zip(battles, iterations)]
+        all_statistics = get_mcts_statistics_in_parallel(
+            searches,
+            config.mcts_selection,
+            config.mcts_exploration,
+            config.mcts_rollout_depth,
+            deadline=deadline
+        )
+        return all_statistics, []
+
+    all_statistics = list()
+    all_searches = list()
+    remaining_weight = sum(weights)
+    for b, battle_iterations, weight in zip(battles, iterations, weights):
+        # the time left is shared between the remaining battles by their weights
+        battle_deadline = None
+        if deadline is not None:
+            now = time.time()
+            battle_deadline = now + max(0, deadline - now) * weight / remaining_weight
+            remaining_weight -= weight
+
+        mutator = StateMutator(b.create_state())
+        logger.debug("Searching through the state: {}".format(mutator.state))
+        search = MonteCarloTreeSearch(
+            mutator,
+            selection=config.mcts_selection,
+            exploration=config.mcts_exploration,
+            rollout_depth=config.mcts_rollout_depth,
+            previous_searches=previous_searches
+        )
+
+        # the iterations of a previous decision that reached this state count towards the budget
+        if search.root.visits:
+            logger.debug("Continuing a previous search with {} iterations".format(search.root.visits))
+            if battle_iterations is not None:
+                battle_iterations = max(0, battle_iterations - search.root.visits)
+
+        if battle_iterations is None or battle_iterations > 0:
+            search.search(iterations=battle_iterations, deadline=battle_deadline)
+        logger.debug("Searched {} iterations".format(search.iterations))
+        if config.outcome_probability_threshold > 0:
+            logger.debug("Outcomes dropped: {}, with a total percentage of {}".format(mutator.dropped_outcomes, round(mutator.dropped_outcome_percentage, 4)))
+        if instrumentation.current_record is not None:
+            instrumentation.current_record.count('mcts_iterations', search.iterations)
+
+        all_statistics.append(search.root.user.get_statistics())
+        all_searches.append(search)
+
+    return all_statistics, all_searches
+
+
+def combine_root_statistics(all_statistics, weights):
+    """Returns each of the bot's options with the weighted share of the visits it was given across the searches"""
+    combined = defaultdict(lambda: 0)
+    for statistics, weight in zip(all_statistics, weights):
+        total_visits = sum(visits for visits, _ in statistics.values())
+        if not total_visits:
+            continue
+        for option, (visits, _) in statistics.items():
+            combined[option] += weight * visits / total_visits
+
+    return dict(combined)
+
+
+def pick_move_from_statistics(visit_shares, selection, rng=random):
+    # UCT converges to a single best option, so the most visited one is used
+    # Exp3 converges to a mixed strategy, which is its visits once the uniform exploration is removed
+    if selection != EXP3:
+        return max(visit_shares, key=visit_shares.get)
+
+    exploration_share = EXP3_GAMMA / len(visit_shares)
+    options = list(visit_shares)
+    strategy = [max(0, visit_shares[o] - exploration_share) for o in options]
+    if not any(strategy):
+        return max(visit_shares, key=visit_shares.get)
+
+    return rng.choices(options, weights=strategy)[0]
+
+
+class BattleBot(Battle):
+    def __init__(self, *args, **kwargs):
+        super(BattleBot, self).__init__(*args, **kwargs)
+
+    def find_best_move(self):
+        if config.opponent_set_samples > 0:
+            battles, weights = self.prepare_weighted_battles(config.opponent_set_samples, min_probability=config.opponent_set_sample_probability)
+        else:
+            battles = self.prepare_battles()
+            weights = [1 / len(battles)] * len(battles)
+
+        time_budget = get_search_time_budget(self)
+        deadline = time.time() + time_budget if time_budget is not None else None
+
+        previous_searches = ()
+        if config.mcts_tree_reuse:
+            previous_searches = _saved_searches.get(self.battle_tag) or ()
+
+        all_statistics, searches = get_root_statistics_from_battles(battles, weights, deadline=deadline, previous_searches=previous_searches)
+        if config.mcts_tree_reuse:
+            _saved_searches.put(self.battle_tag, searches)
+
+        visit_shares = combine_root_statistics(all_statistics, weights)
+        decision = pick_move_from_statistics(visit_shares, config.mcts_selection)
+
+        logger.debug("Choices: {}".format(sorted(visit_shares.items(), key=lambda x: x[1], reverse=True)))
+        logger.debug("Choice: {}".format(decision))
+        return format_decision(self, decision)
@@ -1,7 +1,7 @@
 import constants
 from data import all_move_json
 from showdown.battle import Battle
-from showdown.engine.damage_calculator import calculate_damage
+from showdown.engine.damage_calculator import calculate_damage_for_moves
 from showdown.engine.find_state_instructions import update_attacking_move
 from ..helpers import format_decision
 
@@ -27,9 +27,8 @@ class BattleBot(Battle):
 
         most_damage = -1
         choice = None
-        for move in moves:
-            damage_amounts = calculate_damage(state, constants.SELF, move, constants.DO_NOTHING_MOVE)
-
+        all_damage_amounts = calculate_damage_for_moves(state, constants.SELF, moves, constants.DO_NOTHING_MOVE)
+        for move, damage_amounts in zip(moves, all_damage_amounts):
             damage = damage_amounts[0] if damage_amounts else 0
 
             if damage > most_damage:
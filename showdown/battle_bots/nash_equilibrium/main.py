@@ -1,105 +1,89 @@
 import random
-import subprocess
 import logging
 from collections import defaultdict
 
 import numpy as np
 import pandas as pd
-from nashpy import Game
 
 import config
 from showdown.battle import Battle
 from showdown.engine.select_best_move import remove_guaranteed_opponent_moves
 from showdown.engine.objects import StateMutator
-from showdown.engine.select_best_move import pick_safest
 from showdown.engine.select_best_move import get_payoff_matrix
+from showdown.engine.select_best_move import search_with_time_budget
+from showdown.engine.transposition_table import TranspositionTable
+from showdown.engine.instrumentation import timed_phase
+from showdown.engine.instrumentation import SEARCH
+from showdown.engine.instrumentation import FIND_EQUILIBRIUM
+from showdown.engine.parallel_search import get_payoff_matrices_in_parallel
 
 from ..safest.main import pick_safest_move_from_battles
 from ..helpers import format_decision
+from ..helpers import get_search_time_budget
 
 
 logger = logging.getLogger(__name__)
 
 
-NFG_FORMAT_BASE = """NFG 1 R ""
-{ "Player 1" "Player 2" } { %s %s }
+# tolerance used by the simplex method when comparing values to 0
+SIMPLEX_TOLERANCE = 1e-9
 
-"""
 
+def _pivot(tableau, row, column):
+    tableau[row] /= tableau[row, column]
+    pivot_row = tableau[row].copy()
+    tableau -= np.outer(tableau[:, column], pivot_row)
+    tableau[row] = pivot_row
 
-class CouldNotFindEquilibriumError(Exception):
-    pass
 
+def solve_zero_sum_game(matrix):
+    """Finds an equilibrium of the zero-sum game where `matrix` holds the row player's payoffs
 
-def format_string_for_options(num_rows, num_cols):
-    return NFG_FORMAT_BASE % (num_rows, num_cols)
+    Returns the row player's strategy, the column player's strategy, and the value of the game
 
+    The payoffs are shifted to be positive so the game can be written as the linear program:
+        maximize sum(y) subject to matrix @ y <= 1, y >= 0
+    which is solved with the simplex method. The column player's strategy is y / sum(y) and the
+    row player's strategy is read from the dual values of the constraints.
+    Bland's rule is used to choose pivots so that degenerate games (tied payoffs) cannot cycle"""
+    matrix = np.array(matrix, dtype=float)
+    num_rows, num_cols = matrix.shape
 
-def append_items_to_string(matrix, string):
-    item_to_add = "%s %s"
-    this_string = ""
-    for row in np.transpose(matrix):
-        for value in row:
-            this_string += "%s %s " % (value, value*-1)
-    return item_to_add % (string, this_string)
+    shift = 1 - matrix.min()
+    positive_matrix = matrix + shift
 
+    tableau = np.zeros((num_rows + 1, num_cols + num_rows + 1))
+    tableau[:num_rows, :num_cols] = positive_matrix
+    tableau[:num_rows, num_cols:num_cols + num_rows] = np.identity(num_rows)
+    tableau[:num_rows, -1] = 1
+    tableau[-1, :num_cols] = -1
 
-def convert_from_list(my_list, num_rows):
-    my_list = [float(i) for i in my_list]
-    return [my_list[:num_rows], my_list[num_rows:]]
+    basis = np.arange(num_cols, num_cols + num_rows)
+    while True:
+        entering_columns = np.flatnonzero(tableau[-1, :-1] < -SIMPLEX_TOLERANCE)
+        if not len(entering_columns):
+            break
+        column = entering_columns[0]
 
+        rows = np.flatnonzero(tableau[:num_rows, column] > SIMPLEX_TOLERANCE)
+        ratios = tableau[rows, -1] / tableau[rows, column]
+        tied_rows = rows[ratios < ratios.min() + SIMPLEX_TOLERANCE]
+        leaving_row = tied_rows[np.argmin(basis[tied_rows])]
 
-def find_best_nash_equilibrium(equilibria, df):
-    game = Game(df)
+        _pivot(tableau, leaving_row, column)
+        basis[leaving_row] = column
 
-    score = float('-inf')
-    best_eq = None
-    for eq in equilibria:
-        outcome = game[eq][0]
-        if outcome > score:
-            score = outcome
-            best_eq = eq
-    return best_eq, score
+    total = tableau[-1, -1]
 
+    column_strategy = np.zeros(num_cols)
+    for row, variable in enumerate(basis):
+        if variable < num_cols:
+            column_strategy[variable] = tableau[row, -1]
+    column_strategy /= total
 
-def find_all_equilibria(matrix):
-    matrix = matrix.round(0)
+    row_strategy = tableau[-1, num_cols:num_cols + num_rows] / total
 
-    matrix = np.array(matrix)
-
-    num_rows = len(matrix)
-    num_cols = len(matrix[0])
-
-    string = format_string_for_options(num_rows, num_cols)
-    string = append_items_to_string(matrix, string).encode()
-
-    cmd = [config.gambit_exe_path, '-q', '-d', '2']
-
-    # sometimes this call fails and stdout is empty - repeating until completion seems to have fixed the issue
-    stdout = ''
-    stderr = ''
-    attempted = 0
-    while not stdout:
-        # for unknown and seemingly random reasons this subprocess communication sometimes fails
-        # retrying with the exact same input value does not fail
-        # if an STDOUT value is not obtained in 5 tries, raise an error
-        if attempted > 5:
-            raise CouldNotFindEquilibriumError(stderr)
-        sp = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE)
-        stdout, stderr = sp.communicate(string)
-        stdout = stdout.decode('utf-8').replace('\r', '')
-        attempted += 1
-
-    lines = stdout.split('\n')
-
-    equilibria = []
-    for line in lines:
-        if line.startswith("NE"):
-            ne = line[3:].split(',')
-            ne = convert_from_list(ne, num_rows)
-            equilibria.append(ne)
-
-    return np.array(equilibria)
+    return row_strategy, column_strategy, 1 / total - shift
 
 
 def find_nash_equilibrium(score_lookup):
@@ -109,10 +93,7 @@ def find_nash_equilibrium(score_lookup):
 
     df = pd.Series(modified_score_lookup).unstack()
 
-    equilibria = find_all_equilibria(df)
-    best_eq, score = find_best_nash_equilibrium(equilibria, df)
-    bot_percentages = best_eq[0]
-    opponent_percentages = best_eq[1]
+    bot_percentages, opponent_percentages, score = solve_zero_sum_game(df.round(0))
 
     bot_choices = df.index
     opponent_choices = df.columns
@@ -132,29 +113,29 @@ def log_nash_equilibria(bot_choices, opponent_choices, bot_percentages, opponent
             opponent_options.append((opponent_choices[i], percentage))
 
 
-def get_weighted_choices_from_multiple_score_lookups(score_lookups):
+def get_weighted_choices_from_multiple_score_lookups(score_lookups, weights=None):
+    # without weights every score lookup is equally likely
+    if weights is None:
+        weights = [1 / len(score_lookups)] * len(score_lookups)
+
     bot_choice_percentages = defaultdict(lambda: 0)
-    number_of_score_lookups = len(score_lookups)
-    for sl in score_lookups:
+    for sl, weight in zip(score_lookups, weights):
         eq = find_nash_equilibrium(sl)
         log_nash_equilibria(*eq)
         for i, bot_choice in enumerate(eq[0]):
-            bot_choice_percentages[bot_choice] += eq[2][i]/number_of_score_lookups
+            bot_choice_percentages[bot_choice] += eq[2][i] * weight
 
     return list(bot_choice_percentages.items())
 
 
-def pick_move_in_equilibrium_from_multiple_score_lookups(score_lookups):
+@timed_phase(FIND_EQUILIBRIUM)
+def pick_move_in_equilibrium_from_multiple_score_lookups(score_lookups, weights=None):
     # This is the WRONG way to find a Nash Equilibrium from different potential games
     # ... but it is a simple way that works (with crappy results)
     #
     # The games should be modelled properly based on incomplete information (see Harsanyi Transform),
     # however that would require the bot to keep track of what it has revealed to the opponent
-    try:
-        weighted_choices = get_weighted_choices_from_multiple_score_lookups(score_lookups)
-    except CouldNotFindEquilibriumError as e:
-        logger.warning("Problem finding equilibria: {}".format(e))
-        return random.choice([pick_safest(sl)[0][0] for sl in score_lookups])
+    weighted_choices = get_weighted_choices_from_multiple_score_lookups(score_lookups, weights=weights)
 
     s = sum([wc[1] for wc in weighted_choices])
     bot_choices = [wc[0] for wc in weighted_choices]
@@ -168,26 +149,55 @@ def pick_move_in_equilibrium_from_multiple_score_lookups(score_lookups):
     return choice
 
 
+@timed_phase(SEARCH)
+def get_payoffs_from_battles(battles, depth, transposition_table, deadline=None):
+    if config.search_processes > 1:
+        searches = [(b.create_state(), *b.get_all_options()) for b in battles]
+        return get_payoff_matrices_in_parallel(searches, depth, prune=False, deadline=deadline)
+
+    list_of_payoffs = list()
+    for b in battles:
+        state = b.create_state()
+        mutator = StateMutator(state)
+        logger.debug("Attempting to find best move from: {}".format(mutator.state))
+        user_options, opponent_options = b.get_all_options()
+        scores = get_payoff_matrix(mutator, user_options, opponent_options, depth=depth, prune=False, transposition_table=transposition_table, deadline=deadline)
+        if config.outcome_probability_threshold > 0:
+            logger.debug("Outcomes dropped: {}, with a total percentage of {}".format(mutator.dropped_outcomes, round(mutator.dropped_outcome_percentage, 4)))
+        list_of_payoffs.append(scores)
+
+    return list_of_payoffs
+
+
 class BattleBot(Battle):
     def __init__(self, *args, **kwargs):
         super(BattleBot, self).__init__(*args, **kwargs)
 
     def find_best_move(self):
-        battles = self.prepare_battles()
-        if len(battles) > 7:
+        if config.opponent_set_samples > 0:
+            # the number of battles is capped by the sampling so there is no need to fall back to safest
+            battles, weights = self.prepare_weighted_battles(config.opponent_set_samples, min_probability=config.opponent_set_sample_probability)
+        else:
+            battles = self.prepare_battles()
+            weights = None
+
+        time_budget = get_search_time_budget(self)
+        if weights is None and len(battles) > 7:
             logger.debug("Not enough is known about the opponent's active pokemon - falling back to safest decision making")
             battles = self.prepare_battles(join_moves_together=True)
-            decision = pick_safest_move_from_battles(battles)
+            decision = pick_safest_move_from_battles(battles, time_budget=time_budget)
         else:
-            list_of_payoffs = list()
-            for b in battles:
-                state = b.create_state()
-                mutator = StateMutator(state)
-                logger.debug("Attempting to find best move from: {}".format(mutator.state))
-                user_options, opponent_options = b.get_all_options()
-                scores = get_payoff_matrix(mutator, user_options, opponent_options, prune=False)
-                list_of_payoffs.append(scores)
-
-            decision = pick_move_in_equilibrium_from_multiple_score_lookups(list_of_payoffs)
+            transposition_table = TranspositionTable(config.transposition_table_size)
+            if time_budget is None:
+                list_of_payoffs = get_payoffs_from_battles(battles, 2, transposition_table)
+            else:
+                list_of_payoffs, depth = search_with_time_budget(
+                    lambda d, deadline: get_payoffs_from_battles(battles, d, transposition_table, deadline=deadline),
+                    config.search_depth,
+                    time_budget
+                )
+                logger.debug("Searched to depth {} with a time budget of {}s".format(depth, round(time_budget, 2)))
+
+            decision = pick_move_in_equilibrium_from_multiple_score_lookups(list_of_payoffs, weights=weights)
 
         return format_decision(self, decision)
@@ -1,10 +1,18 @@
 from showdown.battle import Battle
 
 from ..helpers import format_decision
+from ..helpers import get_search_time_budget
 
 from showdown.engine.objects import StateMutator
 from showdown.engine.select_best_move import pick_safest
 from showdown.engine.select_best_move import get_payoff_matrix
+from showdown.engine.select_best_move import search_with_time_budget
+from showdown.engine.transposition_table import TranspositionTable
+from showdown.engine.move_ordering import MoveOrdering
+from showdown.engine.instrumentation import timed_phase
+from showdown.engine.instrumentation import SEARCH
+from showdown.engine.find_state_instructions import state_instruction_cache
+from showdown.engine.parallel_search import get_payoff_matrices_in_parallel
 
 import config
 
@@ -22,18 +30,67 @@ def prefix_opponent_move(score_lookup, prefix):
     return new_score_lookup
 
 
-def pick_safest_move_from_battles(battles):
+@timed_phase(SEARCH)
+def get_scores_from_battles(battles, depth, transposition_table, move_ordering=None, deadline=None):
+    if config.search_processes > 1:
+        return get_scores_from_battles_in_parallel(battles, depth, deadline=deadline)
+
     all_scores = dict()
     for i, b in enumerate(battles):
         state = b.create_state()
         mutator = StateMutator(state)
         user_options, opponent_options = b.get_all_options()
         logger.debug("Searching through the state: {}".format(mutator.state))
-        scores = get_payoff_matrix(mutator, user_options, opponent_options, depth = config.search_depth, prune=True)
+        scores = get_payoff_matrix(mutator, user_options, opponent_options, depth=depth, prune=True, transposition_table=transposition_table, deadline=deadline, move_ordering=move_ordering)
+        if config.outcome_probability_threshold > 0:
+            logger.debug("Outcomes dropped: {}, with a total percentage of {}".format(mutator.dropped_outcomes, round(mutator.dropped_outcome_percentage, 4)))
+
+        prefixed_scores = prefix_opponent_move(scores, str(i))
+        all_scores = {**all_scores, **prefixed_scores}
+
+    return all_scores
+
+
+def get_scores_from_battles_in_parallel(battles, depth, deadline=None):
+    # each battle and each of the bot's options in that battle are searched in a separate process
+    # the result is identical to searching the battles one after another as long as `config.move_ordering` is empty
+    searches = []
+    for b in battles:
+        user_options, opponent_options = b.get_all_options()
+        searches.append((b.create_state(), user_options, opponent_options))
 
+    all_scores = dict()
+    payoff_matrices = get_payoff_matrices_in_parallel(searches, depth, prune=True, deadline=deadline)
+    for i, scores in enumerate(payoff_matrices):
         prefixed_scores = prefix_opponent_move(scores, str(i))
         all_scores = {**all_scores, **prefixed_scores}
 
+    return all_scores
+
+
+def pick_safest_move_from_battles(battles, time_budget=None):
+    # the state hash includes the opponent's set so one table can be shared by all of the battles
+    transposition_table = TranspositionTable(config.transposition_table_size)
+
+    # what is learned about the order of the options is shared by the battles and by each depth of the search
+    move_ordering = MoveOrdering(config.move_ordering)
+
+    if time_budget is None:
+        all_scores = get_scores_from_battles(battles, config.search_depth, transposition_table, move_ordering)
+    else:
+        all_scores, depth = search_with_time_budget(
+            lambda d, deadline: get_scores_from_battles(battles, d, transposition_table, move_ordering, deadline=deadline),
+            config.search_depth,
+            time_budget
+        )
+        logger.debug("Searched to depth {} with a time budget of {}s".format(depth, round(time_budget, 2)))
+
+    logger.debug("Transposition table hits: {}, misses: {}".format(transposition_table.hits, transposition_table.misses))
+    # the prunes in the search processes are not counted here
+    if config.search_processes <= 1:
+        logger.debug("Prune rate: {}".format(round(move_ordering.prune_rate, 3)))
+    if config.state_instruction_cache_size > 0:
+        logger.debug("State instruction cache hits: {}, misses: {}".format(state_instruction_cache.hits, state_instruction_cache.misses))
     decision, payoff = pick_safest(all_scores)
     bot_choice = decision[0]
     logger.debug("Safest: {}, {}".format(bot_choice, payoff))
@@ -45,6 +102,14 @@ class BattleBot(Battle):
         super(BattleBot, self).__init__(*args, **kwargs)
 
     def find_best_move(self):
-        battles = self.prepare_battles(join_moves_together=True)
-        safest_move = pick_safest_move_from_battles(battles)
+        if config.opponent_set_samples > 0:
+            # the safest move is judged by its worst case so the probability of each set is not used
+            battles, _ = self.prepare_weighted_battles(
+                config.opponent_set_samples,
+                min_probability=config.opponent_set_sample_probability,
+                join_moves_together=True
+            )
+        else:
+            battles = self.prepare_battles(join_moves_together=True)
+        safest_move = pick_safest_move_from_battles(battles, time_budget=get_search_time_budget(self))
         return format_decision(self, safest_move)
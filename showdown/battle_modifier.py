@@ -84,7 +84,7 @@ def switch_or_drag(battle, split_msg):
     if side.active is not None:
         # set the pkmn's types back to their original value if the types were changed
         if constants.TYPECHANGE in side.active.volatile_statuses:
-            original_types = pokedex[side.active.name][constants.TYPES]
+            original_types = list(pokedex[side.active.name][constants.TYPES])
             logger.debug("{} had it's type changed - changing its types back to {}".format(side.active.name, original_types))
             side.active.types = original_types
 
@@ -94,7 +94,7 @@ def switch_or_drag(battle, split_msg):
             side.active.stats = calculate_stats(side.active.base_stats, side.active.level)
             side.active.ability = None
             side.active.moves = []
-            side.active.types = pokedex[side.active.name][constants.TYPES]
+            side.active.types = list(pokedex[side.active.name][constants.TYPES])
 
         # reset the boost of the pokemon being replaced
         side.active.boosts.clear()
@@ -376,7 +376,7 @@ def start_volatile_status(battle, split_msg):
     if volatile_status == constants.TYPECHANGE:
         if split_msg[4] == "[from] move: Reflect Type":
             pkmn_name = normalize_name(split_msg[5].split(":")[-1])
-            new_types = deepcopy(pokedex[pkmn_name][constants.TYPES])
+            new_types = list(pokedex[pkmn_name][constants.TYPES])
         else:
             new_types = [normalize_name(t) for t in split_msg[4].split("/")]
 
@@ -3,7 +3,9 @@ from .objects import (
     Side,
     Pokemon,
     StateMutator,
-    TransposeInstruction
+    TransposeInstruction,
+    compile_instructions,
+    decompile_instructions
 )
 
 from .find_state_instructions import get_all_state_instructions
@@ -15,6 +17,8 @@ __all__ = [
     'Pokemon',
     'StateMutator',
     'TransposeInstruction',
+    'compile_instructions',
+    'decompile_instructions',
     'get_all_state_instructions',
     'calculate_damage'
 ]
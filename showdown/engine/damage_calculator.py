@@ -1,5 +1,4 @@
 from copy import copy
-from copy import deepcopy
 
 import constants
 from data import all_move_json
@@ -50,6 +49,15 @@ damage_multipication_array = [[1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1/2, 0, 1, 1,
                               [1, 1/2, 1, 1, 1, 1, 2, 1/2, 1, 1, 1, 1, 1, 1, 2, 2, 1/2, 1, 1],
                               [1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1]]
 
+damage_roll_multipliers = {
+    'average': (0.925,),
+    'min': (0.85,),
+    'max': (1,),
+    'min_max': (0.85, 1),
+    'min_max_average': (0.85, 0.925, 1),
+    'all': (0.85, 0.86, 0.87, 0.88, 0.89, 0.90, 0.91, 0.92, 0.93, 0.94, 0.95, 0.96, 0.97, 0.98, 0.99, 1),
+}
+
 
 SPECIAL_LOGIC_MOVES = {
     "seismictoss": lambda attacker, defender: [int(attacker.level)] if "ghost" not in defender.types else None,
@@ -172,49 +180,17 @@ def get_move(move):
     if isinstance(move, dict):
         return move
     if isinstance(move, str):
-        return deepcopy(all_move_json.get(move, None))
+        return all_move_json.get(move, None)
     else:
         return None
 
 
 def get_damage_rolls(damage, calc_type):
-    if calc_type == 'average':
-        damage *= 0.925
-        return [int(damage)]
-    elif calc_type == 'min':
-        return [int(damage * 0.85)]
-    elif calc_type == 'max':
-        return [int(damage)]
-    elif calc_type == 'min_max':
-        return [
-            int(damage * 0.85),
-            int(damage)
-        ]
-    elif calc_type == 'min_max_average':
-        return [
-            int(damage * 0.85),
-            int(damage * 0.925),
-            int(damage)
-        ]
-    elif calc_type == 'all':
-        return [
-            int(damage * 0.85),
-            int(damage * 0.86),
-            int(damage * 0.87),
-            int(damage * 0.88),
-            int(damage * 0.89),
-            int(damage * 0.90),
-            int(damage * 0.91),
-            int(damage * 0.92),
-            int(damage * 0.93),
-            int(damage * 0.94),
-            int(damage * 0.95),
-            int(damage * 0.96),
-            int(damage * 0.97),
-            int(damage * 0.98),
-            int(damage * 0.99),
-            int(damage)
-        ]
+    try:
+        multipliers = damage_roll_multipliers[calc_type]
+    except KeyError:
+        return None
+    return [int(damage * m) for m in multipliers]
 
 
 def type_effectiveness_modifier(attacking_move_type, defending_types):
@@ -342,17 +318,7 @@ def volatile_status_modifier(attacking_move, attacker, defender):
     return modifier
 
 
-def calculate_damage(state, attacking_side_string, attacking_move, defending_move, calc_type='average'):
-    # a wrapper for `_calculate_damage` that takes into account move/item/ability special-effects
-    from showdown.engine.find_state_instructions import update_attacking_move
-    from showdown.engine.find_state_instructions import user_moves_first
-
-    attacking_move_dict = get_move(attacking_move)
-    if defending_move.startswith(constants.SWITCH_STRING + " "):
-        defending_move_dict = {constants.SWITCH_STRING: defending_move.split(constants.SWITCH_STRING)[-1]}
-    else:
-        defending_move_dict = get_move(defending_move)
-
+def _get_sides_and_conditions(state, attacking_side_string):
     if attacking_side_string == constants.SELF:
         attacking_side = state.self
         defending_side = state.opponent
@@ -370,12 +336,28 @@ def calculate_damage(state, attacking_side_string, attacking_move, defending_mov
         constants.TERRAIN: state.field
     }
 
+    return attacking_side, defending_side, conditions
+
+
+def _get_updated_attacking_move(state, attacking_side, defending_side, attacking_move, defending_move):
+    from showdown.engine.find_state_instructions import update_attacking_move
+    from showdown.engine.find_state_instructions import user_moves_first
+
+    attacking_move_dict = get_move(attacking_move)
+    if defending_move.startswith(constants.SWITCH_STRING + " "):
+        defending_move_dict = {constants.SWITCH_STRING: defending_move.split(constants.SWITCH_STRING)[-1]}
+    else:
+        defending_move_dict = get_move(defending_move)
+
     attacker_moves_first = user_moves_first(state, attacking_move_dict, defending_move_dict)
 
     # a charge move doesn't need to charge when only calculating damage
-    attacking_move_dict[constants.FLAGS].pop(constants.CHARGE, None)
+    if constants.CHARGE in attacking_move_dict[constants.FLAGS]:
+        attacking_move_dict = attacking_move_dict.copy()
+        attacking_move_dict[constants.FLAGS] = attacking_move_dict[constants.FLAGS].copy()
+        del attacking_move_dict[constants.FLAGS][constants.CHARGE]
 
-    attacking_move_dict = update_attacking_move(
+    return update_attacking_move(
         attacking_side.active,
         defending_side.active,
         attacking_move_dict,
@@ -385,4 +367,24 @@ def calculate_damage(state, attacking_side_string, attacking_move, defending_mov
         state.field
     )
 
+
+def calculate_damage(state, attacking_side_string, attacking_move, defending_move, calc_type='average'):
+    # a wrapper for `_calculate_damage` that takes into account move/item/ability special-effects
+    attacking_side, defending_side, conditions = _get_sides_and_conditions(state, attacking_side_string)
+    attacking_move_dict = _get_updated_attacking_move(state, attacking_side, defending_side, attacking_move, defending_move)
+
     return _calculate_damage(attacking_side.active, defending_side.active, attacking_move_dict, conditions=conditions, calc_type=calc_type)
+
+
+def calculate_damage_for_moves(state, attacking_side_string, attacking_moves, defending_move, calc_type='average'):
+    # `calculate_damage` for each of `attacking_moves` - the sides and conditions are only looked up once
+    attacking_side, defending_side, conditions = _get_sides_and_conditions(state, attacking_side_string)
+    attacking_move_dicts = [
+        _get_updated_attacking_move(state, attacking_side, defending_side, move, defending_move)
+        for move in attacking_moves
+    ]
+
+    return [
+        _calculate_damage(attacking_side.active, defending_side.active, move, conditions=conditions, calc_type=calc_type)
+        for move in attacking_move_dicts
+    ]
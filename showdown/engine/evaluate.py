@@ -1,3 +1,5 @@
+import math
+
 import constants
 
 
@@ -66,6 +68,87 @@ class Scoring:
     }
 
 
+# the most layers of each side condition there can be
+SIDE_CONDITION_MAX_LAYERS = {
+    constants.SPIKES: 3,
+    constants.TOXIC_SPIKES: 2,
+}
+
+
+def get_max_layers(side, condition):
+    return max(SIDE_CONDITION_MAX_LAYERS.get(condition, 1), side.side_conditions.get(condition, 0))
+
+
+def get_boost_and_volatile_status_score(pkmn):
+    score = 0
+    score += Scoring.POKEMON_BOOST_DIMINISHING_RETURNS[pkmn.attack_boost] * Scoring.POKEMON_BOOSTS[constants.ATTACK]
+    score += Scoring.POKEMON_BOOST_DIMINISHING_RETURNS[pkmn.defense_boost] * Scoring.POKEMON_BOOSTS[constants.DEFENSE]
+    score += Scoring.POKEMON_BOOST_DIMINISHING_RETURNS[pkmn.special_attack_boost] * Scoring.POKEMON_BOOSTS[constants.SPECIAL_ATTACK]
+    score += Scoring.POKEMON_BOOST_DIMINISHING_RETURNS[pkmn.special_defense_boost] * Scoring.POKEMON_BOOSTS[constants.SPECIAL_DEFENSE]
+    score += Scoring.POKEMON_BOOST_DIMINISHING_RETURNS[pkmn.speed_boost] * Scoring.POKEMON_BOOSTS[constants.SPEED]
+    score += Scoring.POKEMON_BOOST_DIMINISHING_RETURNS[pkmn.accuracy_boost] * Scoring.POKEMON_BOOSTS[constants.ACCURACY]
+    score += Scoring.POKEMON_BOOST_DIMINISHING_RETURNS[pkmn.evasion_boost] * Scoring.POKEMON_BOOSTS[constants.EVASION]
+    for vol_stat in pkmn.volatile_status:
+        score += Scoring.POKEMON_VOLATILE_STATUSES.get(vol_stat, 0)
+    return score
+
+
+def get_maximum_score(state):
+    """Returns a score that `evaluate()` cannot be higher than for `state` or any state reached from it
+
+    A pokemon that has fainted stays fainted, so it scores 0 in every later state
+    Boosts and volatile statuses are removed when a pokemon switches out, so only the active pokemon
+    can gain them. Everything else is assumed to reach its best value for the bot"""
+    boost_weights = sum(Scoring.POKEMON_BOOSTS.values())
+    best_boost_and_volatile_status_score = (
+        max(Scoring.POKEMON_BOOST_DIMINISHING_RETURNS.values()) * boost_weights +
+        sum(s for s in Scoring.POKEMON_VOLATILE_STATUSES.values() if s > 0)
+    )
+    worst_boost_and_volatile_status_score = (
+        min(Scoring.POKEMON_BOOST_DIMINISHING_RETURNS.values()) * boost_weights +
+        sum(s for s in Scoring.POKEMON_VOLATILE_STATUSES.values() if s < 0)
+    )
+    worst_static_status_score = min(Scoring.POKEMON_STATIC_STATUSES.values())
+
+    score = 0
+    bot_alive_count = 0
+    for pkmn in [state.self.active] + list(state.self.reserve.values()):
+        if pkmn.hp > 0:
+            bot_alive_count += 1
+            score += Scoring.POKEMON_ALIVE_STATIC + Scoring.POKEMON_HP + max(0, Scoring.BURN(pkmn.burn_multiplier))
+            if pkmn is not state.self.active:
+                score += max(0, get_boost_and_volatile_status_score(pkmn))
+    score += best_boost_and_volatile_status_score
+
+    opponent_alive_count = 0
+    for pkmn in [state.opponent.active] + list(state.opponent.reserve.values()):
+        if pkmn.hp > 0:
+            opponent_alive_count += 1
+            score -= min(0, Scoring.POKEMON_ALIVE_STATIC + min(worst_static_status_score, Scoring.BURN(pkmn.burn_multiplier)))
+            if pkmn is not state.opponent.active:
+                score -= min(0, get_boost_and_volatile_status_score(pkmn))
+    score -= worst_boost_and_volatile_status_score
+
+    # the active pokemon may be a reserve pokemon later so it is counted as one
+    bot_alive_reserves_count = bot_alive_count
+    opponent_alive_reserves_count = opponent_alive_count + (6 - (len(state.opponent.reserve) + 1))
+
+    # only the side conditions that are good for the bot are counted
+    for condition, condition_score in Scoring.STATIC_SCORED_SIDE_CONDITIONS.items():
+        if condition_score > 0:
+            score += get_max_layers(state.self, condition) * condition_score
+        else:
+            score -= get_max_layers(state.opponent, condition) * condition_score
+
+    for condition, condition_score in Scoring.POKEMON_COUNT_SCORED_SIDE_CONDITIONS.items():
+        if condition_score > 0:
+            score += get_max_layers(state.self, condition) * condition_score * bot_alive_reserves_count
+        else:
+            score -= get_max_layers(state.opponent, condition) * condition_score * opponent_alive_reserves_count
+
+    return math.ceil(score)
+
+
 def evaluate_pokemon(pkmn):
     score = 0
     if pkmn.hp <= 0:
@@ -132,3 +215,67 @@ def evaluate(state):
             score -= count * Scoring.POKEMON_COUNT_SCORED_SIDE_CONDITIONS[condition] * opponent_alive_reserves_count
 
     return int(score)
+
+
+class IncrementalEvaluationError(Exception):
+    pass
+
+
+class IncrementalEvaluation:
+    """Keeps `evaluate(state)` up to date for a state that is only modified through a StateMutator
+
+    The mutator marks every pokemon that an instruction changes and only those pokemon are scored again
+    when the score is read. Side-condition scores are updated as soon as they change"""
+
+    def __init__(self, state):
+        self.state = state
+        self.changed_pokemon = {constants.SELF: {}, constants.OPPONENT: {}}
+
+        # pokemon_id -> (score, alive) for each side
+        self.pokemon_scores = {constants.SELF: {}, constants.OPPONENT: {}}
+        self.pokemon_score_totals = {constants.SELF: 0, constants.OPPONENT: 0}
+        self.alive_counts = {constants.SELF: 0, constants.OPPONENT: 0}
+
+        self.static_side_condition_scores = {constants.SELF: 0, constants.OPPONENT: 0}
+        self.pokemon_count_side_condition_scores = {constants.SELF: 0, constants.OPPONENT: 0}
+
+        for side_string in (constants.SELF, constants.OPPONENT):
+            side = getattr(state, side_string)
+            self.score_pokemon(side_string, side.active)
+            for pkmn in side.reserve.values():
+                self.score_pokemon(side_string, pkmn)
+            for condition, count in side.side_conditions.items():
+                self.side_condition_changed(side_string, condition, 0, count)
+
+    def score_pokemon(self, side_string, pkmn):
+        old_score, old_alive = self.pokemon_scores[side_string].get(pkmn.id, (0, False))
+        new_score = evaluate_pokemon(pkmn)
+        new_alive = pkmn.hp > 0
+        self.pokemon_scores[side_string][pkmn.id] = (new_score, new_alive)
+        self.pokemon_score_totals[side_string] += new_score - old_score
+        self.alive_counts[side_string] += new_alive - old_alive
+
+    def side_condition_changed(self, side_string, condition, old_count, new_count):
+        if condition in Scoring.STATIC_SCORED_SIDE_CONDITIONS:
+            self.static_side_condition_scores[side_string] += (new_count - old_count) * Scoring.STATIC_SCORED_SIDE_CONDITIONS[condition]
+        elif condition in Scoring.POKEMON_COUNT_SCORED_SIDE_CONDITIONS:
+            self.pokemon_count_side_condition_scores[side_string] += (new_count - old_count) * Scoring.POKEMON_COUNT_SCORED_SIDE_CONDITIONS[condition]
+
+    def score(self):
+        for side_string, changed_pokemon in self.changed_pokemon.items():
+            for pkmn in changed_pokemon.values():
+                self.score_pokemon(side_string, pkmn)
+            changed_pokemon.clear()
+
+        state = self.state
+        number_of_opponent_reserve_revealed = len(state.opponent.reserve) + 1
+        bot_alive_reserve_count = self.alive_counts[constants.SELF] - (state.self.active.hp > 0)
+        opponent_alive_reserves_count = self.alive_counts[constants.OPPONENT] - (state.opponent.active.hp > 0) + (6-number_of_opponent_reserve_revealed)
+
+        score = self.pokemon_score_totals[constants.SELF] - self.pokemon_score_totals[constants.OPPONENT]
+        score += self.static_side_condition_scores[constants.SELF]
+        score += self.pokemon_count_side_condition_scores[constants.SELF] * bot_alive_reserve_count
+        score -= self.static_side_condition_scores[constants.OPPONENT]
+        score -= self.pokemon_count_side_condition_scores[constants.OPPONENT] * opponent_alive_reserves_count
+
+        return int(score)
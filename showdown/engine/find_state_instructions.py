@@ -1,12 +1,16 @@
 from copy import copy
+from collections import Counter
 
 import config
 import constants
 from data import all_move_json
 
 from . import instruction_generator
+from . import instrumentation
 from .damage_calculator import _calculate_damage
 from .objects import TransposeInstruction
+from .objects import SharedTransposeInstruction
+from .lru_cache import LRUCache
 from .special_effects.abilities.modify_attack_against import ability_modify_attack_against
 from .special_effects.abilities.modify_attack_being_used import ability_modify_attack_being_used
 from .special_effects.items.modify_attack_against import item_modify_attack_against
@@ -426,15 +430,65 @@ def get_state_instructions_from_move(mutator, attacking_move, defending_move, at
     return all_instructions
 
 
-def remove_duplicate_instructions(list_of_instructions):
-    new_instructions = [list_of_instructions[0]]
-    for instruction_1 in list_of_instructions[1:]:
-        for instruction_2 in new_instructions:
-            if instruction_1.has_same_instructions_as(instruction_2):
-                instruction_2.percentage += instruction_1.percentage
+def _hashable_instruction(instruction):
+    # a list (such as the types in a change_type instruction) is tagged so it is never equal to a tuple
+    return tuple((list, tuple(value)) if isinstance(value, list) else value for value in instruction)
+
+
+def remove_duplicate_instructions(list_of_instructions, mutator=None):
+    # instructions are grouped by a hashable copy of their instructions instead of comparing every pair
+    # the percentages are added in the same order as before so the result is exactly the same
+    new_instructions = []
+    instructions_lookup = dict()
+    for instruction in list_of_instructions:
+        key = tuple(instruction.instructions)
+        try:
+            existing_instruction = instructions_lookup.get(key)
+        except TypeError:
+            key = tuple(_hashable_instruction(i) for i in instruction.instructions)
+            existing_instruction = instructions_lookup.get(key)
+
+        if existing_instruction is None:
+            instructions_lookup[key] = instruction
+            new_instructions.append(instruction)
+        else:
+            existing_instruction.percentage += instruction.percentage
+
+    if mutator is not None:
+        new_instructions = _merge_reordered_instructions(mutator, new_instructions)
+
+    return new_instructions
+
+
+def _get_state_after(mutator, instruction):
+    mutator.apply(instruction.instructions)
+    state_string = str(mutator.state)
+    mutator.reverse(instruction.instructions)
+    return state_string
+
+
+def _merge_reordered_instructions(mutator, list_of_instructions):
+    # only the instructions that are the same apart from their order are applied to see if they lead to the same state
+    new_instructions = []
+    reordered_instructions_lookup = dict()
+    for instruction in list_of_instructions:
+        key = frozenset(Counter(_hashable_instruction(i) for i in instruction.instructions).items())
+        reordered_instructions = reordered_instructions_lookup.get(key)
+        if reordered_instructions is None:
+            reordered_instructions_lookup[key] = [[instruction, None]]
+            new_instructions.append(instruction)
+            continue
+
+        state_string = _get_state_after(mutator, instruction)
+        for existing in reordered_instructions:
+            if existing[1] is None:
+                existing[1] = _get_state_after(mutator, existing[0])
+            if existing[1] == state_string:
+                existing[0].percentage += instruction.percentage
                 break
         else:
-            new_instructions.append(instruction_1)
+            reordered_instructions.append([instruction, state_string])
+            new_instructions.append(instruction)
 
     return new_instructions
 
@@ -448,7 +502,97 @@ def end_of_turn_triggered(user_move, opponent_move):
     return True
 
 
+# remembers the instructions generated for a state and a pair of moves
+# it is only used when `config.state_instruction_cache_size` is greater than 0
+state_instruction_cache = LRUCache(0)
+
+
+def drop_unlikely_outcomes(state_instructions, threshold, merge_into_nearest=False):
+    """Removes the outcomes that are less likely than `threshold`
+    Returns the remaining outcomes and the total percentage of the outcomes that were removed
+
+    The percentage of the removed outcomes is given to the remaining outcomes so their percentages add up to the same
+    total as before. By default every remaining outcome is scaled up in proportion to its percentage. With
+    `merge_into_nearest` each removed outcome's percentage is added to the remaining outcome that has the most
+    instructions in common with it - the most likely one if there is a tie
+
+    The most likely outcome is always kept"""
+    kept_instructions = [i for i in state_instructions if i.percentage >= threshold]
+    if len(kept_instructions) == len(state_instructions):
+        return state_instructions, 0
+    if not kept_instructions:
+        kept_instructions = [max(state_instructions, key=lambda i: i.percentage)]
+
+    total_percentage = sum(i.percentage for i in state_instructions)
+    kept_percentage = sum(i.percentage for i in kept_instructions)
+
+    if merge_into_nearest:
+        kept_counters = [Counter(_hashable_instruction(i) for i in instruction.instructions) for instruction in kept_instructions]
+        kept_ids = {id(instruction) for instruction in kept_instructions}
+        for instruction in state_instructions:
+            if id(instruction) in kept_ids:
+                continue
+            counter = Counter(_hashable_instruction(i) for i in instruction.instructions)
+            _, nearest = max(
+                zip(kept_counters, kept_instructions),
+                key=lambda k: (sum((counter & k[0]).values()), k[1].percentage)
+            )
+            nearest.percentage += instruction.percentage
+    else:
+        for instruction in kept_instructions:
+            instruction.update_percentage(total_percentage / kept_percentage)
+
+    return kept_instructions, total_percentage - kept_percentage
+
+
 def get_all_state_instructions(mutator, user_move_string, opponent_move_string):
+    record = instrumentation.current_record
+    if record is None:
+        return _get_cached_state_instructions(mutator, user_move_string, opponent_move_string)
+
+    # choosing a switch for a switch-out move searches and generates more instructions inside this call
+    start_time = record.start(instrumentation.GENERATE_INSTRUCTIONS)
+    try:
+        state_instructions = _get_cached_state_instructions(mutator, user_move_string, opponent_move_string)
+    finally:
+        record.stop(instrumentation.GENERATE_INSTRUCTIONS, start_time)
+
+    record.count('instruction_requests')
+    record.count('chance_branches', len(state_instructions))
+    return state_instructions
+
+
+def _get_cached_state_instructions(mutator, user_move_string, opponent_move_string):
+    if config.state_instruction_cache_size <= 0:
+        return _get_all_state_instructions(mutator, user_move_string, opponent_move_string)
+
+    # the state hash covers everything that generating instructions depends on
+    # it is made of random 128 bit keys so two different states only share it by chance
+    key = (
+        mutator.state_hash, user_move_string, opponent_move_string,
+        config.damage_calc_type, config.outcome_probability_threshold, config.merge_dropped_outcomes,
+        config.merge_reordered_outcomes
+    )
+    state_instructions = state_instruction_cache.get(key)
+    if state_instructions is None:
+        # the same instructions are returned by every hit so they are stored in a tuple
+        # of SharedTransposeInstructions that raise an error if they are modified
+        state_instructions = tuple(
+            SharedTransposeInstruction(i) for i in _get_all_state_instructions(mutator, user_move_string, opponent_move_string)
+        )
+
+        state_instruction_cache.max_size = config.state_instruction_cache_size
+        state_instruction_cache.put(key, state_instructions)
+
+        if instrumentation.current_record is not None:
+            instrumentation.current_record.count('state_instruction_cache_misses')
+    elif instrumentation.current_record is not None:
+        instrumentation.current_record.count('state_instruction_cache_hits')
+
+    return state_instructions
+
+
+def _get_all_state_instructions(mutator, user_move_string, opponent_move_string):
     user_move = lookup_move(user_move_string)
     opponent_move = lookup_move(opponent_move_string)
 
@@ -472,6 +616,16 @@ def get_all_state_instructions(mutator, user_move_string, opponent_move_string):
             temp_instructions += instruction_generator.get_end_of_turn_instructions(mutator, instruction_set, user_move, opponent_move, bot_moves_first)
         all_instructions = temp_instructions
 
-    all_instructions = remove_duplicate_instructions(all_instructions)
+    if config.merge_reordered_outcomes:
+        all_instructions = remove_duplicate_instructions(all_instructions, mutator=mutator)
+    else:
+        all_instructions = remove_duplicate_instructions(all_instructions)
+
+    if config.outcome_probability_threshold > 0:
+        number_of_outcomes = len(all_instructions)
+        all_instructions, dropped_percentage = drop_unlikely_outcomes(
+            all_instructions, config.outcome_probability_threshold, merge_into_nearest=config.merge_dropped_outcomes
+        )
+        mutator.count_dropped_outcomes(number_of_outcomes - len(all_instructions), dropped_percentage)
 
     return all_instructions
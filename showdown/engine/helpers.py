@@ -1,4 +1,5 @@
 import math
+import heapq
 import constants
 
 from data import all_move_json
@@ -118,6 +119,37 @@ def normalize_name(name):
         .decode('utf-8')
 
 
+def product_by_weight(*weighted_options):
+    """Yields (combination, weight) for every combination of one option from each list of (option, weight)
+    The weight of a combination is the product of its options' weights
+
+    Combinations are made lazily in descending weight so that the least likely ones are never made if they are not needed
+    Each list must be sorted by descending weight"""
+    if not weighted_options or any(not options for options in weighted_options):
+        return
+
+    def get_weight(indices):
+        weight = 1
+        for options, i in zip(weighted_options, indices):
+            weight *= options[i][1]
+        return weight
+
+    first = (0,) * len(weighted_options)
+    frontier = [(-get_weight(first), first)]
+    seen = {first}
+    while frontier:
+        negative_weight, indices = heapq.heappop(frontier)
+        yield tuple(options[i][0] for options, i in zip(weighted_options, indices)), -negative_weight
+
+        # the next most likely combination is always one option further down one of the lists from a combination already made
+        for n, i in enumerate(indices):
+            if i + 1 < len(weighted_options[n]):
+                next_indices = indices[:n] + (i + 1,) + indices[n + 1:]
+                if next_indices not in seen:
+                    seen.add(next_indices)
+                    heapq.heappush(frontier, (-get_weight(next_indices), next_indices))
+
+
 def set_makes_sense(nature, spread, item, ability, moves):
     if item in constants.CHOICE_ITEMS and any(all_move_json[m.name][constants.CATEGORY] not in constants.DAMAGING_CATEGORIES and m.name != 'trick' for m in moves):
         return False
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import cProfile
+import logging
+import itertools
+from functools import wraps
+from collections import defaultdict
+from contextlib import contextmanager
+
+import config
+
+
+logger = logging.getLogger(__name__)
+
+
+# timed calls
+GENERATE_INSTRUCTIONS = 'generate_instructions'
+APPLY = 'apply'
+REVERSE = 'reverse'
+EVALUATE = 'evaluate'
+
+# phases of a decision
+PREPARE_BATTLES = 'prepare_battles'
+SEARCH = 'search'
+FIND_EQUILIBRIUM = 'find_equilibrium'
+
+
+# the record of the decision being made in this process
+# None when instrumentation is off so every check costs a single lookup
+current_record = None
+
+# the (time, path) of the slowest decisions made by this process whose profile was kept
+_profiled_decisions = list()
+_profile_numbers = itertools.count()
+
+
+class SearchRecord:
+    """What the engine did while one decision was being made
+
+    The time of a call includes the calls made inside it, so the apply and evaluate calls made while
+    generating instructions are counted in both. A call or phase inside another call or phase with the
+    same name is only timed once"""
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.calls = defaultdict(lambda: [0, 0.0])
+        self.phases = defaultdict(float)
+
+        # remaining depth -> [nodes, move combinations at those nodes]
+        self.depths = defaultdict(lambda: [0, 0])
+
+        self._running = set()
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def add_call(self, name, seconds):
+        call = self.calls[name]
+        call[0] += 1
+        call[1] += seconds
+
+    def start(self, name):
+        # returns None if `name` is already being timed further up the stack
+        if name in self._running:
+            return None
+        self._running.add(name)
+        return time.perf_counter()
+
+    def stop(self, name, start, is_phase=False):
+        if start is None:
+            if not is_phase:
+                self.calls[name][0] += 1
+            return
+
+        self._running.discard(name)
+        seconds = time.perf_counter() - start
+        if is_phase:
+            self.phases[name] += seconds
+        else:
+            self.add_call(name, seconds)
+
+    def node(self, depth, number_of_user_options, number_of_opponent_options):
+        nodes = self.depths[depth]
+        nodes[0] += 1
+        nodes[1] += number_of_user_options * number_of_opponent_options
+
+    def to_dict(self):
+        searched = self.counters['move_combinations_searched']
+        pruned = self.counters['move_combinations_pruned']
+        requests = self.counters['instruction_requests']
+        return {
+            'nodes': sum(n for n, _ in self.depths.values()),
+            'depths': {
+                str(depth): {'nodes': n, 'branching_factor': round(combinations / n, 2)}
+                for depth, (n, combinations) in sorted(self.depths.items(), reverse=True)
+            },
+            'prune_rate': round(pruned / (searched + pruned), 4) if searched + pruned else 0,
+            'chance_branches_per_move_combination': round(self.counters['chance_branches'] / requests, 2) if requests else 0,
+            'counters': dict(self.counters),
+            'calls': {name: {'count': count, 'time': round(seconds, 6)} for name, (count, seconds) in self.calls.items()},
+            'phases': {name: round(seconds, 6) for name, seconds in self.phases.items()},
+        }
+
+
+@contextmanager
+def phase(name):
+    # times a phase of the decision being made - does nothing when instrumentation is off
+    record = current_record
+    start_time = record.start(name) if record is not None else None
+    try:
+        yield
+    finally:
+        if record is not None:
+            record.stop(name, start_time, is_phase=True)
+
+
+def timed_phase(name):
+    # a decorator that times every call of a function as a phase
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def recording():
+    """Records what the engine does inside the block in the SearchRecord that is yielded"""
+    global current_record
+    current_record = SearchRecord()
+    try:
+        yield current_record
+    finally:
+        current_record = None
+
+
+def find_best_move_with_instrumentation(battle):
+    """Returns `battle.find_best_move()`
+
+    With `config.search_instrumentation_file` set, a JSON line describing the search is appended to that file.
+    With `config.search_profile_decisions` greater than 0, the cProfile output of that many of the slowest
+    decisions made by this process is kept in .prof files beside it"""
+    if not config.search_instrumentation_file:
+        return battle.find_best_move()
+
+    profile = cProfile.Profile() if config.search_profile_decisions > 0 else None
+    start_time = time.perf_counter()
+    with recording() as record:
+        try:
+            if profile is not None:
+                profile.enable()
+            decision = battle.find_best_move()
+        finally:
+            if profile is not None:
+                profile.disable()
+    decision_time = time.perf_counter() - start_time
+
+    line = {
+        'battle_tag': battle.battle_tag,
+        'turn': battle.turn,
+        'bot': config.battle_bot_module,
+        'decision': decision,
+        'time': round(decision_time, 6),
+        'search_processes': config.search_processes,
+        **record.to_dict()
+    }
+    if profile is not None:
+        line['profile'] = _keep_profile_if_slow(profile, battle, decision_time)
+
+    try:
+        with open(config.search_instrumentation_file, 'a') as f:
+            f.write(json.dumps(line) + '\n')
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning("Could not write the search instrumentation: {}".format(e))
+
+    return decision
+
+
+def _keep_profile_if_slow(profile, battle, decision_time):
+    # returns the path of the profile, or None if the decision was not one of the slowest
+    if len(_profiled_decisions) >= config.search_profile_decisions and decision_time <= _profiled_decisions[0][0]:
+        return None
+
+    path = "{}-{}-turn{}-{}.prof".format(
+        os.path.splitext(config.search_instrumentation_file)[0],
+        battle.battle_tag,
+        battle.turn,
+        next(_profile_numbers)
+    )
+    try:
+        profile.dump_stats(path)
+    except OSError as e:
+        logger.warning("Could not write the profile of a decision: {}".format(e))
+        return None
+
+    _profiled_decisions.append((decision_time, path))
+    _profiled_decisions.sort()
+    while len(_profiled_decisions) > config.search_profile_decisions:
+        _, fastest_path = _profiled_decisions.pop(0)
+        try:
+            os.remove(fastest_path)
+        except OSError:
+            pass
+
+    return path
@@ -0,0 +1,42 @@
+from collections import OrderedDict
+
+
+class LRUCache:
+    """A bounded mapping that counts hits and misses
+
+    When `max_size` entries are stored the least-recently-used entry is evicted
+    A `max_size` of 0 or less stores nothing"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.table = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.table[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.table.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+
+        self.table[key] = value
+        self.table.move_to_end(key)
+        while len(self.table) > self.max_size:
+            self.table.popitem(last=False)
+
+    def clear(self):
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.table)
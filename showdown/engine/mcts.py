@@ -0,0 +1,289 @@
+import math
+import time
+import random
+import bisect
+
+import constants
+
+from .find_state_instructions import get_all_state_instructions
+from .select_best_move import WON_BATTLE
+
+
+UCT = 'uct'
+EXP3 = 'exp3'
+SELECTION_POLICIES = (UCT, EXP3)
+
+# the probability that Exp3 picks an option uniformly at random
+EXP3_GAMMA = 0.1
+
+# scores are squashed into a reward between 0 and 1 around the score of the root
+# a difference of this many points from the root is a reward of ~0.73 (or ~0.27)
+REWARD_SCALE = 100
+
+# the number of turns below the root of a previous search that are looked through for the current state
+# a turn where only one side moves (e.g. switching in after a faint) is a turn of its own in the tree
+REUSE_DEPTH = 2
+
+
+class SideStatistics:
+    """The statistics one side keeps for its options at a node
+
+    Decoupled search: each side picks its option from its own statistics without
+    looking at what the other side picked"""
+
+    __slots__ = ('options', 'visits', 'rewards', 'exp3_scores')
+
+    def __init__(self, options):
+        self.options = options
+        self.visits = [0] * len(options)
+        self.rewards = [0.0] * len(options)
+        self.exp3_scores = [0.0] * len(options)
+
+    def select_uct(self, total_visits, exploration):
+        # every option is tried once before any is tried twice
+        best_index = 0
+        best_value = float('-inf')
+        log_total_visits = math.log(total_visits) if total_visits else 0
+        for i, visits in enumerate(self.visits):
+            if not visits:
+                return i, 1.0
+            value = self.rewards[i] / visits + exploration * math.sqrt(log_total_visits / visits)
+            if value > best_value:
+                best_index = i
+                best_value = value
+        return best_index, 1.0
+
+    def get_exp3_probabilities(self, gamma=EXP3_GAMMA):
+        number_of_options = len(self.options)
+        eta = gamma / number_of_options
+        max_score = max(self.exp3_scores)
+        weights = [math.exp(eta * (s - max_score)) for s in self.exp3_scores]
+        total_weight = sum(weights)
+        return [(1 - gamma) * w / total_weight + gamma / number_of_options for w in weights]
+
+    def select_exp3(self, rng):
+        probabilities = self.get_exp3_probabilities()
+        i = rng.choices(range(len(probabilities)), weights=probabilities)[0]
+        return i, probabilities[i]
+
+    def update(self, i, reward, probability):
+        self.visits[i] += 1
+        self.rewards[i] += reward
+        # importance-weighted so options picked less often are not penalized
+        self.exp3_scores[i] += reward / probability
+
+    def get_statistics(self):
+        # {option: (visits, average reward)}
+        return {
+            option: (visits, self.rewards[i] / visits if visits else 0.0)
+            for i, (option, visits) in enumerate(zip(self.options, self.visits))
+        }
+
+
+class ChanceNode:
+    """The possible outcomes of one pair of options. An outcome is sampled by its probability"""
+
+    __slots__ = ('state_instructions', 'cumulative_percentages', 'children')
+
+    def __init__(self, state_instructions):
+        self.state_instructions = state_instructions
+        self.cumulative_percentages = list()
+        total = 0
+        for instructions in state_instructions:
+            total += instructions.percentage
+            self.cumulative_percentages.append(total)
+        self.children = [None] * len(state_instructions)
+
+    def sample(self, rng):
+        i = bisect.bisect_right(self.cumulative_percentages, rng.random() * self.cumulative_percentages[-1])
+        return min(i, len(self.children) - 1)
+
+
+class DecisionNode:
+    """A state where both sides pick an option at the same time
+
+    `terminal_score` is the score of a state that is not searched past"""
+
+    __slots__ = ('state_hash', 'user', 'opponent', 'visits', 'children', 'terminal_score')
+
+    def __init__(self, state_hash, user_options, opponent_options, terminal_score=None):
+        self.state_hash = state_hash
+        self.user = SideStatistics(user_options)
+        self.opponent = SideStatistics(opponent_options)
+        self.visits = 0
+        self.children = dict()
+        self.terminal_score = terminal_score
+
+    def find_descendant(self, state_hash, max_depth=REUSE_DEPTH):
+        """Returns the node of the state with `state_hash` at most `max_depth` turns below this one, or None
+
+        The state hash is made of a random 128 bit key for each part of the state (see `ZobristKeys`) so outcomes that
+        only differ by a value - such as a -1 and a -2 boost - are told apart"""
+        nodes = [self]
+        for depth in range(max_depth + 1):
+            next_nodes = list()
+            for node in nodes:
+                if node.state_hash == state_hash and node.terminal_score is None:
+                    return node
+                if depth < max_depth:
+                    for chance_node in node.children.values():
+                        next_nodes.extend(c for c in chance_node.children if c is not None)
+            nodes = next_nodes
+        return None
+
+
+class MonteCarloTreeSearch:
+    """Monte-Carlo tree search over the simultaneous moves of a battle
+
+    Each iteration picks an option for each side with `selection` (decoupled UCT or Exp3),
+    samples one of the outcomes of that pair of options, and applies it to the state with `mutator`.
+    This repeats until a state that has not been seen is reached. That state is scored with
+    `mutator.evaluate()` - after `rollout_depth` turns of random options if it is greater than 0.
+    Every instruction is reversed afterwards so the mutator's state is unchanged between iterations
+
+    If the state of the mutator was reached in one of `previous_searches` that part of the previous tree
+    is searched from instead of a new tree. The rest of the previous tree is discarded"""
+
+    def __init__(self, mutator, selection=UCT, exploration=1.4, rollout_depth=0, rng=None, previous_searches=()):
+        if selection not in SELECTION_POLICIES:
+            raise ValueError("Invalid selection policy: {}".format(selection))
+
+        self.mutator = mutator
+        self.selection = selection
+        self.exploration = exploration
+        self.rollout_depth = rollout_depth
+        self.rng = rng or random.Random()
+        self.iterations = 0
+
+        for previous_search in previous_searches:
+            root = previous_search.root.find_descendant(mutator.state_hash)
+            if root is not None:
+                # the rewards in the tree are relative to the score of the previous search's root
+                self.root = root
+                self.root_score = previous_search.root_score
+                break
+        else:
+            # the root is always searched - even if the battle is over
+            user_options, opponent_options = mutator.state.get_all_options()
+            self.root = DecisionNode(mutator.state_hash, user_options, opponent_options)
+            self.root_score = mutator.evaluate()
+
+    def search(self, iterations=None, deadline=None):
+        """Runs iterations until `iterations` more have run or `time.time()` is past `deadline`
+        At least one of them must be given. Returns the root node"""
+        if iterations is None and deadline is None:
+            raise ValueError("An iteration or time budget is required")
+
+        i = 0
+        while iterations is None or i < iterations:
+            if deadline is not None and time.time() > deadline:
+                break
+            self.iterate()
+            i += 1
+
+        return self.root
+
+    def iterate(self):
+        path = list()
+        applied_instructions = list()
+        node = self.root
+        try:
+            while True:
+                user_index, user_probability = self._select(node, node.user)
+                opponent_index, opponent_probability = self._select(node, node.opponent)
+                path.append((node, user_index, user_probability, opponent_index, opponent_probability))
+
+                chance_node = node.children.get((user_index, opponent_index))
+                if chance_node is None:
+                    chance_node = ChanceNode(get_all_state_instructions(
+                        self.mutator,
+                        node.user.options[user_index],
+                        node.opponent.options[opponent_index]
+                    ))
+                    node.children[(user_index, opponent_index)] = chance_node
+
+                outcome = chance_node.sample(self.rng)
+                compiled_instructions = chance_node.state_instructions[outcome].compiled_instructions
+                self.mutator.apply_compiled(compiled_instructions)
+                applied_instructions.append(compiled_instructions)
+
+                child = chance_node.children[outcome]
+                if child is None:
+                    child = self._create_node()
+                    chance_node.children[outcome] = child
+                    if child.terminal_score is None:
+                        score = self._rollout()
+                    else:
+                        score = child.terminal_score
+                    break
+                elif child.terminal_score is not None:
+                    score = child.terminal_score
+                    break
+
+                node = child
+        finally:
+            for compiled_instructions in reversed(applied_instructions):
+                self.mutator.reverse_compiled(compiled_instructions)
+
+        reward = self.get_reward(score)
+        for node, user_index, user_probability, opponent_index, opponent_probability in path:
+            node.visits += 1
+            node.user.update(user_index, reward, user_probability)
+            node.opponent.update(opponent_index, 1 - reward, opponent_probability)
+
+        self.iterations += 1
+
+    def get_reward(self, score):
+        # the score relative to the root squashed between 0 and 1
+        x = (score - self.root_score) / REWARD_SCALE
+        if x < -500:
+            return 0.0
+        return 1 / (1 + math.exp(-x))
+
+    def _select(self, node, side):
+        if self.selection == UCT:
+            return side.select_uct(node.visits, self.exploration)
+        return side.select_exp3(self.rng)
+
+    def _get_terminal_score(self, opponent_options):
+        winner = self.mutator.state.battle_is_finished()
+        if winner:
+            return self.mutator.evaluate() + WON_BATTLE * winner
+
+        # the opponent's pokemon fainted but they have reserves that have not been seen
+        # nothing is known about what comes next so the state is not searched past
+        if opponent_options == [constants.DO_NOTHING_MOVE] and self.mutator.state.opponent.active.hp == 0:
+            return self.mutator.evaluate()
+
+        return None
+
+    def _create_node(self):
+        user_options, opponent_options = self.mutator.state.get_all_options()
+        return DecisionNode(self.mutator.state_hash, user_options, opponent_options, terminal_score=self._get_terminal_score(opponent_options))
+
+    def _rollout(self):
+        # both sides pick options at random for `rollout_depth` turns before the state is scored
+        applied_instructions = list()
+        try:
+            for _ in range(self.rollout_depth):
+                user_options, opponent_options = self.mutator.state.get_all_options()
+                if self._get_terminal_score(opponent_options) is not None:
+                    break
+
+                state_instructions = get_all_state_instructions(
+                    self.mutator,
+                    self.rng.choice(user_options),
+                    self.rng.choice(opponent_options)
+                )
+                instructions = self.rng.choices(state_instructions, weights=[i.percentage for i in state_instructions])[0]
+                self.mutator.apply_compiled(instructions.compiled_instructions)
+                applied_instructions.append(instructions.compiled_instructions)
+
+            score = self._get_terminal_score(self.mutator.state.get_all_options()[1])
+            if score is None:
+                score = self.mutator.evaluate()
+        finally:
+            for compiled_instructions in reversed(applied_instructions):
+                self.mutator.reverse_compiled(compiled_instructions)
+
+        return score
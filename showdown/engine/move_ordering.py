@@ -0,0 +1,122 @@
+from collections import defaultdict
+
+import constants
+
+from .damage_calculator import _calculate_damage
+from .damage_calculator import get_move
+
+
+HISTORY = 'history'
+KILLERS = 'killers'
+STATIC_ESTIMATE = 'static'
+HEURISTICS = (HISTORY, KILLERS, STATIC_ESTIMATE)
+
+# the number of the opponent's options remembered for each depth
+KILLERS_PER_DEPTH = 2
+
+
+class MoveOrdering:
+    """Orders the options searched at each node of a pruned `get_payoff_matrix` so that rows are pruned sooner
+
+    A row is pruned as soon as one of the opponent's options scores below the best row found so far, so
+    the bot's options are tried best-first and the opponent's options that caused prunes before are tried first
+
+    history: how often each (side, option) was the best row or caused a prune anywhere in the search,
+             weighted by the depth that was left below it
+    killers: the opponent's options that caused the latest prunes at each depth
+    static: the bot's moves are ordered by the damage they do to the opponent's active pokemon. This is
+            the order used before the history has anything to say about an option. The damage is calculated
+            once for each state (see `StateMutator.state_hash`) that is searched
+
+    One MoveOrdering can be shared by every search of a decision - including the searches of each battle clone
+    It also counts the move combinations that were searched and pruned so the prune rate can be logged"""
+
+    def __init__(self, heuristics=HEURISTICS):
+        for heuristic in heuristics:
+            if heuristic not in HEURISTICS:
+                raise ValueError("Invalid move ordering heuristic: {}".format(heuristic))
+
+        self.use_history = HISTORY in heuristics
+        self.use_killers = KILLERS in heuristics
+        self.use_static_estimate = STATIC_ESTIMATE in heuristics
+
+        self.history = defaultdict(lambda: 0)
+        self.killers = defaultdict(list)
+        self.static_estimates = dict()
+
+        self.searched = 0
+        self.pruned = 0
+
+    @property
+    def prune_rate(self):
+        # the share of the move combinations that were not searched because their row was pruned
+        total = self.searched + self.pruned
+        return self.pruned / total if total else 0
+
+    def order_user_options(self, mutator, user_options):
+        if not (self.use_history or self.use_static_estimate) or len(user_options) < 2:
+            return user_options
+
+        estimates = dict()
+        if self.use_static_estimate:
+            estimates = self.get_static_estimates(mutator, user_options)
+
+        # sorting is stable so options that cannot be told apart stay in the order they were given
+        return sorted(
+            user_options,
+            key=lambda o: (self.history[(constants.SELF, o)] if self.use_history else 0, estimates.get(o, 0)),
+            reverse=True
+        )
+
+    def get_static_estimates(self, mutator, user_options):
+        key = (mutator.state_hash, tuple(user_options))
+        estimates = self.static_estimates.get(key)
+        if estimates is None:
+            estimates = get_static_estimates(mutator.state, user_options)
+            self.static_estimates[key] = estimates
+        return estimates
+
+    def order_opponent_options(self, opponent_options, depth):
+        if not (self.use_history or self.use_killers) or len(opponent_options) < 2:
+            return opponent_options
+
+        killers = self.killers[depth] if self.use_killers else ()
+        return sorted(
+            opponent_options,
+            key=lambda o: (o in killers, self.history[(constants.OPPONENT, o)] if self.use_history else 0),
+            reverse=True
+        )
+
+    def record_prune(self, opponent_option, depth):
+        self.history[(constants.OPPONENT, opponent_option)] += depth * depth
+
+        killers = self.killers[depth]
+        if opponent_option in killers:
+            killers.remove(opponent_option)
+        killers.insert(0, opponent_option)
+        del killers[KILLERS_PER_DEPTH:]
+
+    def record_best_option(self, user_option, depth):
+        self.history[(constants.SELF, user_option)] += depth * depth
+
+
+def get_static_estimates(state, user_options):
+    """Returns the share of the opponent's active pokemon's hp that each of the bot's moves does
+    Switches and moves that do not do damage are not included"""
+    attacker = state.self.active
+    defender = state.opponent.active
+    if not defender.maxhp:
+        return {}
+
+    estimates = dict()
+    for option in user_options:
+        if option.startswith(constants.SWITCH_STRING + " "):
+            continue
+        move = get_move(option)
+        if move is None or move.get(constants.CATEGORY) not in constants.DAMAGING_CATEGORIES:
+            continue
+        damage = _calculate_damage(attacker, defender, move)
+        if damage:
+            estimates[option] = min(damage[0], defender.hp) / defender.maxhp
+
+    return estimates
@@ -1,9 +1,17 @@
+import time
+import random
 from collections import defaultdict
 from copy import copy
 
+import config
 import constants
 from data import all_move_json
 
+from . import instrumentation
+from .evaluate import evaluate
+from .evaluate import IncrementalEvaluation
+from .evaluate import IncrementalEvaluationError
+
 
 boost_multiplier_lookup = {
     -6: 2/8,
@@ -21,6 +29,85 @@ boost_multiplier_lookup = {
     6: 8/2
 }
 
+boost_attribute_lookup = {
+    constants.ATTACK: 'attack_boost',
+    constants.DEFENSE: 'defense_boost',
+    constants.SPECIAL_ATTACK: 'special_attack_boost',
+    constants.SPECIAL_DEFENSE: 'special_defense_boost',
+    constants.SPEED: 'speed_boost',
+    constants.ACCURACY: 'accuracy_boost',
+    constants.EVASION: 'evasion_boost',
+}
+
+
+class ZobristKeys(dict):
+    """Gives each component of a state a random 128 bit key the first time it is looked up
+
+    `hash()` cannot be used for the keys because different values can have the same hash (`hash(-1) == hash(-2)`),
+    which would give states with a -1 and a -2 boost the same hash. Each component has its own key so states
+    with different components only have the same hash by chance - roughly 1 in 2**128
+
+    The keys are different in each process"""
+
+    def __missing__(self, component):
+        key = self[component] = _zobrist_random.getrandbits(128)
+        return key
+
+
+_zobrist_random = random.Random()
+zobrist_keys = ZobristKeys()
+
+
+# The state hash is the XOR of the Zobrist keys of independent components of the state
+# Each component is a tuple such as (side, pokemon_id, 'hp', 100)
+# Because XOR is its own inverse the StateMutator can keep the hash up to date by
+# XOR-ing out a component's old value and XOR-ing in its new value
+def hash_pokemon(side_string, pkmn):
+    h = zobrist_keys[(
+        side_string,
+        pkmn.id,
+        pkmn.level,
+        pkmn.ability,
+        pkmn.nature,
+        tuple(pkmn.evs),
+        pkmn.burn_multiplier,
+        tuple((m[constants.ID], m.get(constants.CURRENT_PP)) for m in pkmn.moves)
+    )]
+    h ^= zobrist_keys[(side_string, pkmn.id, constants.HITPOINTS, pkmn.hp)]
+    h ^= zobrist_keys[(side_string, pkmn.id, constants.STATS, pkmn.get_stats())]
+    h ^= zobrist_keys[(side_string, pkmn.id, constants.TYPES, tuple(pkmn.types))]
+    h ^= zobrist_keys[(side_string, pkmn.id, constants.ITEM, pkmn.item)]
+    h ^= zobrist_keys[(side_string, pkmn.id, constants.STATUS, pkmn.status)]
+    for attribute in boost_attribute_lookup.values():
+        h ^= zobrist_keys[(side_string, pkmn.id, attribute, getattr(pkmn, attribute))]
+    for volatile_status in pkmn.volatile_status:
+        h ^= zobrist_keys[(side_string, pkmn.id, constants.VOLATILE_STATUS, volatile_status)]
+    for move in pkmn.moves:
+        if move.get(constants.DISABLED):
+            h ^= zobrist_keys[(side_string, pkmn.id, constants.DISABLED, move[constants.ID])]
+    return h
+
+
+def hash_side(side_string, side):
+    h = zobrist_keys[(side_string, constants.ACTIVE, side.active.id)]
+    h ^= zobrist_keys[(side_string, constants.WISH, side.wish)]
+    h ^= hash_pokemon(side_string, side.active)
+    for pkmn in side.reserve.values():
+        h ^= hash_pokemon(side_string, pkmn)
+    for condition, count in side.side_conditions.items():
+        if count:
+            h ^= zobrist_keys[(side_string, constants.SIDE_CONDITIONS, condition, count)]
+    return h
+
+
+def hash_state(state):
+    h = hash_side(constants.SELF, state.self)
+    h ^= hash_side(constants.OPPONENT, state.opponent)
+    h ^= zobrist_keys[(constants.WEATHER, state.weather)]
+    h ^= zobrist_keys[(constants.FIELD, state.field)]
+    h ^= zobrist_keys[(constants.TRICK_ROOM, bool(state.trick_room))]
+    return h
+
 
 class State(object):
     __slots__ = ('self', 'opponent', 'weather', 'field', 'trick_room')
@@ -368,6 +455,9 @@ class Pokemon(object):
             d[constants.MOVES]
         )
 
+    def get_stats(self):
+        return self.maxhp, self.attack, self.defense, self.special_attack, self.special_defense, self.speed
+
     def calculate_boosted_stats(self):
         return {
             constants.ATTACK: boost_multiplier_lookup[self.attack_boost] * self.attack,
@@ -412,24 +502,34 @@ class Pokemon(object):
 
 
 class TransposeInstruction:
-    __slots__ = ('percentage', 'instructions', 'frozen')
+    __slots__ = ('percentage', 'instructions', 'frozen', '_compiled_instructions')
 
     def __init__(self, percentage, instructions, frozen=False):
         self.percentage = percentage
         self.instructions = instructions
         self.frozen = frozen
+        self._compiled_instructions = None
+
+    @property
+    def compiled_instructions(self):
+        # compiled the first time they are needed
+        # the instructions must not be changed after this is accessed
+        if self._compiled_instructions is None:
+            self._compiled_instructions = compile_instructions(self.instructions)
+        return self._compiled_instructions
 
     def update_percentage(self, modifier):
         self.percentage *= modifier
 
     def add_instruction(self, instruction):
         self.instructions.append(instruction)
+        self._compiled_instructions = None
 
     def has_same_instructions_as(self, other):
         return self.instructions == other.instructions
 
     def __copy__(self):
-        return TransposeInstruction(self.percentage, copy(self.instructions), self.frozen)
+        return TransposeInstruction(self.percentage, list(self.instructions), self.frozen)
 
     def __repr__(self):
         return "{}: {}".format(self.percentage, str(self.instructions))
@@ -440,10 +540,141 @@ class TransposeInstruction:
             self.frozen == other.frozen
 
 
+class SharedTransposeInstruction(TransposeInstruction):
+    """A TransposeInstruction that cannot be modified because it is shared by every caller of a cache
+    Its instructions are a tuple and are compiled when it is created. `copy()` returns a TransposeInstruction that can be modified"""
+    __slots__ = ()
+
+    def __init__(self, transpose_instruction):
+        instructions = tuple(transpose_instruction.instructions)
+        object.__setattr__(self, 'percentage', transpose_instruction.percentage)
+        object.__setattr__(self, 'instructions', instructions)
+        object.__setattr__(self, 'frozen', transpose_instruction.frozen)
+        object.__setattr__(self, '_compiled_instructions', compile_instructions(instructions))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("A SharedTransposeInstruction cannot be modified")
+
+
+# Instructions can be compiled into a compact form for the search's apply/reverse loop:
+#   - the instruction's name is replaced by a small integer opcode
+#   - the side is replaced by an index into `instruction_sides`
+#   - the stat of a boost is replaced by the name of the attribute it changes
+# All other values are unchanged
+instruction_sides = (constants.SELF, constants.OPPONENT)
+instruction_side_indexes = {side: i for i, side in enumerate(instruction_sides)}
+
+# the position of an instruction in this tuple is its opcode
+instruction_names = (
+    constants.MUTATOR_SWITCH,
+    constants.MUTATOR_APPLY_VOLATILE_STATUS,
+    constants.MUTATOR_REMOVE_VOLATILE_STATUS,
+    constants.MUTATOR_DAMAGE,
+    constants.MUTATOR_HEAL,
+    constants.MUTATOR_BOOST,
+    constants.MUTATOR_UNBOOST,
+    constants.MUTATOR_APPLY_STATUS,
+    constants.MUTATOR_REMOVE_STATUS,
+    constants.MUTATOR_SIDE_START,
+    constants.MUTATOR_SIDE_END,
+    constants.MUTATOR_WISH_START,
+    constants.MUTATOR_WISH_DECREMENT,
+    constants.MUTATOR_DISABLE_MOVE,
+    constants.MUTATOR_ENABLE_MOVE,
+    constants.MUTATOR_WEATHER_START,
+    constants.MUTATOR_FIELD_START,
+    constants.MUTATOR_FIELD_END,
+    constants.MUTATOR_TOGGLE_TRICKROOM,
+    constants.MUTATOR_CHANGE_TYPE,
+    constants.MUTATOR_CHANGE_ITEM,
+    constants.MUTATOR_CHANGE_STATS,
+)
+instruction_opcodes = {name: i for i, name in enumerate(instruction_names)}
+
+# these instructions change the state itself rather than one side of it
+state_instruction_names = {
+    constants.MUTATOR_WEATHER_START,
+    constants.MUTATOR_FIELD_START,
+    constants.MUTATOR_FIELD_END,
+    constants.MUTATOR_TOGGLE_TRICKROOM,
+}
+
+boost_stat_lookup = {attribute: stat for stat, attribute in boost_attribute_lookup.items()}
+
+
+def compile_instruction(instruction):
+    name = instruction[0]
+    opcode = instruction_opcodes[name]
+    if name in state_instruction_names:
+        return (opcode,) + tuple(instruction[1:])
+
+    side_index = instruction_side_indexes[instruction[1]]
+    if name == constants.MUTATOR_BOOST or name == constants.MUTATOR_UNBOOST:
+        try:
+            attribute = boost_attribute_lookup[instruction[2]]
+        except KeyError:
+            raise ValueError("Invalid stat: {}".format(instruction[2]))
+        return opcode, side_index, attribute, instruction[3]
+
+    return (opcode, side_index) + tuple(instruction[2:])
+
+
+def decompile_instruction(compiled_instruction):
+    name = instruction_names[compiled_instruction[0]]
+    if name in state_instruction_names:
+        return (name,) + tuple(compiled_instruction[1:])
+
+    side = instruction_sides[compiled_instruction[1]]
+    if name == constants.MUTATOR_BOOST or name == constants.MUTATOR_UNBOOST:
+        return name, side, boost_stat_lookup[compiled_instruction[2]], compiled_instruction[3]
+
+    return (name, side) + tuple(compiled_instruction[2:])
+
+
+# the same instructions are generated over and over during a search so their compiled form is remembered
+compiled_instruction_cache = dict()
+COMPILED_INSTRUCTION_CACHE_SIZE = 10000
+
+
+def compile_instructions(instructions):
+    compiled_instructions = []
+    for instruction in instructions:
+        try:
+            compiled_instruction = compiled_instruction_cache[instruction]
+        except KeyError:
+            if len(compiled_instruction_cache) >= COMPILED_INSTRUCTION_CACHE_SIZE:
+                compiled_instruction_cache.clear()
+            compiled_instruction = compiled_instruction_cache[instruction] = compile_instruction(instruction)
+        except TypeError:
+            # instructions containing a list (such as changing types) cannot be cached
+            compiled_instruction = compile_instruction(instruction)
+        compiled_instructions.append(compiled_instruction)
+    return tuple(compiled_instructions)
+
+
+def decompile_instructions(compiled_instructions):
+    return [decompile_instruction(i) for i in compiled_instructions]
+
+
 class StateMutator:
 
     def __init__(self, state):
         self.state = state
+
+        # the hash is calculated the first time it is accessed
+        # after that it is kept up to date by every instruction that is applied or reversed
+        # the state must only be modified through this object for the hash to stay valid
+        self._state_hash = None
+
+        # the evaluation works the same way - it is created by the first call to `evaluate`
+        self._evaluation = None
+
+        # the outcomes of the turns generated from this mutator's state that were less likely than
+        # `config.outcome_probability_threshold`, and their total percentage
+        # turns that are taken from the state instruction cache are not counted again
+        self.dropped_outcomes = 0
+        self.dropped_outcome_percentage = 0
+
         self.apply_instructions = {
             constants.MUTATOR_SWITCH: self.switch,
             constants.MUTATOR_APPLY_VOLATILE_STATUS: self.apply_volatile_status,
@@ -493,196 +724,445 @@ class StateMutator:
             constants.MUTATOR_CHANGE_STATS: self.reverse_change_stats
         }
 
+        # methods for compiled instructions, indexed by opcode
+        # the most common instructions have their own implementation that takes a side index
+        # the rest convert the side index back to a string and use the methods above
+        compiled_apply_methods = {
+            constants.MUTATOR_SWITCH: self._compiled_switch,
+            constants.MUTATOR_APPLY_VOLATILE_STATUS: self._compiled_apply_volatile_status,
+            constants.MUTATOR_REMOVE_VOLATILE_STATUS: self._compiled_remove_volatile_status,
+            constants.MUTATOR_DAMAGE: self._compiled_damage,
+            constants.MUTATOR_HEAL: self._compiled_heal,
+            constants.MUTATOR_BOOST: self._compiled_boost,
+            constants.MUTATOR_UNBOOST: self._compiled_unboost,
+        }
+        compiled_reverse_methods = {
+            constants.MUTATOR_SWITCH: self._compiled_reverse_switch,
+            constants.MUTATOR_APPLY_VOLATILE_STATUS: self._compiled_remove_volatile_status,
+            constants.MUTATOR_REMOVE_VOLATILE_STATUS: self._compiled_apply_volatile_status,
+            constants.MUTATOR_DAMAGE: self._compiled_heal,
+            constants.MUTATOR_HEAL: self._compiled_damage,
+            constants.MUTATOR_BOOST: self._compiled_unboost,
+            constants.MUTATOR_UNBOOST: self._compiled_boost,
+        }
+        self.compiled_apply_instructions = [
+            compiled_apply_methods.get(name) or self._compiled_fallback(name, self.apply_instructions[name])
+            for name in instruction_names
+        ]
+        self.compiled_reverse_instructions = [
+            compiled_reverse_methods.get(name) or self._compiled_fallback(name, self.reverse_instructions[name])
+            for name in instruction_names
+        ]
+
     def apply_one(self, instruction):
         method = self.apply_instructions[instruction[0]]
         method(*instruction[1:])
 
     def apply(self, instructions):
+        record = instrumentation.current_record
+        if record is not None:
+            start_time = time.perf_counter()
+
         for instruction in instructions:
             method = self.apply_instructions[instruction[0]]
             method(*instruction[1:])
 
+        if record is not None:
+            record.add_call(instrumentation.APPLY, time.perf_counter() - start_time)
+
     def reverse(self, instructions):
+        record = instrumentation.current_record
+        if record is not None:
+            start_time = time.perf_counter()
+
         for instruction in reversed(instructions):
             method = self.reverse_instructions[instruction[0]]
             method(*instruction[1:])
 
+        if record is not None:
+            record.add_call(instrumentation.REVERSE, time.perf_counter() - start_time)
+
+    def apply_compiled(self, compiled_instructions):
+        record = instrumentation.current_record
+        if record is not None:
+            start_time = time.perf_counter()
+
+        methods = self.compiled_apply_instructions
+        for instruction in compiled_instructions:
+            methods[instruction[0]](*instruction[1:])
+
+        if record is not None:
+            record.add_call(instrumentation.APPLY, time.perf_counter() - start_time)
+
+    def reverse_compiled(self, compiled_instructions):
+        record = instrumentation.current_record
+        if record is not None:
+            start_time = time.perf_counter()
+
+        methods = self.compiled_reverse_instructions
+        for instruction in reversed(compiled_instructions):
+            methods[instruction[0]](*instruction[1:])
+
+        if record is not None:
+            record.add_call(instrumentation.REVERSE, time.perf_counter() - start_time)
+
     def get_side(self, side):
         return getattr(self.state, side)
 
+    def _get_side_from_index(self, side_index):
+        return self.state.opponent if side_index else self.state.self
+
+    @staticmethod
+    def _compiled_fallback(name, method):
+        if name in state_instruction_names:
+            return method
+
+        def apply_with_side_string(side_index, *args):
+            method(instruction_sides[side_index], *args)
+        return apply_with_side_string
+
+    @property
+    def state_hash(self):
+        if self._state_hash is None:
+            self._state_hash = hash_state(self.state)
+        return self._state_hash
+
+    def rehash(self):
+        # re-calculate the hash and the evaluation from scratch
+        # needed if the state was modified without using this object
+        self._state_hash = hash_state(self.state)
+        self._evaluation = None
+
+    def count_dropped_outcomes(self, number_of_outcomes, percentage):
+        self.dropped_outcomes += number_of_outcomes
+        self.dropped_outcome_percentage += percentage
+
+        record = instrumentation.current_record
+        if record is not None:
+            record.count('dropped_outcomes', number_of_outcomes)
+            record.count('dropped_outcome_percentage', percentage)
+
+    def evaluate(self):
+        """Returns `evaluate(self.state)` without scoring the pokemon that have not changed since the last call
+
+        With `config.debug_incremental_evaluation` the result is checked against `evaluate(self.state)`"""
+        record = instrumentation.current_record
+        if record is not None:
+            start_time = time.perf_counter()
+
+        if self._evaluation is None:
+            self._evaluation = IncrementalEvaluation(self.state)
+        score = self._evaluation.score()
+
+        if record is not None:
+            record.add_call(instrumentation.EVALUATE, time.perf_counter() - start_time)
+
+        if config.debug_incremental_evaluation:
+            expected_score = evaluate(self.state)
+            if score != expected_score:
+                raise IncrementalEvaluationError(
+                    "Incremental evaluation is {} but evaluate() is {} for state: {}".format(score, expected_score, self.state)
+                )
+
+        return score
+
+    def _pokemon_changed(self, side_string, pkmn):
+        if self._evaluation is not None:
+            self._evaluation.changed_pokemon[side_string][pkmn.id] = pkmn
+
+    def _toggle_hash_components(self, *components):
+        if self._state_hash is not None:
+            for component in components:
+                self._state_hash ^= zobrist_keys[component]
+
+    def _update_hash(self, side, pkmn_id, attribute, old_value, new_value):
+        self._toggle_hash_components((side, pkmn_id, attribute, old_value), (side, pkmn_id, attribute, new_value))
+
     def disable_move(self, side, move_name):
+        side_string = side
         side = self.get_side(side)
         try:
             move = next(filter(lambda x: x[constants.ID] == move_name, side.active.moves))
         except StopIteration:
             raise ValueError("{} not in pokemon's moves: {}".format(move_name, side.active.moves))
 
+        if not move.get(constants.DISABLED):
+            self._toggle_hash_components((side_string, side.active.id, constants.DISABLED, move_name))
         move[constants.DISABLED] = True
 
     def enable_move(self, side, move_name):
+        side_string = side
         side = self.get_side(side)
         try:
             move = next(filter(lambda x: x[constants.ID] == move_name, side.active.moves))
         except StopIteration:
             raise ValueError("{} not in pokemon's moves: {}".format(move_name, side.active.moves))
 
+        if move.get(constants.DISABLED):
+            self._toggle_hash_components((side_string, side.active.id, constants.DISABLED, move_name))
         move[constants.DISABLED] = False
 
     def switch(self, side, _, switch_pokemon_name):
         # the second parameter to this function is the current active pokemon
         # this value must be here for reversing purposes
+        side_string = side
         side = self.get_side(side)
 
+        self._toggle_hash_components((side_string, constants.ACTIVE, side.active.id))
         side.reserve[side.active.id] = side.active
         side.active = side.reserve.pop(switch_pokemon_name)
+        self._toggle_hash_components((side_string, constants.ACTIVE, side.active.id))
 
     def reverse_switch(self, side, previous_active, current_active):
         self.switch(side, current_active, previous_active)
 
     def apply_volatile_status(self, side, volatile_status):
+        side_string = side
         side = self.get_side(side)
+        if volatile_status not in side.active.volatile_status:
+            self._toggle_hash_components((side_string, side.active.id, constants.VOLATILE_STATUS, volatile_status))
         side.active.volatile_status.add(volatile_status)
+        self._pokemon_changed(side_string, side.active)
 
     def remove_volatile_status(self, side, volatile_status):
+        side_string = side
         side = self.get_side(side)
         side.active.volatile_status.remove(volatile_status)
+        self._toggle_hash_components((side_string, side.active.id, constants.VOLATILE_STATUS, volatile_status))
+        self._pokemon_changed(side_string, side.active)
 
     def damage(self, side, amount):
+        side_string = side
         side = self.get_side(side)
+        old_hp = side.active.hp
         side.active.hp -= amount
+        self._update_hash(side_string, side.active.id, constants.HITPOINTS, old_hp, side.active.hp)
+        self._pokemon_changed(side_string, side.active)
 
     def heal(self, side, amount):
+        side_string = side
         side = self.get_side(side)
+        old_hp = side.active.hp
         side.active.hp += amount
+        self._update_hash(side_string, side.active.id, constants.HITPOINTS, old_hp, side.active.hp)
+        self._pokemon_changed(side_string, side.active)
 
     def boost(self, side, stat, amount):
+        side_string = side
         side = self.get_side(side)
-        if stat == constants.ATTACK:
-            side.active.attack_boost += amount
-        elif stat == constants.DEFENSE:
-            side.active.defense_boost += amount
-        elif stat == constants.SPECIAL_ATTACK:
-            side.active.special_attack_boost += amount
-        elif stat == constants.SPECIAL_DEFENSE:
-            side.active.special_defense_boost += amount
-        elif stat == constants.SPEED:
-            side.active.speed_boost += amount
-        elif stat == constants.ACCURACY:
-            side.active.accuracy_boost += amount
-        elif stat == constants.EVASION:
-            side.active.evasion_boost += amount
-        else:
+        try:
+            attribute = boost_attribute_lookup[stat]
+        except KeyError:
             raise ValueError("Invalid stat: {}".format(stat))
 
+        old_boost = getattr(side.active, attribute)
+        setattr(side.active, attribute, old_boost + amount)
+        self._update_hash(side_string, side.active.id, attribute, old_boost, old_boost + amount)
+        self._pokemon_changed(side_string, side.active)
+
     def unboost(self, side, stat, amount):
         self.boost(side, stat, -1*amount)
 
     def apply_status(self, side, status):
+        side_string = side
         side = self.get_side(side)
+        old_status = side.active.status
         side.active.status = status
+        self._update_hash(side_string, side.active.id, constants.STATUS, old_status, status)
+        self._pokemon_changed(side_string, side.active)
 
     def remove_status(self, side, _):
         # the second parameter of this function is the status being removed
         # this value must be here for reverse purposes
         self.apply_status(side, None)
 
-    def side_start(self, side, effect, amount):
+    def _change_side_condition(self, side, effect, amount):
+        side_string = side
         side = self.get_side(side)
+        old_count = side.side_conditions[effect]
         side.side_conditions[effect] += amount
+        if old_count:
+            self._toggle_hash_components((side_string, constants.SIDE_CONDITIONS, effect, old_count))
+        if side.side_conditions[effect]:
+            self._toggle_hash_components((side_string, constants.SIDE_CONDITIONS, effect, side.side_conditions[effect]))
+        if self._evaluation is not None:
+            self._evaluation.side_condition_changed(side_string, effect, old_count, side.side_conditions[effect])
+
+    def side_start(self, side, effect, amount):
+        self._change_side_condition(side, effect, amount)
 
     def reverse_side_start(self, side, effect, amount):
-        side = self.get_side(side)
-        side.side_conditions[effect] -= amount
+        self._change_side_condition(side, effect, -1*amount)
 
     def side_end(self, side, effect, amount):
-        side = self.get_side(side)
-        side.side_conditions[effect] -= amount
+        self._change_side_condition(side, effect, -1*amount)
 
     def reverse_side_end(self, side, effect, amount):
         self.side_start(side, effect, amount)
 
+    def _set_wish(self, side, wish):
+        side_string = side
+        side = self.get_side(side)
+        self._toggle_hash_components((side_string, constants.WISH, side.wish), (side_string, constants.WISH, wish))
+        side.wish = wish
+
     def start_wish(self, side, health, _):
         # the third parameter is the current wish amount
         # it is here for reversing purposes
-        side = self.get_side(side)
-        side.wish = (2, health)
+        self._set_wish(side, (2, health))
 
     def reserve_start_wish(self, side, _, previous_wish_amount):
-        side = self.get_side(side)
-        side.wish = (0, previous_wish_amount)
+        self._set_wish(side, (0, previous_wish_amount))
 
     def decrement_wish(self, side):
-        side = self.get_side(side)
-        side.wish = (side.wish[0] - 1, side.wish[1])
+        wish = self.get_side(side).wish
+        self._set_wish(side, (wish[0] - 1, wish[1]))
 
     def reverse_decrement_wish(self, side):
-        side = self.get_side(side)
-        side.wish = (side.wish[0] + 1, side.wish[1])
+        wish = self.get_side(side).wish
+        self._set_wish(side, (wish[0] + 1, wish[1]))
+
+    def _set_weather(self, weather):
+        self._toggle_hash_components((constants.WEATHER, self.state.weather), (constants.WEATHER, weather))
+        self.state.weather = weather
 
     def start_weather(self, weather, _):
         # the second parameter is the current weather
         # the value is here for reversing purposes
-        self.state.weather = weather
+        self._set_weather(weather)
 
     def reverse_start_weather(self, _, old_weather):
-        self.state.weather = old_weather
+        self._set_weather(old_weather)
+
+    def _set_field(self, field):
+        self._toggle_hash_components((constants.FIELD, self.state.field), (constants.FIELD, field))
+        self.state.field = field
 
     def start_field(self, field, _):
         # the second parameter is the current field
         # the value is here for reversing purposes
-        self.state.field = field
+        self._set_field(field)
 
     def reverse_start_field(self, _, old_field):
-        self.state.field = old_field
+        self._set_field(old_field)
 
     def end_field(self, _):
         # the second parameter is the current field
         # the value is here for reversing purposes
-        self.state.field = None
+        self._set_field(None)
 
     def reverse_end_field(self, old_field):
-        self.state.field = old_field
+        self._set_field(old_field)
 
     def toggle_trickroom(self):
+        self._toggle_hash_components((constants.TRICK_ROOM, bool(self.state.trick_room)))
         self.state.trick_room ^= True
+        self._toggle_hash_components((constants.TRICK_ROOM, bool(self.state.trick_room)))
+
+    def _set_types(self, side, types):
+        side_string = side
+        side = self.get_side(side)
+        self._update_hash(side_string, side.active.id, constants.TYPES, tuple(side.active.types), tuple(types))
+        side.active.types = types
 
     def change_types(self, side, new_types, _):
         # the third parameter is the current types of the active pokemon
         # they must be here for reversing purposes
-        side = self.get_side(side)
-        side.active.types = new_types
+        self._set_types(side, new_types)
 
     def reverse_change_types(self, side, _, old_types):
+        self._set_types(side, old_types)
+
+    def _set_item(self, side, item):
+        side_string = side
         side = self.get_side(side)
-        side.active.types = old_types
+        self._update_hash(side_string, side.active.id, constants.ITEM, side.active.item, item)
+        side.active.item = item
 
     def change_item(self, side, new_item, _):
         # the third parameter is the current item
         # it must be here for reversing purposes
-        side = self.get_side(side)
-        side.active.item = new_item
+        self._set_item(side, new_item)
 
     def reverse_change_item(self, side, _, old_item):
+        self._set_item(side, old_item)
+
+    def _set_stats(self, side, stats):
+        side_string = side
         side = self.get_side(side)
-        side.active.item = old_item
+        old_stats = side.active.get_stats()
+        side.active.maxhp = stats[0]
+        side.active.attack = stats[1]
+        side.active.defense = stats[2]
+        side.active.special_attack = stats[3]
+        side.active.special_defense = stats[4]
+        side.active.speed = stats[5]
+        self._update_hash(side_string, side.active.id, constants.STATS, old_stats, side.active.get_stats())
+        self._pokemon_changed(side_string, side.active)
 
     def change_stats(self, side, new_stats, _):
         # the third parameter is the old stats
         # is must be here for reversing purposes
-        side = self.get_side(side)
-        side.active.maxhp = new_stats[0]
-        side.active.attack = new_stats[1]
-        side.active.defense = new_stats[2]
-        side.active.special_attack = new_stats[3]
-        side.active.special_defense = new_stats[4]
-        side.active.speed = new_stats[5]
+        self._set_stats(side, new_stats)
 
     def reverse_change_stats(self, side, _, old_stats):
         # the second parameter are the new stats
-        side = self.get_side(side)
-        side.active.maxhp = old_stats[0]
-        side.active.attack = old_stats[1]
-        side.active.defense = old_stats[2]
-        side.active.special_attack = old_stats[3]
-        side.active.special_defense = old_stats[4]
-        side.active.speed = old_stats[5]
+        self._set_stats(side, old_stats)
+
+    # The methods below apply compiled instructions
+    # They are equivalent to the methods above but take a side index and update the hash inline
+
+    def _compiled_switch(self, side_index, _, switch_pokemon_name):
+        side = self._get_side_from_index(side_index)
+        old_active_id = side.active.id
+        side.reserve[old_active_id] = side.active
+        side.active = side.reserve.pop(switch_pokemon_name)
+        if self._state_hash is not None:
+            side_string = instruction_sides[side_index]
+            self._state_hash ^= zobrist_keys[(side_string, constants.ACTIVE, old_active_id)] ^ zobrist_keys[(side_string, constants.ACTIVE, side.active.id)]
+
+    def _compiled_reverse_switch(self, side_index, previous_active, current_active):
+        self._compiled_switch(side_index, current_active, previous_active)
+
+    def _compiled_apply_volatile_status(self, side_index, volatile_status):
+        pkmn = self._get_side_from_index(side_index).active
+        if self._state_hash is not None and volatile_status not in pkmn.volatile_status:
+            self._state_hash ^= zobrist_keys[(instruction_sides[side_index], pkmn.id, constants.VOLATILE_STATUS, volatile_status)]
+        pkmn.volatile_status.add(volatile_status)
+        if self._evaluation is not None:
+            self._evaluation.changed_pokemon[instruction_sides[side_index]][pkmn.id] = pkmn
+
+    def _compiled_remove_volatile_status(self, side_index, volatile_status):
+        pkmn = self._get_side_from_index(side_index).active
+        pkmn.volatile_status.remove(volatile_status)
+        if self._state_hash is not None:
+            self._state_hash ^= zobrist_keys[(instruction_sides[side_index], pkmn.id, constants.VOLATILE_STATUS, volatile_status)]
+        if self._evaluation is not None:
+            self._evaluation.changed_pokemon[instruction_sides[side_index]][pkmn.id] = pkmn
+
+    def _compiled_damage(self, side_index, amount):
+        pkmn = self._get_side_from_index(side_index).active
+        old_hp = pkmn.hp
+        pkmn.hp -= amount
+        if self._state_hash is not None:
+            side_string = instruction_sides[side_index]
+            self._state_hash ^= zobrist_keys[(side_string, pkmn.id, constants.HITPOINTS, old_hp)] ^ zobrist_keys[(side_string, pkmn.id, constants.HITPOINTS, pkmn.hp)]
+        if self._evaluation is not None:
+            self._evaluation.changed_pokemon[instruction_sides[side_index]][pkmn.id] = pkmn
+
+    def _compiled_heal(self, side_index, amount):
+        self._compiled_damage(side_index, -1*amount)
+
+    def _compiled_boost(self, side_index, attribute, amount):
+        pkmn = self._get_side_from_index(side_index).active
+        old_boost = getattr(pkmn, attribute)
+        setattr(pkmn, attribute, old_boost + amount)
+        if self._state_hash is not None:
+            side_string = instruction_sides[side_index]
+            self._state_hash ^= zobrist_keys[(side_string, pkmn.id, attribute, old_boost)] ^ zobrist_keys[(side_string, pkmn.id, attribute, old_boost + amount)]
+        if self._evaluation is not None:
+            self._evaluation.changed_pokemon[instruction_sides[side_index]][pkmn.id] = pkmn
+
+    def _compiled_unboost(self, side_index, attribute, amount):
+        self._compiled_boost(side_index, attribute, -1*amount)
+
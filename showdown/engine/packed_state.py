@@ -0,0 +1,380 @@
+"""
+A PackedState holds a State in a single fixed-layout array of numbers so that it can be
+copied, restored, hashed and pickled as one block of memory
+Every field of every pokemon is at a fixed offset in the array
+Names (pokemon, items, moves, statuses...) are stored as an index into the PackedState's list of names
+Volatile statuses are stored as a bitmask of indices into the PackedState's list of volatile statuses
+
+This module has no production caller - only its tests use it. The engine searches the objects in objects.py
+"""
+
+from array import array
+from collections import defaultdict
+
+import constants
+
+from .objects import State
+from .objects import Side
+from .objects import Pokemon
+
+
+MAX_POKEMON = 6
+MAX_TYPES = 3
+MAX_MOVES = 16
+MAX_SIDE_CONDITIONS = 24
+
+# the array holds doubles so that fractional hp survives packing
+# a double holds whole numbers up to 2 ** 53 exactly which limits the number of bits in the volatile status mask
+MAX_VOLATILE_STATUSES = 53
+
+# the index stored for a name that is None, or for a move key that is not present
+NONE = -1
+
+# the offsets of a pokemon's fields
+(
+    ID,
+    LEVEL,
+    HP,
+    MAXHP,
+    ABILITY,
+    ITEM,
+    ATTACK,
+    DEFENSE,
+    SPECIAL_ATTACK,
+    SPECIAL_DEFENSE,
+    SPEED,
+    NATURE,
+    ATTACK_BOOST,
+    DEFENSE_BOOST,
+    SPECIAL_ATTACK_BOOST,
+    SPECIAL_DEFENSE_BOOST,
+    SPEED_BOOST,
+    ACCURACY_BOOST,
+    EVASION_BOOST,
+    STATUS,
+    VOLATILE_STATUS,
+    BURN_MULTIPLIER,
+    TYPE_COUNT,
+    MOVE_COUNT,
+) = range(24)
+EVS = MOVE_COUNT + 1
+TYPES = EVS + 6
+MOVES = TYPES + MAX_TYPES
+
+# the offsets of a move's fields from the start of the move
+MOVE_ID, MOVE_DISABLED, MOVE_CURRENT_PP = range(3)
+MOVE_SIZE = 3
+
+POKEMON_SIZE = MOVES + MAX_MOVES * MOVE_SIZE
+
+# the offsets of a side's fields
+# the active pokemon is always the side's first pokemon and the reserve pokemon follow in order
+POKEMON_COUNT, WISH_TURNS, WISH_AMOUNT, SIDE_CONDITION_COUNT = range(4)
+SIDE_CONDITIONS = SIDE_CONDITION_COUNT + 1
+SIDE_POKEMON = SIDE_CONDITIONS + 2 * MAX_SIDE_CONDITIONS
+SIDE_SIZE = SIDE_POKEMON + MAX_POKEMON * POKEMON_SIZE
+
+# the offsets of the state's fields
+WEATHER, FIELD, TRICK_ROOM = range(3)
+SIDES = TRICK_ROOM + 1
+STATE_SIZE = SIDES + 2 * SIDE_SIZE
+
+SIDE_INDICES = {
+    constants.SELF: 0,
+    constants.OPPONENT: 1,
+}
+
+# (offset, attribute) of the fields of a pokemon that are numbers and names
+POKEMON_NUMBER_FIELDS = (
+    (LEVEL, 'level'),
+    (HP, 'hp'),
+    (MAXHP, 'maxhp'),
+    (ATTACK, 'attack'),
+    (DEFENSE, 'defense'),
+    (SPECIAL_ATTACK, 'special_attack'),
+    (SPECIAL_DEFENSE, 'special_defense'),
+    (SPEED, 'speed'),
+    (ATTACK_BOOST, 'attack_boost'),
+    (DEFENSE_BOOST, 'defense_boost'),
+    (SPECIAL_ATTACK_BOOST, 'special_attack_boost'),
+    (SPECIAL_DEFENSE_BOOST, 'special_defense_boost'),
+    (SPEED_BOOST, 'speed_boost'),
+    (ACCURACY_BOOST, 'accuracy_boost'),
+    (EVASION_BOOST, 'evasion_boost'),
+    (BURN_MULTIPLIER, 'burn_multiplier'),
+)
+POKEMON_NAME_FIELDS = (
+    (ID, 'id'),
+    (ABILITY, 'ability'),
+    (ITEM, 'item'),
+    (NATURE, 'nature'),
+    (STATUS, 'status'),
+)
+
+
+class PackedStateError(Exception):
+    pass
+
+
+def _unpack_number(value):
+    # whole numbers are restored as ints
+    return int(value) if value.is_integer() else value
+
+
+def _unpickle_packed_state(values, names, volatile_statuses):
+    packed_state = PackedState.__new__(PackedState)
+    packed_state.values = array('d')
+    packed_state.values.frombytes(values)
+    packed_state.names = list(names)
+    packed_state.name_ids = {n: i for i, n in enumerate(names)}
+    packed_state.volatile_statuses = list(volatile_statuses)
+    packed_state.volatile_status_bits = {v: 1 << i for i, v in enumerate(volatile_statuses)}
+    return packed_state
+
+
+class PackedState:
+    """A State stored in a fixed-layout array
+
+    `from_state` and `to_state` convert to and from the engine's objects
+    EVs are restored as a tuple and whole numbers are restored as ints
+
+    `snapshot` and `restore` copy the array, which is a fixed size no matter what is in the state
+    Names are only ever added to a PackedState so a snapshot remains valid after new names are added"""
+
+    __slots__ = ('values', 'names', 'name_ids', 'volatile_statuses', 'volatile_status_bits')
+
+    def __init__(self):
+        self.values = array('d', bytes(8 * STATE_SIZE))
+        self.names = list()
+        self.name_ids = dict()
+        self.volatile_statuses = list()
+        self.volatile_status_bits = dict()
+
+    def get_name_id(self, name):
+        if name is None:
+            return NONE
+        try:
+            return self.name_ids[name]
+        except KeyError:
+            self.name_ids[name] = len(self.names)
+            self.names.append(name)
+            return self.name_ids[name]
+
+    def get_name(self, name_id):
+        return None if name_id == NONE else self.names[int(name_id)]
+
+    def get_volatile_status_bit(self, volatile_status):
+        try:
+            return self.volatile_status_bits[volatile_status]
+        except KeyError:
+            if len(self.volatile_statuses) == MAX_VOLATILE_STATUSES:
+                raise PackedStateError("A packed state can have at most {} volatile statuses".format(MAX_VOLATILE_STATUSES))
+            self.volatile_status_bits[volatile_status] = 1 << len(self.volatile_statuses)
+            self.volatile_statuses.append(volatile_status)
+            return self.volatile_status_bits[volatile_status]
+
+    @staticmethod
+    def get_side_offset(side_string):
+        return SIDES + SIDE_INDICES[side_string] * SIDE_SIZE
+
+    @staticmethod
+    def get_pokemon_offset(side_string, slot):
+        return SIDES + SIDE_INDICES[side_string] * SIDE_SIZE + SIDE_POKEMON + slot * POKEMON_SIZE
+
+    def get_pokemon_value(self, side_string, slot, field):
+        return _unpack_number(self.values[self.get_pokemon_offset(side_string, slot) + field])
+
+    def set_pokemon_value(self, side_string, slot, field, value):
+        self.values[self.get_pokemon_offset(side_string, slot) + field] = value
+
+    def get_pokemon_name(self, side_string, slot, field):
+        return self.get_name(self.values[self.get_pokemon_offset(side_string, slot) + field])
+
+    def set_pokemon_name(self, side_string, slot, field, name):
+        self.values[self.get_pokemon_offset(side_string, slot) + field] = self.get_name_id(name)
+
+    def has_volatile_status(self, side_string, slot, volatile_status):
+        bit = self.volatile_status_bits.get(volatile_status, 0)
+        return bool(int(self.values[self.get_pokemon_offset(side_string, slot) + VOLATILE_STATUS]) & bit)
+
+    def add_volatile_status(self, side_string, slot, volatile_status):
+        offset = self.get_pokemon_offset(side_string, slot) + VOLATILE_STATUS
+        self.values[offset] = int(self.values[offset]) | self.get_volatile_status_bit(volatile_status)
+
+    def remove_volatile_status(self, side_string, slot, volatile_status):
+        offset = self.get_pokemon_offset(side_string, slot) + VOLATILE_STATUS
+        self.values[offset] = int(self.values[offset]) & ~self.volatile_status_bits.get(volatile_status, 0)
+
+    def get_side_condition(self, side_string, condition):
+        offset = self.get_side_offset(side_string)
+        condition_id = self.name_ids.get(condition)
+        for i in range(int(self.values[offset + SIDE_CONDITION_COUNT])):
+            if self.values[offset + SIDE_CONDITIONS + 2 * i] == condition_id:
+                return _unpack_number(self.values[offset + SIDE_CONDITIONS + 2 * i + 1])
+        return 0
+
+    def set_side_condition(self, side_string, condition, count):
+        offset = self.get_side_offset(side_string)
+        condition_id = self.get_name_id(condition)
+        number_of_conditions = int(self.values[offset + SIDE_CONDITION_COUNT])
+        for i in range(number_of_conditions):
+            if self.values[offset + SIDE_CONDITIONS + 2 * i] == condition_id:
+                self.values[offset + SIDE_CONDITIONS + 2 * i + 1] = count
+                return
+
+        if number_of_conditions == MAX_SIDE_CONDITIONS:
+            raise PackedStateError("A packed side can have at most {} side conditions".format(MAX_SIDE_CONDITIONS))
+        self.values[offset + SIDE_CONDITIONS + 2 * number_of_conditions] = condition_id
+        self.values[offset + SIDE_CONDITIONS + 2 * number_of_conditions + 1] = count
+        self.values[offset + SIDE_CONDITION_COUNT] = number_of_conditions + 1
+
+    def snapshot(self):
+        return array('d', self.values)
+
+    def restore(self, snapshot):
+        self.values[:] = snapshot
+
+    def _get_referenced_names(self):
+        # the names and volatile statuses that the values refer to
+        # the lists of them can also have ones that were added and are no longer used, such as after `restore`
+        values = self.values
+        name_ids = [values[WEATHER], values[FIELD]]
+        volatile_status_mask = 0
+        for side_string in SIDE_INDICES:
+            offset = self.get_side_offset(side_string)
+            for i in range(int(values[offset + SIDE_CONDITION_COUNT])):
+                name_ids.append(values[offset + SIDE_CONDITIONS + 2 * i])
+            for slot in range(int(values[offset + POKEMON_COUNT])):
+                pkmn_offset = self.get_pokemon_offset(side_string, slot)
+                for field, _ in POKEMON_NAME_FIELDS:
+                    name_ids.append(values[pkmn_offset + field])
+                for i in range(int(values[pkmn_offset + TYPE_COUNT])):
+                    name_ids.append(values[pkmn_offset + TYPES + i])
+                for i in range(int(values[pkmn_offset + MOVE_COUNT])):
+                    name_ids.append(values[pkmn_offset + MOVES + i * MOVE_SIZE + MOVE_ID])
+                volatile_status_mask |= int(values[pkmn_offset + VOLATILE_STATUS])
+
+        return (
+            tuple(self.get_name(name_id) for name_id in name_ids),
+            tuple(v for i, v in enumerate(self.volatile_statuses) if volatile_status_mask >> i & 1)
+        )
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, PackedState) and
+            self.values == other.values and
+            self._get_referenced_names() == other._get_referenced_names()
+        )
+
+    def __hash__(self):
+        return hash((self.values.tobytes(), self._get_referenced_names()))
+
+    def __reduce__(self):
+        return _unpickle_packed_state, (self.values.tobytes(), tuple(self.names), tuple(self.volatile_statuses))
+
+    def _pack_pokemon(self, offset, pkmn):
+        values = self.values
+        for field, attribute in POKEMON_NUMBER_FIELDS:
+            values[offset + field] = getattr(pkmn, attribute)
+        for field, attribute in POKEMON_NAME_FIELDS:
+            values[offset + field] = self.get_name_id(getattr(pkmn, attribute))
+
+        for i, ev in enumerate(pkmn.evs):
+            values[offset + EVS + i] = ev
+
+        if len(pkmn.types) > MAX_TYPES:
+            raise PackedStateError("A packed pokemon can have at most {} types".format(MAX_TYPES))
+        values[offset + TYPE_COUNT] = len(pkmn.types)
+        for i, pokemon_type in enumerate(pkmn.types):
+            values[offset + TYPES + i] = self.get_name_id(pokemon_type)
+
+        volatile_status = 0
+        for v in pkmn.volatile_status:
+            volatile_status |= self.get_volatile_status_bit(v)
+        values[offset + VOLATILE_STATUS] = volatile_status
+
+        if len(pkmn.moves) > MAX_MOVES:
+            raise PackedStateError("A packed pokemon can have at most {} moves".format(MAX_MOVES))
+        values[offset + MOVE_COUNT] = len(pkmn.moves)
+        for i, move in enumerate(pkmn.moves):
+            move_offset = offset + MOVES + i * MOVE_SIZE
+            values[move_offset + MOVE_ID] = self.get_name_id(move[constants.ID])
+            values[move_offset + MOVE_DISABLED] = move[constants.DISABLED] if constants.DISABLED in move else NONE
+            values[move_offset + MOVE_CURRENT_PP] = move[constants.CURRENT_PP] if constants.CURRENT_PP in move else NONE
+
+    def _unpack_pokemon(self, offset):
+        values = self.values
+        pkmn = Pokemon.__new__(Pokemon)
+        for field, attribute in POKEMON_NUMBER_FIELDS:
+            setattr(pkmn, attribute, _unpack_number(values[offset + field]))
+        for field, attribute in POKEMON_NAME_FIELDS:
+            setattr(pkmn, attribute, self.get_name(values[offset + field]))
+
+        pkmn.evs = tuple(int(values[offset + EVS + i]) for i in range(6))
+        pkmn.types = [self.get_name(values[offset + TYPES + i]) for i in range(int(values[offset + TYPE_COUNT]))]
+
+        volatile_status = int(values[offset + VOLATILE_STATUS])
+        pkmn.volatile_status = {v for i, v in enumerate(self.volatile_statuses) if volatile_status >> i & 1}
+
+        pkmn.moves = list()
+        for i in range(int(values[offset + MOVE_COUNT])):
+            move_offset = offset + MOVES + i * MOVE_SIZE
+            move = {constants.ID: self.get_name(values[move_offset + MOVE_ID])}
+            if values[move_offset + MOVE_DISABLED] != NONE:
+                move[constants.DISABLED] = bool(values[move_offset + MOVE_DISABLED])
+            if values[move_offset + MOVE_CURRENT_PP] != NONE:
+                move[constants.CURRENT_PP] = _unpack_number(values[move_offset + MOVE_CURRENT_PP])
+            pkmn.moves.append(move)
+
+        return pkmn
+
+    def _pack_side(self, side_string, side):
+        offset = self.get_side_offset(side_string)
+        all_pokemon = [side.active] + list(side.reserve.values())
+        if len(all_pokemon) > MAX_POKEMON:
+            raise PackedStateError("A packed side can have at most {} pokemon".format(MAX_POKEMON))
+
+        self.values[offset + POKEMON_COUNT] = len(all_pokemon)
+        self.values[offset + WISH_TURNS], self.values[offset + WISH_AMOUNT] = side.wish
+        for condition, count in side.side_conditions.items():
+            self.set_side_condition(side_string, condition, count)
+        for slot, pkmn in enumerate(all_pokemon):
+            self._pack_pokemon(self.get_pokemon_offset(side_string, slot), pkmn)
+
+    def _unpack_side(self, side_string):
+        offset = self.get_side_offset(side_string)
+        all_pokemon = [
+            self._unpack_pokemon(self.get_pokemon_offset(side_string, slot))
+            for slot in range(int(self.values[offset + POKEMON_COUNT]))
+        ]
+
+        side_conditions = defaultdict(int)
+        for i in range(int(self.values[offset + SIDE_CONDITION_COUNT])):
+            condition = self.get_name(self.values[offset + SIDE_CONDITIONS + 2 * i])
+            side_conditions[condition] = _unpack_number(self.values[offset + SIDE_CONDITIONS + 2 * i + 1])
+
+        return Side(
+            all_pokemon[0],
+            {pkmn.id: pkmn for pkmn in all_pokemon[1:]},
+            (_unpack_number(self.values[offset + WISH_TURNS]), _unpack_number(self.values[offset + WISH_AMOUNT])),
+            side_conditions
+        )
+
+    @classmethod
+    def from_state(cls, state):
+        packed_state = cls()
+        packed_state.values[WEATHER] = packed_state.get_name_id(state.weather)
+        packed_state.values[FIELD] = packed_state.get_name_id(state.field)
+        packed_state.values[TRICK_ROOM] = state.trick_room
+        packed_state._pack_side(constants.SELF, state.self)
+        packed_state._pack_side(constants.OPPONENT, state.opponent)
+        return packed_state
+
+    def to_state(self):
+        return State(
+            self._unpack_side(constants.SELF),
+            self._unpack_side(constants.OPPONENT),
+            self.get_name(self.values[WEATHER]),
+            self.get_name(self.values[FIELD]),
+            bool(self.values[TRICK_ROOM])
+        )
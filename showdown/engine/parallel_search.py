@@ -0,0 +1,140 @@
+import multiprocessing
+import logging
+
+import config
+from data.mods.apply_mods import apply_mods
+
+from .evaluate import Scoring
+from .mcts import MonteCarloTreeSearch
+from .move_ordering import MoveOrdering
+from .objects import StateMutator
+from .select_best_move import get_payoff_matrix
+from .select_best_move import merge_payoff_matrix_rows
+from .transposition_table import TranspositionTable
+
+
+logger = logging.getLogger(__name__)
+
+
+# created the first time it is needed and re-used for every search after that
+_search_pool = None
+
+
+def _initialize_search_process(pokemon_mode):
+    # worker processes are spawned with a fresh interpreter so the generation's mods must be applied again
+    apply_mods(pokemon_mode)
+
+
+def _get_engine_settings():
+    # module-level values that change the result of a search
+    # they are sent with every task because they can change after the worker processes are started
+    return (
+        config.damage_calc_type,
+        Scoring.POKEMON_ALIVE_STATIC,
+        config.transposition_table_size,
+        config.state_instruction_cache_size,
+        config.outcome_probability_threshold,
+        config.merge_dropped_outcomes,
+        config.merge_reordered_outcomes,
+        config.move_ordering,
+        config.debug_incremental_evaluation
+    )
+
+
+def _apply_engine_settings(engine_settings):
+    (
+        config.damage_calc_type,
+        Scoring.POKEMON_ALIVE_STATIC,
+        config.transposition_table_size,
+        config.state_instruction_cache_size,
+        config.outcome_probability_threshold,
+        config.merge_dropped_outcomes,
+        config.merge_reordered_outcomes,
+        config.move_ordering,
+        config.debug_incremental_evaluation
+    ) = engine_settings
+
+
+def _search_user_option(state, user_option, opponent_options, depth, prune, deadline, engine_settings):
+    _apply_engine_settings(engine_settings)
+    mutator = StateMutator(state)
+    transposition_table = TranspositionTable(config.transposition_table_size)
+
+    # a single user option is never pruned at the root - its row is always complete
+    return get_payoff_matrix(
+        mutator,
+        [user_option],
+        opponent_options,
+        depth=depth,
+        prune=prune,
+        transposition_table=transposition_table,
+        deadline=deadline,
+        move_ordering=MoveOrdering(config.move_ordering)
+    )
+
+
+def _search_with_mcts(state, iterations, deadline, selection, exploration, rollout_depth, engine_settings):
+    _apply_engine_settings(engine_settings)
+    search = MonteCarloTreeSearch(StateMutator(state), selection=selection, exploration=exploration, rollout_depth=rollout_depth)
+    return search.search(iterations=iterations, deadline=deadline).user.get_statistics()
+
+
+def get_search_pool():
+    global _search_pool
+    if _search_pool is None:
+        logger.debug("Starting {} search processes".format(config.search_processes))
+        _search_pool = multiprocessing.get_context('spawn').Pool(
+            processes=config.search_processes,
+            initializer=_initialize_search_process,
+            initargs=(config.pokemon_mode or '',)
+        )
+    return _search_pool
+
+
+def shutdown_search_pool():
+    global _search_pool
+    if _search_pool is not None:
+        _search_pool.terminate()
+        _search_pool.join()
+        _search_pool = None
+
+
+def get_payoff_matrices_in_parallel(searches, depth, prune=True, deadline=None):
+    """Searches each (state, user_options, opponent_options) in `searches` using the search processes
+    Every user option of every state is searched in a separate task
+
+    Returns a list of payoff matrices that are identical to calling `get_payoff_matrix` on each state
+    The options are ordered with `config.move_ordering` in each search process. What is learned about the order
+    is not shared between processes so when pruning the result is only identical if `config.move_ordering` is empty
+    If the deadline passes the remaining tasks stop at their next node and SearchTimeoutError is raised"""
+    pool = get_search_pool()
+    engine_settings = _get_engine_settings()
+
+    all_results = []
+    for state, user_options, opponent_options in searches:
+        all_results.append([
+            pool.apply_async(_search_user_option, (state, user_option, opponent_options, depth, prune, deadline, engine_settings))
+            for user_option in user_options
+        ])
+
+    payoff_matrices = []
+    for (_, user_options, opponent_options), results in zip(searches, all_results):
+        rows = {user_option: r.get() for user_option, r in zip(user_options, results)}
+        payoff_matrices.append(merge_payoff_matrix_rows(rows, user_options, opponent_options, prune=prune))
+
+    return payoff_matrices
+
+
+def get_mcts_statistics_in_parallel(searches, selection, exploration, rollout_depth, deadline=None):
+    """Runs a MonteCarloTreeSearch on each (state, iterations) in `searches` using the search processes
+    Every state is searched in a separate task
+
+    Returns the statistics of the bot's options at the root of each search"""
+    pool = get_search_pool()
+    engine_settings = _get_engine_settings()
+
+    results = [
+        pool.apply_async(_search_with_mcts, (state, iterations, deadline, selection, exploration, rollout_depth, engine_settings))
+        for state, iterations in searches
+    ]
+    return [r.get() for r in results]
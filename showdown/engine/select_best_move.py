@@ -1,15 +1,21 @@
 import math
+import time
 from collections import defaultdict
 
 import constants
 
-from .evaluate import evaluate
+from . import instrumentation
+from .evaluate import get_maximum_score
 from .find_state_instructions import get_all_state_instructions
 
 
 WON_BATTLE = 100
 
 
+class SearchTimeoutError(Exception):
+    pass
+
+
 def remove_guaranteed_opponent_moves(score_lookup):
     """This method removes enemy moves from the score-lookup that do not give the bot a choice.
        For example - if the bot has 1 pokemon left, the opponent is faster, and can kill your active pokemon with move X
@@ -41,12 +47,24 @@ def remove_guaranteed_opponent_moves(score_lookup):
     return new_opponent_decisions
 
 
-def pick_safest(score_lookup):
+def pick_safest(score_lookup, exclude_pruned_rows=False):
+    """Returns the move pair and score of the worst case of the bot's safest move
+
+    :param exclude_pruned_rows: leave out the rows that have a pruned (nan) entry. This is only correct for a payoff
+                                matrix from a single search, where every pruned row is worse than the best row
+    """
     modified_score_lookup = remove_guaranteed_opponent_moves(score_lookup)
     if not modified_score_lookup:
         modified_score_lookup = score_lookup
+
+    pruned_user_moves = set()
+    if exclude_pruned_rows:
+        pruned_user_moves = {move_pair[0] for move_pair, result in score_lookup.items() if math.isnan(result)}
+
     worst_case = defaultdict(lambda: (tuple(), float('inf')))
     for move_pair, result in modified_score_lookup.items():
+        if move_pair[0] in pruned_user_moves:
+            continue
         if worst_case[move_pair[0]][1] > result:
             worst_case[move_pair[0]] = move_pair, result
 
@@ -54,6 +72,16 @@ def pick_safest(score_lookup):
     return worst_case[safest]
 
 
+def get_remaining_percentages(state_instructions):
+    # the total percentage of the outcomes after each outcome
+    remaining_percentages = [0] * len(state_instructions)
+    total = 0
+    for k in range(len(state_instructions) - 1, 0, -1):
+        total += state_instructions[k].percentage
+        remaining_percentages[k - 1] = total
+    return remaining_percentages
+
+
 def move_item_to_front_of_list(l, item):
     all_indicies = list(range(len(l)))
     this_index = l.index(item)
@@ -62,19 +90,52 @@ def move_item_to_front_of_list(l, item):
     return [l[i] for i in all_indicies]
 
 
-def get_payoff_matrix(mutator, user_options, opponent_options, depth=2, prune=True):
+def get_payoff_matrix(mutator, user_options, opponent_options, depth=2, prune=True, transposition_table=None, deadline=None, move_ordering=None):
     """
     :param mutator: a StateMutator object representing the state of the battle
     :param user_options: options for the bot
     :param opponent_options: options for the opponent
     :param depth: the remaining depth before the state is evaluated
-    :param prune: specify whether or not to prune the tree
+    :param prune: specify whether or not to prune the tree. Pruned entries are nan. Below the returned matrix the
+                  outcomes of a move combination also stop being searched once its row is certain to be pruned
+    :param transposition_table: an optional TranspositionTable used to avoid searching the same state twice
+    :param deadline: an optional `time.time()` value. SearchTimeoutError is raised if the search is still running after it
+    :param move_ordering: an optional MoveOrdering used to order the options at each node so that more rows are pruned
+                          It changes which entries are pruned, which `pick_safest` can notice in the nodes below
     :return: a dictionary representing the potential move combinations and their associated scores
     """
+    # the outcomes of the returned matrix are always searched completely because it may be combined with the
+    # matrices of other searches, where a row that is pruned here is not known to be worse than the others
+    return _get_cached_payoff_matrix(mutator, user_options, opponent_options, depth, prune, False, transposition_table, deadline, move_ordering)
+
+
+def _get_cached_payoff_matrix(mutator, user_options, opponent_options, depth, prune, cut_chance_outcomes, transposition_table, deadline, move_ordering):
+    if deadline is not None and time.time() > deadline:
+        raise SearchTimeoutError("Search did not finish before the deadline")
+
+    if transposition_table is None:
+        return _get_payoff_matrix(mutator, user_options, opponent_options, depth, prune, cut_chance_outcomes, transposition_table, deadline, move_ordering)
+
+    key = transposition_table.make_key(mutator, user_options, opponent_options, depth, prune, cut_chance_outcomes)
+    verification_key = transposition_table.make_verification_key(mutator)
+    payoff_matrix = transposition_table.get(key, verification_key)
+    if payoff_matrix is None:
+        payoff_matrix = _get_payoff_matrix(mutator, user_options, opponent_options, depth, prune, cut_chance_outcomes, transposition_table, deadline, move_ordering)
+        transposition_table.put(key, verification_key, payoff_matrix)
+
+        if instrumentation.current_record is not None:
+            instrumentation.current_record.count('transposition_table_misses')
+    elif instrumentation.current_record is not None:
+        instrumentation.current_record.count('transposition_table_hits')
+
+    # the cached matrix is shared - give the caller their own copy
+    return dict(payoff_matrix)
+
 
+def _get_payoff_matrix(mutator, user_options, opponent_options, depth, prune, cut_chance_outcomes, transposition_table, deadline, move_ordering):
     winner = mutator.state.battle_is_finished()
     if winner:
-        return {(constants.DO_NOTHING_MOVE, constants.DO_NOTHING_MOVE): evaluate(mutator.state) + WON_BATTLE*depth*winner}
+        return {(constants.DO_NOTHING_MOVE, constants.DO_NOTHING_MOVE): mutator.evaluate() + WON_BATTLE*depth*winner}
 
     depth -= 1
 
@@ -82,12 +143,27 @@ def get_payoff_matrix(mutator, user_options, opponent_options, depth=2, prune=Tr
     # this is a special case in a random battle where the opponent's pokemon has fainted, but the opponent still
     # has reserves left that are unseen
     if opponent_options == [constants.DO_NOTHING_MOVE] and mutator.state.opponent.active.hp == 0:
-        return {(user_option, constants.DO_NOTHING_MOVE): evaluate(mutator.state) for user_option in user_options}
+        return {(user_option, constants.DO_NOTHING_MOVE): mutator.evaluate() for user_option in user_options}
+
+    record = instrumentation.current_record
+    if record is not None:
+        record.node(depth + 1, len(user_options), len(opponent_options))
+
+    # the order only matters when rows can be pruned
+    # the move ordering is given the depth of this node - not the depth of the nodes below it
+    searched_user_options = user_options
+    if prune and move_ordering is not None:
+        searched_user_options = move_ordering.order_user_options(mutator, user_options)
+        opponent_options = move_ordering.order_opponent_options(opponent_options, depth + 1)
 
     state_scores = dict()
 
+    # the highest score any state below this one can have - only calculated if it is needed
+    maximum_score = None
+
     best_score = float('-inf')
-    for i, user_move in enumerate(user_options):
+    best_user_move = None
+    for i, user_move in enumerate(searched_user_options):
         worst_score_for_this_row = float('inf')
         skip = False
 
@@ -96,39 +172,157 @@ def get_payoff_matrix(mutator, user_options, opponent_options, depth=2, prune=Tr
         for j, opponent_move in enumerate(opponent_options[:]):
             if skip:
                 state_scores[(user_move, opponent_move)] = float('nan')
+                if move_ordering is not None:
+                    move_ordering.pruned += 1
+                if record is not None:
+                    record.count('move_combinations_pruned')
                 continue
 
+            if move_ordering is not None:
+                move_ordering.searched += 1
+            if record is not None:
+                record.count('move_combinations_searched')
+
             score = 0
+            cut = False
             state_instructions = get_all_state_instructions(mutator, user_move, opponent_move)
+
+            # the probability of the outcomes after each outcome
+            # once even the best score for all of them cannot bring this move combination up to `best_score`
+            # the row is going to be pruned and the rest of the outcomes do not need to be searched
+            remaining_percentages = None
+            if cut_chance_outcomes and best_score > float('-inf') and len(state_instructions) > 1:
+                if maximum_score is None:
+                    maximum_score = get_maximum_score(mutator.state) + WON_BATTLE * depth
+                remaining_percentages = get_remaining_percentages(state_instructions)
+
             if depth == 0:
-                for instructions in state_instructions:
-                    mutator.apply(instructions.instructions)
-                    t_score = evaluate(mutator.state)
+                for k, instructions in enumerate(state_instructions):
+                    mutator.apply_compiled(instructions.compiled_instructions)
+                    t_score = mutator.evaluate()
                     score += (t_score * instructions.percentage)
-                    mutator.reverse(instructions.instructions)
+                    mutator.reverse_compiled(instructions.compiled_instructions)
+
+                    if remaining_percentages is not None and remaining_percentages[k]:
+                        highest_possible_score = score + remaining_percentages[k] * maximum_score
+                        if highest_possible_score < best_score:
+                            score = highest_possible_score
+                            cut = True
+                            if record is not None:
+                                record.count('chance_branch_cutoffs')
+                            break
 
             else:
-                for instructions in state_instructions:
+                for k, instructions in enumerate(state_instructions):
                     this_percentage = instructions.percentage
-                    mutator.apply(instructions.instructions)
-                    next_turn_user_options, next_turn_opponent_options = mutator.state.get_all_options()
-                    safest = pick_safest(get_payoff_matrix(mutator, next_turn_user_options, next_turn_opponent_options, depth=depth, prune=prune))
-                    score += safest[1] * this_percentage
-                    mutator.reverse(instructions.instructions)
+                    mutator.apply_compiled(instructions.compiled_instructions)
 
-            state_scores[(user_move, opponent_move)] = score
+                    # the instructions must be reversed even if the search is stopped by the deadline
+                    try:
+                        next_turn_user_options, next_turn_opponent_options = mutator.state.get_all_options()
+                        safest = pick_safest(
+                            _get_cached_payoff_matrix(mutator, next_turn_user_options, next_turn_opponent_options, depth, prune, prune, transposition_table, deadline, move_ordering),
+                            exclude_pruned_rows=True
+                        )
+                        score += safest[1] * this_percentage
+                    finally:
+                        mutator.reverse_compiled(instructions.compiled_instructions)
+
+                    if remaining_percentages is not None and remaining_percentages[k]:
+                        highest_possible_score = score + remaining_percentages[k] * maximum_score
+                        if highest_possible_score < best_score:
+                            score = highest_possible_score
+                            cut = True
+                            if record is not None:
+                                record.count('chance_branch_cutoffs')
+                            break
+
+            # the score of a move combination whose outcomes were cut is only an upper bound - it is pruned like the rest of its row
+            state_scores[(user_move, opponent_move)] = float('nan') if cut else score
 
             if score < worst_score_for_this_row:
                 worst_score_for_this_row = score
 
             if prune and score < best_score:
                 skip = True
+                if move_ordering is not None:
+                    move_ordering.record_prune(opponent_move, depth + 1)
 
                 # MOST of the time in pokemon, an opponent's move that causes a prune will cause a prune elsewhere
                 # move this item to the front of the list to prune faster
                 opponent_options = move_item_to_front_of_list(opponent_options, opponent_move)
 
+        if worst_score_for_this_row > best_score:
+            best_score = worst_score_for_this_row
+            best_user_move = user_move
+
+    if prune and move_ordering is not None and best_user_move is not None:
+        move_ordering.record_best_option(best_user_move, depth + 1)
+
+    if searched_user_options is not user_options:
+        # the rows are given back in the order of `user_options` so ties are broken the same way as without the ordering
+        return dict(sorted(state_scores.items(), key=lambda x: user_options.index(x[0][0])))
+
+    return state_scores
+
+
+def merge_payoff_matrix_rows(rows, user_options, opponent_options, prune=True):
+    """Combines payoff matrices that were each searched with a single user option into one payoff matrix
+
+    Each row must have been searched on its own so none of its entries were pruned.
+    If `prune` is True the pruning done by `get_payoff_matrix` is replayed so that the result is identical
+    to searching every user option at once"""
+    all_scores = dict()
+    for user_move in user_options:
+        all_scores.update(rows[user_move])
+
+    # the root was a special case (i.e. the battle is over) and did not produce an entry for each move combination
+    expected_move_combinations = {(u, o) for u in user_options for o in opponent_options}
+    if not prune or set(all_scores) != expected_move_combinations:
+        return all_scores
+
+    state_scores = dict()
+    best_score = float('-inf')
+    for user_move in user_options:
+        worst_score_for_this_row = float('inf')
+        skip = False
+        for opponent_move in opponent_options[:]:
+            if skip:
+                state_scores[(user_move, opponent_move)] = float('nan')
+                continue
+
+            score = all_scores[(user_move, opponent_move)]
+            state_scores[(user_move, opponent_move)] = score
+
+            if score < worst_score_for_this_row:
+                worst_score_for_this_row = score
+
+            if score < best_score:
+                skip = True
+                opponent_options = move_item_to_front_of_list(opponent_options, opponent_move)
+
         if worst_score_for_this_row > best_score:
             best_score = worst_score_for_this_row
 
     return state_scores
+
+
+def search_with_time_budget(search_function, max_depth, time_budget):
+    """Iterative-deepening: calls `search_function(depth, deadline)` for depth = 1, 2, ... `max_depth`
+    until `time_budget` seconds have passed. The result of the deepest search that finished is returned
+    along with its depth
+
+    The depth 1 search is always allowed to finish so that there is a result to return"""
+    deadline = time.time() + time_budget
+
+    result = search_function(1, None)
+    depth_searched = 1
+    for depth in range(2, max_depth + 1):
+        try:
+            result = search_function(depth, deadline)
+        except SearchTimeoutError:
+            break
+        depth_searched = depth
+
+    return result, depth_searched
+
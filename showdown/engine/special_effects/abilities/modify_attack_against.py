@@ -358,7 +358,7 @@ def weakarmor(attacking_move, attacking_pokemon, defending_pokemon):
 def liquidooze(attacking_move, attacking_pokemon, defending_pokemon):
     if constants.DRAIN in attacking_move:
         attacking_move = attacking_move.copy()
-        attacking_move[constants.DRAIN] = attacking_move[constants.DRAIN].copy()
+        attacking_move[constants.DRAIN] = list(attacking_move[constants.DRAIN])
         attacking_move[constants.DRAIN][0] *= -1
 
     return attacking_move
@@ -0,0 +1,40 @@
+from .lru_cache import LRUCache
+
+
+# the state hash has 128 bits - the low bits are part of the key and the high bits verify the entry
+KEY_BITS = 64
+KEY_MASK = (1 << KEY_BITS) - 1
+
+
+class TranspositionTable(LRUCache):
+    """A bounded cache of payoff matrices that have already been searched
+
+    Entries are keyed by the hash of the state (see `StateMutator.state_hash`), the remaining
+    depth, and the options that were searched. Different move orders and damage rolls often
+    lead to the same state, so the same sub-matrix does not need to be expanded twice.
+
+    Only the low bits of the state hash are part of the key. The rest of the hash is stored with
+    the entry as its verification key and an entry whose verification key does not match is a miss
+
+    When `max_size` entries are stored the least-recently-used entry is evicted"""
+
+    @staticmethod
+    def make_key(mutator, user_options, opponent_options, depth, prune, cut_chance_outcomes=False):
+        return mutator.state_hash & KEY_MASK, depth, prune, cut_chance_outcomes, tuple(user_options), tuple(opponent_options)
+
+    @staticmethod
+    def make_verification_key(mutator):
+        return mutator.state_hash >> KEY_BITS
+
+    def get(self, key, verification_key):
+        entry = self.table.get(key)
+        if entry is None or entry[0] != verification_key:
+            self.misses += 1
+            return None
+
+        self.table.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, verification_key, payoff_matrix):
+        super().put(key, (verification_key, payoff_matrix))
@@ -0,0 +1,164 @@
+import asyncio
+import pickle
+import logging
+import concurrent.futures
+
+import data
+import config
+import constants
+from data.mods.apply_mods import apply_mods
+from showdown.engine.evaluate import Scoring
+from showdown.engine.instrumentation import find_best_move_with_instrumentation
+
+
+logger = logging.getLogger(__name__)
+
+
+# started once by `start_engine_pool` and used for every decision after that
+# each worker is its own executor so that every decision in a battle is computed by the same worker
+_engine_workers = []
+
+# battle_tag -> the index of the worker that computes the decisions of that battle
+_battle_workers = dict()
+
+# set in an engine worker process the first time it picks a move
+_worker_initialized = False
+_default_pokemon_sets = None
+
+
+def serialize_battle(battle):
+    # a pickled battle is much cheaper to produce than a deepcopy and can be sent to another process
+    return pickle.dumps(battle, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def deserialize_battle(serialized_battle):
+    return pickle.loads(serialized_battle)
+
+
+def _get_config_values():
+    return {
+        k: v for k, v in vars(config).items()
+        if not k.startswith('_') and isinstance(v, (str, int, float, bool, type(None)))
+    }
+
+
+def _get_opponent_pokemon_sets(battle):
+    # only the opponent's pokemon are looked up in the sets, under their own name, a prefix of it, or a mega-evolution of it
+    # the keys keep their order so that a prefix lookup finds the same sets as it would in all of them
+    names = {p.name for p in [battle.opponent.active] + battle.opponent.reserve if p is not None}
+    return {
+        k: v for k, v in data.pokemon_sets.items()
+        if any(n.startswith(k) or k.startswith(n) for n in names)
+    }
+
+
+def _get_decision_settings(battle):
+    # module-level values that a decision depends on but are not part of the battle
+    # the usage-stats sets of a standard battle are only known after the worker processes are started
+    if battle.battle_type == constants.STANDARD_BATTLE:
+        pokemon_sets = _get_opponent_pokemon_sets(battle)
+    else:
+        pokemon_sets = None
+    return _get_config_values(), Scoring.POKEMON_ALIVE_STATIC, pokemon_sets
+
+
+def _apply_decision_settings(decision_settings):
+    global _worker_initialized
+    global _default_pokemon_sets
+
+    config_values, Scoring.POKEMON_ALIVE_STATIC, pokemon_sets = decision_settings
+    for name, value in config_values.items():
+        setattr(config, name, value)
+
+    # an engine worker cannot start processes of its own
+    config.search_processes = 1
+
+    if not _worker_initialized:
+        apply_mods(config.pokemon_mode)
+        _default_pokemon_sets = data.pokemon_sets
+        _worker_initialized = True
+
+    data.pokemon_sets = pokemon_sets if pokemon_sets is not None else _default_pokemon_sets
+
+
+def find_best_move_from_serialized_battle(serialized_battle, decision_settings=None):
+    if decision_settings is not None:
+        _apply_decision_settings(decision_settings)
+
+    battle = deserialize_battle(serialized_battle)
+    if battle.request_json:
+        battle.user.from_json(battle.request_json)
+
+    return find_best_move_with_instrumentation(battle)
+
+
+def _warm_up_worker(decision_settings):
+    _apply_decision_settings(decision_settings)
+
+
+def start_engine_pool():
+    """Starts the engine workers that every decision is computed in
+
+    With ENGINE_PROCESSES > 0 each worker is a separate process. They are started here so that
+    the move and pokedex data is already loaded by the time the first decision is needed.
+    With ENGINE_PROCESSES = 0 decisions are computed in a single thread of this process"""
+    if _engine_workers:
+        return _engine_workers
+
+    if config.engine_processes > 0:
+        if config.search_processes > 1:
+            logger.warning(
+                "SEARCH_PROCESSES={} is ignored because moves are picked in engine processes, which cannot "
+                "start processes of their own. Set ENGINE_PROCESSES=0 to search with several processes".format(config.search_processes)
+            )
+        logger.debug("Starting {} engine processes".format(config.engine_processes))
+        _engine_workers.extend(concurrent.futures.ProcessPoolExecutor(max_workers=1) for _ in range(config.engine_processes))
+        decision_settings = (_get_config_values(), Scoring.POKEMON_ALIVE_STATIC, None)
+        for f in [worker.submit(_warm_up_worker, decision_settings) for worker in _engine_workers]:
+            f.result()
+    else:
+        _engine_workers.append(concurrent.futures.ThreadPoolExecutor(max_workers=1))
+
+    return _engine_workers
+
+
+def shutdown_engine_pool():
+    for worker in _engine_workers:
+        worker.shutdown(wait=True)
+    del _engine_workers[:]
+    _battle_workers.clear()
+
+
+def _get_battle_worker(battle_tag):
+    # what a worker keeps between decisions, such as the mcts bot's search trees, is only there for
+    # the battles it has computed before, so a battle stays with one worker
+    # a new battle is given to the worker with the fewest battles
+    try:
+        return _engine_workers[_battle_workers[battle_tag]]
+    except KeyError:
+        battle_counts = [0] * len(_engine_workers)
+        for worker_index in _battle_workers.values():
+            battle_counts[worker_index] += 1
+        _battle_workers[battle_tag] = battle_counts.index(min(battle_counts))
+        return _engine_workers[_battle_workers[battle_tag]]
+
+
+def finish_battle(battle_tag):
+    _battle_workers.pop(battle_tag, None)
+
+
+async def async_find_best_move(battle):
+    """Computes `battle.find_best_move()` in the engine pool without modifying `battle`
+
+    Cancelling the task awaiting this cancels the decision. A decision that has not started is never run
+    and one that is already running finishes in its worker but the result is thrown away"""
+    start_engine_pool()
+    worker = _get_battle_worker(battle.battle_tag)
+    serialized_battle = serialize_battle(battle)
+    if isinstance(worker, concurrent.futures.ProcessPoolExecutor):
+        decision_settings = _get_decision_settings(battle)
+    else:
+        decision_settings = None
+
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(worker, find_best_move_from_serialized_battle, serialized_battle, decision_settings)
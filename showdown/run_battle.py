@@ -1,24 +1,29 @@
+import asyncio
 import importlib
 import json
-import asyncio
-import concurrent.futures
 from copy import deepcopy
 import logging
 
 import data
-from data.helpers import get_standard_battle_sets
+from data.helpers import async_get_standard_battle_sets
 import constants
 import config
 from showdown.engine.evaluate import Scoring
 from showdown.battle import Pokemon
 from showdown.battle import LastUsedMove
 from showdown.battle_modifier import async_update_battle
+from showdown.engine_pool import async_find_best_move
+from showdown.engine_pool import finish_battle
 
 from showdown.websocket_client import PSWebsocketClient
 
 logger = logging.getLogger(__name__)
 
 
+# the usage-stats sets of every standard battle's opponent
+standard_battle_sets = dict()
+
+
 def battle_is_finished(battle_tag, msg):
     return (
         msg.startswith(">{}".format(battle_tag)) and
@@ -28,15 +33,7 @@ def battle_is_finished(battle_tag, msg):
 
 
 async def async_pick_move(battle):
-    battle_copy = deepcopy(battle)
-    if battle_copy.request_json:
-        battle_copy.user.from_json(battle_copy.request_json)
-
-    loop = asyncio.get_event_loop()
-    with concurrent.futures.ThreadPoolExecutor() as pool:
-        best_move = await loop.run_in_executor(
-            pool, battle_copy.find_best_move
-        )
+    best_move = await async_find_best_move(battle)
     choice = best_move[0]
     if constants.SWITCH_STRING in choice:
         battle.user.last_used_move = LastUsedMove(battle.user.active.name, "switch {}".format(choice.split()[-1]), battle.turn)
@@ -150,11 +147,14 @@ async def start_standard_battle(ps_websocket_client: PSWebsocketClient, pokemon_
 
         battle.initialize_team_preview(user_json, opponent_pokemon)
 
-        smogon_usage_data = get_standard_battle_sets(
+        smogon_usage_data = await async_get_standard_battle_sets(
             pokemon_battle_type,
             pokemon_names=[p.name for p in battle.opponent.reserve]
         )
-        data.pokemon_sets = smogon_usage_data
+
+        # other battles in the same format may still be running so their opponents' sets are kept
+        standard_battle_sets.update(smogon_usage_data)
+        data.pokemon_sets = standard_battle_sets
 
         await handle_team_preview(battle, ps_websocket_client)
 
@@ -176,19 +176,44 @@ async def start_battle(ps_websocket_client, pokemon_battle_type):
 
 async def pokemon_battle(ps_websocket_client, pokemon_battle_type):
     battle = await start_battle(ps_websocket_client, pokemon_battle_type)
-    while True:
-        msg = await ps_websocket_client.receive_message()
-        if battle_is_finished(battle.battle_tag, msg):
-            if constants.WIN_STRING in msg:
-                winner = msg.split(constants.WIN_STRING)[-1].split('\n')[0].strip()
-            else:
-                winner = None
-            logger.debug("Winner: {}".format(winner))
-            await ps_websocket_client.send_message(battle.battle_tag, [config.battle_ending_message])
-            await ps_websocket_client.leave_battle(battle.battle_tag, save_replay=config.save_replay)
-            return winner
-        else:
+
+    # messages are read while a move is being picked so that the decision can be cancelled if the battle ends
+    message = asyncio.ensure_future(ps_websocket_client.receive_message())
+    decision = None
+    try:
+        while True:
+            done, _ = await asyncio.wait([t for t in (message, decision) if t is not None], return_when=asyncio.FIRST_COMPLETED)
+
+            if decision in done:
+                best_move = decision.result()
+                decision = None
+                await ps_websocket_client.send_message(battle.battle_tag, best_move)
+
+            if message not in done:
+                continue
+
+            msg = message.result()
+            if battle_is_finished(battle.battle_tag, msg):
+                if constants.WIN_STRING in msg:
+                    winner = msg.split(constants.WIN_STRING)[-1].split('\n')[0].strip()
+                else:
+                    winner = None
+                logger.debug("Winner: {}".format(winner))
+                if decision is not None:
+                    decision.cancel()
+                await ps_websocket_client.send_message(battle.battle_tag, [config.battle_ending_message])
+                await ps_websocket_client.leave_battle(battle.battle_tag, save_replay=config.save_replay)
+                return winner
+
             action_required = await async_update_battle(battle, msg)
             if action_required and not battle.wait:
-                best_move = await async_pick_move(battle)
-                await ps_websocket_client.send_message(battle.battle_tag, best_move)
+                # a new request replaces a decision that has not been sent yet
+                if decision is not None:
+                    decision.cancel()
+                decision = asyncio.ensure_future(async_pick_move(battle))
+            message = asyncio.ensure_future(ps_websocket_client.receive_message())
+    finally:
+        message.cancel()
+        if decision is not None:
+            decision.cancel()
+        finish_battle(battle.battle_tag)
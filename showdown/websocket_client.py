@@ -16,6 +16,9 @@ class SaveReplayError(Exception):
     pass
 
 
+SAVE_REPLAY_RESPONSE = "|queryresponse|savereplay|"
+
+
 class PSWebsocketClient:
 
     websocket = None
@@ -161,8 +164,8 @@ class PSWebsocketClient:
 
         while True:
             msg = await self.receive_message()
-            if msg.startswith("|queryresponse|savereplay|"):
-                obj = json.loads(msg.replace("|queryresponse|savereplay|", ""))
+            if msg.startswith(SAVE_REPLAY_RESPONSE):
+                obj = json.loads(msg.replace(SAVE_REPLAY_RESPONSE, ""))
                 log = obj['log']
                 identifier = obj['id']
                 post_response = requests.post(
@@ -175,3 +178,78 @@ class PSWebsocketClient:
                 if post_response.status_code != 200:
                     raise SaveReplayError("POST to save replay did not return a 200: {}".format(post_response.content))
                 break
+
+
+class PSRoomConnection(PSWebsocketClient):
+    """Sends messages with a shared PSWebsocketClient and receives the messages that
+    a MessageRouter routed to one room (a battle or everything outside of a battle)"""
+
+    def __init__(self, ps_websocket_client, messages, battle_tag=None):
+        self.ps_websocket_client = ps_websocket_client
+        self.messages = messages
+        self.battle_tag = battle_tag
+        self.username = ps_websocket_client.username
+
+    async def receive_message(self):
+        message = await self.messages.get()
+        return message
+
+    async def send_message(self, room, message_list):
+        await self.ps_websocket_client.send_message(room, message_list)
+
+
+def get_battle_tag(message):
+    if message.startswith(">battle-"):
+        return message.split("\n", 1)[0][1:].strip()
+    elif message.startswith(SAVE_REPLAY_RESPONSE):
+        return "battle-{}".format(json.loads(message.replace(SAVE_REPLAY_RESPONSE, ""))['id'])
+    return None
+
+
+class MessageRouter:
+    """Reads every message from a PSWebsocketClient and puts it in the queue of the battle it belongs to
+    Messages that do not belong to a battle are put in a global queue"""
+
+    def __init__(self, ps_websocket_client):
+        self.ps_websocket_client = ps_websocket_client
+        self.global_messages = asyncio.Queue()
+        self.battle_messages = dict()
+        self.new_battles = asyncio.Queue()
+        self.finished_battles = set()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.route_messages())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def route_messages(self):
+        while True:
+            message = await self.ps_websocket_client.receive_message()
+            self.route_message(message)
+
+    def route_message(self, message):
+        battle_tag = get_battle_tag(message)
+        if battle_tag is None:
+            self.global_messages.put_nowait(message)
+        elif battle_tag in self.finished_battles:
+            logger.debug("Ignoring message for finished battle: {}".format(battle_tag))
+        else:
+            if battle_tag not in self.battle_messages:
+                self.battle_messages[battle_tag] = asyncio.Queue()
+                self.new_battles.put_nowait(battle_tag)
+            self.battle_messages[battle_tag].put_nowait(message)
+
+    def get_global_connection(self):
+        return PSRoomConnection(self.ps_websocket_client, self.global_messages)
+
+    async def get_new_battle_connection(self):
+        battle_tag = await self.new_battles.get()
+        return PSRoomConnection(self.ps_websocket_client, self.battle_messages[battle_tag], battle_tag=battle_tag)
+
+    def finish_battle(self, battle_tag):
+        self.battle_messages.pop(battle_tag, None)
+        self.finished_battles.add(battle_tag)
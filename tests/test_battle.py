@@ -1,7 +1,13 @@
 import unittest
 from unittest import mock
+from copy import deepcopy
 
 import constants
+import data
+from data.parse_smogon_stats import MOVES_STRING
+from data.parse_smogon_stats import SPREADS_STRING
+from data.parse_smogon_stats import ABILITY_STRING
+from data.parse_smogon_stats import ITEM_STRING
 
 from showdown.battle import LastUsedMove
 from showdown.battle import Battle
@@ -839,6 +845,121 @@ class TestBattlerActiveLockedIntoMove(unittest.TestCase):
         self.assertFalse(self.battler.active.get_move('doubleteam').disabled)
 
 
+class TestCloneForOpponentSet(unittest.TestCase):
+    def setUp(self):
+        self.battle = Battle(None)
+        self.battle.user.active = Pokemon('pikachu', 100)
+        self.battle.user.reserve = [Pokemon('caterpie', 100)]
+        self.battle.opponent.active = Pokemon('pikachu', 100)
+        self.battle.opponent.active.moves = [Move('thunderbolt')]
+        self.battle.opponent.reserve = [Pokemon('caterpie', 100)]
+
+    def test_opponent_active_pokemon_can_be_modified_without_changing_the_original(self):
+        clone = self.battle.clone_for_opponent_set()
+        clone.opponent.active.set_spread('modest', '0,0,0,252,4,252')
+        clone.opponent.active.item = 'lightball'
+        clone.opponent.active.add_move('surf')
+        clone.opponent.active.moves[0].disabled = True
+        clone.opponent.active.boosts[constants.SPEED] = 1
+
+        original = self.battle.opponent.active
+        self.assertEqual('serious', original.nature)
+        self.assertEqual(constants.UNKNOWN_ITEM, original.item)
+        self.assertEqual(['thunderbolt'], [m.name for m in original.moves])
+        self.assertFalse(original.moves[0].disabled)
+        self.assertEqual(0, original.boosts[constants.SPEED])
+        self.assertNotEqual(original.stats, clone.opponent.active.stats)
+
+    def test_everything_else_is_shared(self):
+        clone = self.battle.clone_for_opponent_set()
+
+        self.assertIs(self.battle.user, clone.user)
+        self.assertIs(self.battle.opponent.reserve, clone.opponent.reserve)
+        self.assertIsNot(self.battle.opponent, clone.opponent)
+
+    def test_state_is_the_same_as_a_deepcopy(self):
+        clone = self.battle.clone_for_opponent_set()
+
+        self.assertEqual(str(deepcopy(self.battle).create_state()), str(clone.create_state()))
+
+
+class TestPrepareWeightedBattles(unittest.TestCase):
+    def setUp(self):
+        self.battle = Battle(None)
+        self.battle.battle_type = constants.STANDARD_BATTLE
+        self.battle.generation = 'gen8'
+        self.battle.user.active = Pokemon('pikachu', 100)
+        self.battle.opponent.active = Pokemon('pikachu', 100)
+
+        pokemon_sets = {
+            'pikachu': {
+                SPREADS_STRING: [['serious', '0,252,0,0,4,252', 60.0], ['hardy', '0,252,0,0,4,252', 25.0], ['timid', '0,0,0,252,4,252', 15.0]],
+                ITEM_STRING: [('lightball', 70.0), ('choicescarf', 30.0)],
+                ABILITY_STRING: [('static', 100.0)],
+                MOVES_STRING: [('thunderbolt', 90.0), ('voltswitch', 50.0), ('grassknot', 40.0), ('surf', 30.0), ('nastyplot', 25.0)],
+            }
+        }
+        pokemon_sets_patch = mock.patch.object(data, 'pokemon_sets', pokemon_sets)
+        pokemon_sets_patch.start()
+        self.addCleanup(pokemon_sets_patch.stop)
+
+        pokemon_mode_patch = mock.patch('config.pokemon_mode', 'gen8ou')
+        pokemon_mode_patch.start()
+        self.addCleanup(pokemon_mode_patch.stop)
+
+    def get_sets(self, battles):
+        return [
+            (b.opponent.active.item, sorted(m.name for m in b.opponent.active.moves))
+            for b in battles
+        ]
+
+    def test_sets_are_in_descending_probability(self):
+        battles, weights = self.battle.prepare_weighted_battles(100)
+
+        expected_sets = [
+            ('lightball', ['grassknot', 'surf', 'thunderbolt', 'voltswitch']),
+            ('lightball', ['grassknot', 'nastyplot', 'thunderbolt', 'voltswitch']),
+            ('lightball', ['nastyplot', 'surf', 'thunderbolt', 'voltswitch']),
+            ('lightball', ['grassknot', 'nastyplot', 'surf', 'thunderbolt']),
+            ('choicescarf', ['grassknot', 'surf', 'thunderbolt', 'voltswitch']),
+        ]
+        self.assertEqual(expected_sets, self.get_sets(battles))
+        self.assertEqual(sorted(weights, reverse=True), weights)
+        self.assertAlmostEqual(1, sum(weights))
+
+    def test_spreads_with_the_same_stats_are_combined(self):
+        battles, weights = self.battle.prepare_weighted_battles(100)
+
+        # serious and hardy are both neutral natures so they give the same pokemon
+        self.assertEqual(10, len(self.battle.prepare_battles()))
+        self.assertEqual(5, len(battles))
+
+    def test_number_of_battles_is_capped(self):
+        battles, weights = self.battle.prepare_weighted_battles(2)
+
+        expected_sets = [
+            ('lightball', ['grassknot', 'surf', 'thunderbolt', 'voltswitch']),
+            ('lightball', ['grassknot', 'nastyplot', 'thunderbolt', 'voltswitch']),
+        ]
+        self.assertEqual(expected_sets, self.get_sets(battles))
+        self.assertAlmostEqual(0.06 / 0.11, weights[0])
+
+    def test_sets_stop_once_enough_probability_is_looked_at(self):
+        all_battles, _ = self.battle.prepare_weighted_battles(100)
+        battles, weights = self.battle.prepare_weighted_battles(100, min_probability=0.3)
+
+        self.assertLess(len(battles), len(all_battles))
+        self.assertAlmostEqual(1, sum(weights))
+
+    def test_battle_with_most_likely_attributes_is_returned_when_there_are_no_sets(self):
+        self.battle.opponent.active = Pokemon('caterpie', 100)
+
+        battles, weights = self.battle.prepare_weighted_battles(100)
+
+        self.assertEqual(1, len(battles))
+        self.assertEqual([1.0], weights)
+
+
 class TestBattle(unittest.TestCase):
     def setUp(self):
         self.battle = Battle(None)
@@ -11,9 +11,11 @@ import config
 import constants
 from collections import defaultdict
 from copy import deepcopy
+from showdown.engine import instrumentation
 from showdown.engine.objects import TransposeInstruction
 from showdown.engine.find_state_instructions import get_all_state_instructions
 from showdown.engine.find_state_instructions import remove_duplicate_instructions
+from showdown.engine.find_state_instructions import drop_unlikely_outcomes
 from showdown.engine.find_state_instructions import lookup_move
 from showdown.engine.find_state_instructions import user_moves_first
 from showdown.engine.objects import State
@@ -11770,6 +11772,241 @@ class TestRemoveDuplicateInstructions(unittest.TestCase):
 
         self.assertEqual(expected_instructions, new_instructions)
 
+    def test_combines_instructions_containing_lists(self):
+        instructions = [
+            TransposeInstruction(
+                0.25,
+                [
+                    (constants.MUTATOR_CHANGE_TYPE, constants.SELF, ['water'], ['normal'])
+                ],
+                False
+            ),
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_CHANGE_TYPE, constants.SELF, ['fire'], ['normal'])
+                ],
+                False
+            ),
+            TransposeInstruction(
+                0.25,
+                [
+                    (constants.MUTATOR_CHANGE_TYPE, constants.SELF, ['water'], ['normal'])
+                ],
+                False
+            )
+        ]
+
+        new_instructions = remove_duplicate_instructions(instructions)
+
+        expected_instructions = [
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_CHANGE_TYPE, constants.SELF, ['water'], ['normal'])
+                ],
+                False
+            ),
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_CHANGE_TYPE, constants.SELF, ['fire'], ['normal'])
+                ],
+                False
+            )
+        ]
+
+        self.assertEqual(expected_instructions, new_instructions)
+
+    def test_does_not_combine_instructions_in_a_different_order(self):
+        instructions = [
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_DAMAGE, constants.SELF, 5),
+                    (constants.MUTATOR_DAMAGE, constants.OPPONENT, 5)
+                ],
+                False
+            ),
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_DAMAGE, constants.OPPONENT, 5),
+                    (constants.MUTATOR_DAMAGE, constants.SELF, 5)
+                ],
+                False
+            )
+        ]
+
+        new_instructions = remove_duplicate_instructions(instructions)
+
+        self.assertEqual(instructions, new_instructions)
+
+    def get_mutator(self):
+        return StateMutator(
+            State(
+                Side(
+                    Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                    {"xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict())},
+                    (0, 0),
+                    defaultdict(lambda: 0)
+                ),
+                Side(
+                    Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                    {"yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict())},
+                    (0, 0),
+                    defaultdict(lambda: 0)
+                ),
+                None,
+                None,
+                False
+            )
+        )
+
+    def test_combines_instructions_in_a_different_order_that_lead_to_the_same_state(self):
+        mutator = self.get_mutator()
+        state_string = str(mutator.state)
+        instructions = [
+            TransposeInstruction(
+                0.25,
+                [
+                    (constants.MUTATOR_DAMAGE, constants.SELF, 5),
+                    (constants.MUTATOR_DAMAGE, constants.OPPONENT, 5)
+                ],
+                False
+            ),
+            TransposeInstruction(0.5, [(constants.MUTATOR_DAMAGE, constants.SELF, 10)], False),
+            TransposeInstruction(
+                0.25,
+                [
+                    (constants.MUTATOR_DAMAGE, constants.OPPONENT, 5),
+                    (constants.MUTATOR_DAMAGE, constants.SELF, 5)
+                ],
+                False
+            )
+        ]
+
+        new_instructions = remove_duplicate_instructions(instructions, mutator=mutator)
+
+        expected_instructions = [
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_DAMAGE, constants.SELF, 5),
+                    (constants.MUTATOR_DAMAGE, constants.OPPONENT, 5)
+                ],
+                False
+            ),
+            TransposeInstruction(0.5, [(constants.MUTATOR_DAMAGE, constants.SELF, 10)], False)
+        ]
+
+        self.assertEqual(expected_instructions, new_instructions)
+        self.assertEqual(state_string, str(mutator.state))
+
+    def test_does_not_combine_instructions_in_a_different_order_that_lead_to_different_states(self):
+        instructions = [
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_SWITCH, constants.SELF, 'raichu', 'xatu'),
+                    (constants.MUTATOR_DAMAGE, constants.SELF, 5)
+                ],
+                False
+            ),
+            TransposeInstruction(
+                0.5,
+                [
+                    (constants.MUTATOR_DAMAGE, constants.SELF, 5),
+                    (constants.MUTATOR_SWITCH, constants.SELF, 'raichu', 'xatu')
+                ],
+                False
+            )
+        ]
+
+        new_instructions = remove_duplicate_instructions(instructions, mutator=self.get_mutator())
+
+        self.assertEqual(instructions, new_instructions)
+
+
+class TestDropUnlikelyOutcomes(unittest.TestCase):
+    def test_drops_outcomes_below_the_threshold_and_scales_up_the_rest(self):
+        instructions = [
+            TransposeInstruction(0.6, [(constants.MUTATOR_DAMAGE, constants.SELF, 5)], False),
+            TransposeInstruction(0.3, [(constants.MUTATOR_DAMAGE, constants.SELF, 10)], False),
+            TransposeInstruction(0.1, [(constants.MUTATOR_DAMAGE, constants.SELF, 15)], False),
+        ]
+
+        new_instructions, dropped_percentage = drop_unlikely_outcomes(instructions, 0.2)
+
+        self.assertEqual(
+            [
+                [(constants.MUTATOR_DAMAGE, constants.SELF, 5)],
+                [(constants.MUTATOR_DAMAGE, constants.SELF, 10)],
+            ],
+            [i.instructions for i in new_instructions]
+        )
+        self.assertAlmostEqual(0.6 / 0.9, new_instructions[0].percentage)
+        self.assertAlmostEqual(0.3 / 0.9, new_instructions[1].percentage)
+        self.assertAlmostEqual(0.1, dropped_percentage)
+
+    def test_keeps_the_total_percentage_of_the_outcomes(self):
+        instructions = [
+            TransposeInstruction(0.3, [(constants.MUTATOR_DAMAGE, constants.SELF, 5)], False),
+            TransposeInstruction(0.1, [(constants.MUTATOR_DAMAGE, constants.SELF, 10)], False),
+        ]
+
+        new_instructions, _ = drop_unlikely_outcomes(instructions, 0.2)
+
+        self.assertEqual(1, len(new_instructions))
+        self.assertAlmostEqual(0.4, new_instructions[0].percentage)
+
+    def test_keeps_the_most_likely_outcome_when_every_outcome_is_below_the_threshold(self):
+        instructions = [
+            TransposeInstruction(0.4, [(constants.MUTATOR_DAMAGE, constants.SELF, 5)], False),
+            TransposeInstruction(0.35, [(constants.MUTATOR_DAMAGE, constants.SELF, 10)], False),
+            TransposeInstruction(0.25, [(constants.MUTATOR_DAMAGE, constants.SELF, 15)], False),
+        ]
+
+        new_instructions, dropped_percentage = drop_unlikely_outcomes(instructions, 0.5)
+
+        self.assertEqual([[(constants.MUTATOR_DAMAGE, constants.SELF, 5)]], [i.instructions for i in new_instructions])
+        self.assertAlmostEqual(1, new_instructions[0].percentage)
+        self.assertAlmostEqual(0.6, dropped_percentage)
+
+    def test_does_nothing_when_every_outcome_is_above_the_threshold(self):
+        instructions = [
+            TransposeInstruction(0.5, [(constants.MUTATOR_DAMAGE, constants.SELF, 5)], False),
+            TransposeInstruction(0.5, [(constants.MUTATOR_DAMAGE, constants.SELF, 10)], False),
+        ]
+
+        new_instructions, dropped_percentage = drop_unlikely_outcomes(instructions, 0.2)
+
+        self.assertIs(instructions, new_instructions)
+        self.assertEqual(0, dropped_percentage)
+
+    def test_dropped_outcome_is_merged_into_the_outcome_with_the_most_instructions_in_common(self):
+        instructions = [
+            TransposeInstruction(0.5, [(constants.MUTATOR_DAMAGE, constants.OPPONENT, 50)], False),
+            TransposeInstruction(0.4, [(constants.MUTATOR_DAMAGE, constants.OPPONENT, 40)], False),
+            TransposeInstruction(0.1, [(constants.MUTATOR_DAMAGE, constants.OPPONENT, 40), (constants.MUTATOR_APPLY_STATUS, constants.OPPONENT, constants.FROZEN)], False),
+        ]
+
+        new_instructions, dropped_percentage = drop_unlikely_outcomes(instructions, 0.2, merge_into_nearest=True)
+
+        self.assertEqual([0.5, 0.5], [i.percentage for i in new_instructions])
+        self.assertAlmostEqual(0.1, dropped_percentage)
+
+    def test_dropped_outcome_with_nothing_in_common_is_merged_into_the_most_likely_outcome(self):
+        instructions = [
+            TransposeInstruction(0.4, [(constants.MUTATOR_DAMAGE, constants.OPPONENT, 40)], False),
+            TransposeInstruction(0.5, [(constants.MUTATOR_DAMAGE, constants.OPPONENT, 50)], False),
+            TransposeInstruction(0.1, [(constants.MUTATOR_APPLY_STATUS, constants.OPPONENT, constants.FROZEN)], False),
+        ]
+
+        new_instructions, _ = drop_unlikely_outcomes(instructions, 0.2, merge_into_nearest=True)
+
+        self.assertEqual([0.4, 0.6], [i.percentage for i in new_instructions])
+
 
 class TestUserMovesFirst(unittest.TestCase):
     def setUp(self):
@@ -4,6 +4,7 @@ from collections import defaultdict
 import constants
 from showdown.engine.damage_calculator import _calculate_damage
 from showdown.engine.damage_calculator import calculate_damage
+from showdown.engine.damage_calculator import calculate_damage_for_moves
 from showdown.engine.objects import State
 from showdown.engine.objects import Side
 from showdown.engine.objects import Pokemon
@@ -359,3 +360,11 @@ class TestCalculateDamage(unittest.TestCase):
         )
 
         self.assertNotEqual(0, damage_amounts[0])
+
+    def test_damage_for_moves_matches_calculate_damage(self):
+        self.state.self.active.ability = 'levitate'
+        moves = ['earthquake', 'hydropump', 'rapidspin', 'protect']
+
+        expected = [calculate_damage(self.state, constants.SELF, move, 'earthquake') for move in moves]
+
+        self.assertEqual(expected, calculate_damage_for_moves(self.state, constants.SELF, moves, 'earthquake'))
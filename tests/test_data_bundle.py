@@ -0,0 +1,117 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import constants
+import data
+from data import bundle
+from data.bundle import load_bundle
+from data.read_only import ReadOnlyDict
+from data.read_only import freeze
+from data.mods.apply_mods import build_generation_data
+from data.mods.apply_mods import load_generation_data
+
+
+class TestLoadBundle(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source_file = os.path.join(self.directory, 'source.json')
+        with open(self.source_file, 'w') as f:
+            f.write('{"a": 1}')
+
+        self.bundle_directory_patch = mock.patch.object(bundle, 'BUNDLE_DIRECTORY', os.path.join(self.directory, 'bundles'))
+        self.bundle_directory_patch.start()
+
+        self.build = mock.Mock(side_effect=lambda: data.load_json(self.source_file))
+
+    def tearDown(self):
+        self.bundle_directory_patch.stop()
+        shutil.rmtree(self.directory)
+
+    def test_bundle_is_built_the_first_time_it_is_loaded(self):
+        self.assertEqual({'a': 1}, load_bundle('test', [self.source_file], self.build))
+        self.assertEqual(1, self.build.call_count)
+
+    def test_saved_bundle_is_used_when_the_source_files_have_not_changed(self):
+        load_bundle('test', [self.source_file], self.build)
+
+        self.assertEqual({'a': 1}, load_bundle('test', [self.source_file], self.build))
+        self.assertEqual(1, self.build.call_count)
+
+    def test_bundle_is_rebuilt_when_a_source_file_changes(self):
+        load_bundle('test', [self.source_file], self.build)
+        with open(self.source_file, 'w') as f:
+            f.write('{"a": 2}')
+
+        self.assertEqual({'a': 2}, load_bundle('test', [self.source_file], self.build))
+        self.assertEqual(2, self.build.call_count)
+
+    def test_unreadable_bundle_is_rebuilt(self):
+        load_bundle('test', [self.source_file], self.build)
+        with open(bundle.get_bundle_path('test'), 'wb') as f:
+            f.write(b'not a pickle')
+
+        self.assertEqual({'a': 1}, load_bundle('test', [self.source_file], self.build))
+        self.assertEqual(2, self.build.call_count)
+
+
+class TestLoadGenerationData(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bundle_directory_patch = mock.patch.object(bundle, 'BUNDLE_DIRECTORY', self.directory)
+        self.bundle_directory_patch.start()
+
+    def tearDown(self):
+        self.bundle_directory_patch.stop()
+        shutil.rmtree(self.directory)
+
+    def test_loaded_generation_data_is_identical_to_building_it(self):
+        load_generation_data('gen4ou')
+        self.assertEqual(build_generation_data(4, True), load_generation_data('gen4ou'))
+
+    def test_gen3_moves_use_the_physical_special_split_by_type(self):
+        move_json, _, _ = load_generation_data('gen3ou')
+        self.assertEqual(constants.SPECIAL, move_json['crunch'][constants.CATEGORY])
+
+    def test_current_generation_data_is_not_modified(self):
+        move_json, pokedex, random_battle_sets = load_generation_data('gen8ou')
+
+        self.assertEqual(data.build_base_bundle(), (move_json, pokedex, random_battle_sets))
+
+
+class TestReadOnlyData(unittest.TestCase):
+    def test_move_records_cannot_be_modified(self):
+        with self.assertRaises(TypeError):
+            data.all_move_json['tackle'][constants.BASE_POWER] = 100
+        with self.assertRaises(TypeError):
+            data.all_move_json['tackle'][constants.FLAGS].pop(constants.CONTACT)
+
+    def test_pokedex_records_cannot_be_modified(self):
+        with self.assertRaises(TypeError):
+            data.pokedex['pikachu'][constants.BASESTATS][constants.SPEED] = 200
+        with self.assertRaises(AttributeError):
+            data.pokedex['pikachu'][constants.TYPES].append('water')
+
+    def test_copy_of_a_record_can_be_modified(self):
+        move = data.all_move_json['tackle'].copy()
+        move[constants.BASE_POWER] = 100
+
+        self.assertEqual(100, move[constants.BASE_POWER])
+        self.assertEqual(40, data.all_move_json['tackle'][constants.BASE_POWER])
+
+    def test_freeze_makes_nested_values_read_only(self):
+        frozen = freeze({'a': {'b': [1, {'c': 2}]}})
+
+        self.assertIsInstance(frozen['a'], ReadOnlyDict)
+        self.assertEqual((1, {'c': 2}), frozen['a']['b'])
+        self.assertIsInstance(frozen['a']['b'][1], ReadOnlyDict)
+
+    def test_pickled_record_is_still_read_only(self):
+        move = pickle.loads(pickle.dumps(data.all_move_json['tackle']))
+
+        self.assertEqual(data.all_move_json['tackle'], move)
+        with self.assertRaises(TypeError):
+            move[constants.BASE_POWER] = 100
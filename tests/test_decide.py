@@ -1,8 +1,13 @@
 import unittest
 from unittest import mock
 
+import config
 from showdown.engine.select_best_move import pick_safest
+from showdown.battle_bots.helpers import get_search_time_budget
+from showdown.battle_bots.helpers import TIME_REMAINING_SEARCH_FRACTION
 from showdown.battle_bots.nash_equilibrium.main import get_weighted_choices_from_multiple_score_lookups
+from showdown.battle_bots.nash_equilibrium.main import solve_zero_sum_game
+from showdown.battle_bots.nash_equilibrium.main import find_nash_equilibrium
 
 
 class TestPickSafest(unittest.TestCase):
@@ -56,6 +61,19 @@ class TestPickSafest(unittest.TestCase):
         self.assertEqual(expected_result, safest)
 
 
+    def test_row_with_a_pruned_entry_is_excluded_when_asked(self):
+        score_lookup = {
+            ("a", "x"): 100,
+            ("a", "y"): -100,
+            ("c", "x"): 200,
+            ("c", "y"): float('nan'),
+            ("e", "x"): 50,
+            ("e", "y"): -300,
+        }
+
+        self.assertEqual((("c", "x"), 200), pick_safest(score_lookup))
+        self.assertEqual((("a", "y"), -100), pick_safest(score_lookup, exclude_pruned_rows=True))
+
 class TestGetWeightedChoices(unittest.TestCase):
     def setUp(self):
         self.find_nash_equilibrium_patch = mock.patch('showdown.battle_bots.nash_equilibrium.main.find_nash_equilibrium')
@@ -165,3 +183,125 @@ class TestGetWeightedChoices(unittest.TestCase):
         expected_choices = [('a', 0.75), ('b', 0.25)]
 
         self.assertEqual(expected_choices, choices)
+
+    def test_score_lookups_are_weighted(self):
+        self.find_nash_mock.side_effect = [
+            (['a', 'b'], ['c', 'd'], [1, 0], [0, 1], None),
+            (['a', 'b'], ['c', 'd'], [0, 1], [0, 1], None),
+        ]
+        sl = {
+            ('a', 'c'): 10,
+            ('a', 'd'): 10,
+            ('b', 'c'): -10,
+            ('b', 'd'): -10,
+        }
+
+        choices = get_weighted_choices_from_multiple_score_lookups([sl, sl], weights=[0.75, 0.25])
+
+        self.assertEqual([('a', 0.75), ('b', 0.25)], choices)
+
+
+class TestSolveZeroSumGame(unittest.TestCase):
+    def assertStrategyEqual(self, expected, actual):
+        self.assertEqual(len(expected), len(actual))
+        for e, a in zip(expected, actual):
+            self.assertAlmostEqual(e, a)
+
+    def test_rock_paper_scissors_is_uniformly_mixed(self):
+        matrix = [
+            [0, -1, 1],
+            [1, 0, -1],
+            [-1, 1, 0],
+        ]
+
+        row_strategy, column_strategy, value = solve_zero_sum_game(matrix)
+
+        self.assertStrategyEqual([1/3, 1/3, 1/3], row_strategy)
+        self.assertStrategyEqual([1/3, 1/3, 1/3], column_strategy)
+        self.assertAlmostEqual(0, value)
+
+    def test_unbalanced_two_by_two_game(self):
+        matrix = [
+            [3, -1],
+            [-2, 1],
+        ]
+
+        row_strategy, column_strategy, value = solve_zero_sum_game(matrix)
+
+        self.assertStrategyEqual([3/7, 4/7], row_strategy)
+        self.assertStrategyEqual([2/7, 5/7], column_strategy)
+        self.assertAlmostEqual(1/7, value)
+
+    def test_dominant_move_is_played_with_certainty(self):
+        matrix = [
+            [100, 200, 150],
+            [50, 100, 75],
+        ]
+
+        row_strategy, column_strategy, value = solve_zero_sum_game(matrix)
+
+        self.assertStrategyEqual([1, 0], row_strategy)
+        self.assertStrategyEqual([1, 0, 0], column_strategy)
+        self.assertAlmostEqual(100, value)
+
+    def test_game_with_tied_payoffs_returns_an_equilibrium(self):
+        matrix = [
+            [10, 10, 0],
+            [10, 10, 0],
+            [0, 0, 10],
+        ]
+
+        row_strategy, column_strategy, value = solve_zero_sum_game(matrix)
+
+        self.assertAlmostEqual(5, value)
+        self.assertAlmostEqual(1, sum(row_strategy))
+        self.assertAlmostEqual(1, sum(column_strategy))
+        for column in zip(*matrix):
+            self.assertGreaterEqual(sum(p * v for p, v in zip(row_strategy, column)) + 1e-9, value)
+        for row in matrix:
+            self.assertLessEqual(sum(q * v for q, v in zip(column_strategy, row)) - 1e-9, value)
+
+    def test_find_nash_equilibrium_from_score_lookup(self):
+        score_lookup = {
+            ("a", "x"): 3,
+            ("a", "y"): -1,
+            ("b", "x"): -2,
+            ("b", "y"): 1,
+        }
+
+        bot_choices, opponent_choices, bot_percentages, opponent_percentages, score = find_nash_equilibrium(score_lookup)
+
+        self.assertEqual(["a", "b"], list(bot_choices))
+        self.assertEqual(["x", "y"], list(opponent_choices))
+        self.assertStrategyEqual([3/7, 4/7], bot_percentages)
+        self.assertStrategyEqual([2/7, 5/7], opponent_percentages)
+        self.assertAlmostEqual(1/7, score)
+
+
+class TestGetSearchTimeBudget(unittest.TestCase):
+    def setUp(self):
+        self.battle = mock.Mock()
+        self.battle.time_remaining = None
+        self.original_search_time_budget = config.search_time_budget
+        config.search_time_budget = 10
+
+    def tearDown(self):
+        config.search_time_budget = self.original_search_time_budget
+
+    def test_returns_none_when_search_is_not_time_budgeted(self):
+        config.search_time_budget = None
+
+        self.assertIsNone(get_search_time_budget(self.battle))
+
+    def test_returns_configured_budget_when_turn_timer_is_unknown(self):
+        self.assertEqual(10, get_search_time_budget(self.battle))
+
+    def test_budget_is_reduced_when_turn_timer_is_low(self):
+        self.battle.time_remaining = 20
+
+        self.assertEqual(20 * TIME_REMAINING_SEARCH_FRACTION, get_search_time_budget(self.battle))
+
+    def test_budget_is_not_increased_when_turn_timer_is_high(self):
+        self.battle.time_remaining = 150
+
+        self.assertEqual(10, get_search_time_budget(self.battle))
@@ -0,0 +1,165 @@
+import os
+import json
+import tempfile
+import unittest
+
+import config
+import constants
+from benchmarks import engine_benchmark
+from showdown.engine.objects import State
+from showdown.engine.objects import Side
+from showdown.engine.objects import Pokemon
+from showdown.battle import Pokemon as StatePokemon
+
+
+def get_results(p50_ms, nodes=100, peak_rss_kb=1000):
+    return {
+        'corpus': {'sha1': 'abc'},
+        'settings': {'search_depth': 2},
+        'peak_rss_kb': peak_rss_kb,
+        'benchmarks': {
+            'get_payoff_matrix_depth_2': {'p50_ms': p50_ms, 'p99_ms': p50_ms, 'nodes': nodes, 'nodes_per_second': nodes / p50_ms}
+        }
+    }
+
+
+class TestEngineBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.original_pokemon_mode = config.pokemon_mode
+        config.pokemon_mode = 'gen8randombattle'
+
+        self.state = State(
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                            {
+                                "xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict()),
+                            },
+                            (0, 0),
+                            {constants.STEALTH_ROCK: 1}
+                        ),
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                            {
+                                "yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict()),
+                            },
+                            (0, 0),
+                            {}
+                        ),
+                        None,
+                        None,
+                        False
+                    )
+        self.state.self.active.moves = [{constants.ID: 'thunderbolt', constants.DISABLED: False, constants.CURRENT_PP: 16}]
+        self.state.opponent.active.moves = [{constants.ID: 'moonblast', constants.DISABLED: False, constants.CURRENT_PP: 16}]
+
+        self.position = {
+            'name': 'trick-room-1',
+            'category': 'trick-room',
+            'battle': {
+                'turn': 5,
+                'trick_room': True,
+                'user': {
+                    'active': {'name': 'conkeldurr', 'level': 80, 'moves': ['machpunch', 'facade'], 'item': 'flameorb', 'status': constants.BURN},
+                    'reserve': [{'name': 'reuniclus', 'level': 84, 'moves': ['psychic'], 'hp': 0.5}],
+                    'side_conditions': {constants.SPIKES: 2}
+                },
+                'opponent': {
+                    'active': {'name': 'hatterene', 'level': 80, 'moves': ['trickroom']},
+                }
+            }
+        }
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def tearDown(self):
+        config.pokemon_mode = self.original_pokemon_mode
+
+    def write_log(self, lines):
+        path = os.path.join(self.directory, 'bot.log')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_captured_state_is_the_state_that_was_logged(self):
+        log_line = "[DEBUG]    Searching through the state: {}".format(self.state)
+
+        captured_states = engine_benchmark.capture_states(["[DEBUG]    Safest: thunderbolt, 10", log_line, log_line])
+
+        self.assertEqual(1, len(captured_states))
+        self.assertEqual(str(self.state), str(State.from_dict(captured_states[0])))
+
+    def test_state_from_json_is_the_same_as_the_state_that_was_serialized(self):
+        state_dict = json.loads(json.dumps(engine_benchmark.capture_states(["Searching through the state: {}".format(self.state)])[0]))
+
+        self.assertEqual(str(self.state), str(engine_benchmark.state_from_dict(state_dict)))
+
+    def test_capture_adds_only_new_states_to_the_positions(self):
+        positions_path = os.path.join(self.directory, 'positions.json')
+        with open(positions_path, 'w') as f:
+            json.dump({'pokemon_mode': 'gen8randombattle', 'positions': [self.position]}, f)
+        log_path = self.write_log(["Searching through the state: {}".format(self.state)])
+
+        self.assertEqual(1, engine_benchmark.capture_positions(log_path, 'hazards', positions_path))
+        self.assertEqual(0, engine_benchmark.capture_positions(log_path, 'hazards', positions_path))
+
+        positions = engine_benchmark.load_corpus(positions_path)['positions']
+        self.assertEqual(['trick-room-1', 'hazards-captured-1'], [p['name'] for p in positions])
+        self.assertEqual(str(self.state), str(engine_benchmark.get_state(positions[1])))
+
+    def test_battle_is_created_from_its_description(self):
+        battle = engine_benchmark.create_battle(self.position)
+
+        self.assertTrue(battle.trick_room)
+        self.assertEqual(5, battle.turn)
+        self.assertEqual(2, battle.user.side_conditions[constants.SPIKES])
+        self.assertEqual(['machpunch', 'facade'], [m.name for m in battle.user.active.moves])
+        self.assertEqual(constants.BURN, battle.user.active.status)
+        self.assertEqual(round(battle.user.reserve[0].max_hp / 2), battle.user.reserve[0].hp)
+        self.assertEqual([1, 2], [battle.user.active.index, battle.user.reserve[0].index])
+        self.assertEqual(constants.UNKNOWN_ITEM, battle.opponent.active.item)
+
+    def test_every_position_has_a_state_that_can_be_searched(self):
+        for position in engine_benchmark.load_corpus()['positions']:
+            user_options, opponent_options = engine_benchmark.get_state(position).get_all_options()
+            self.assertTrue(user_options and opponent_options, position['name'])
+
+    def test_results_describe_each_benchmark(self):
+        results = engine_benchmark.run_benchmarks([self.position], ['evaluate', 'get_payoff_matrix_depth_1'], repeat=1)
+
+        evaluate_result = results['benchmarks']['evaluate']
+        self.assertEqual(200, evaluate_result['samples'])
+        self.assertLessEqual(evaluate_result['p50_ms'], evaluate_result['p99_ms'])
+        self.assertNotIn('nodes_per_second', evaluate_result)
+        self.assertEqual(1, results['benchmarks']['get_payoff_matrix_depth_1']['nodes'])
+        self.assertEqual({'evaluate', 'get_payoff_matrix_depth_1'}, set(results['positions']['trick-room-1']))
+        json.dumps(results)
+
+    def test_slower_median_than_the_baseline_is_a_regression(self):
+        _, regressions = engine_benchmark.compare_results(get_results(12), get_results(10), tolerance=0.1)
+
+        self.assertEqual(1, len(regressions))
+
+    def test_slower_median_within_the_tolerance_is_not_a_regression(self):
+        differences, regressions = engine_benchmark.compare_results(get_results(10.5), get_results(10), tolerance=0.1)
+
+        self.assertEqual([], regressions)
+        self.assertEqual(1.05, differences['get_payoff_matrix_depth_2']['p50_ms'])
+
+    def test_larger_peak_memory_than_the_baseline_is_a_regression(self):
+        _, regressions = engine_benchmark.compare_results(get_results(10, peak_rss_kb=1500), get_results(10), tolerance=0.1)
+
+        self.assertEqual(1, len(regressions))
+
+    def test_searching_a_different_number_of_nodes_than_the_baseline_is_warned_about(self):
+        warnings = engine_benchmark.get_comparison_warnings(get_results(10, nodes=90), get_results(10))
+
+        self.assertEqual(1, len(warnings))
+
+    def test_percentile_is_the_nearest_rank(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(50, engine_benchmark.percentile(values, 50))
+        self.assertEqual(99, engine_benchmark.percentile(values, 99))
+        self.assertEqual(7, engine_benchmark.percentile([7], 99))
@@ -0,0 +1,192 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import config
+import constants
+from showdown.battle import Pokemon
+from showdown.battle_bots.safest.main import BattleBot
+from showdown.engine_pool import serialize_battle
+from showdown.engine_pool import deserialize_battle
+from showdown.engine_pool import async_find_best_move
+from showdown.engine_pool import shutdown_engine_pool
+from showdown.engine_pool import start_engine_pool
+from showdown.engine_pool import finish_battle
+from showdown.engine_pool import _get_decision_settings
+from showdown.engine_pool import _get_battle_worker
+from showdown.run_battle import pokemon_battle
+
+
+class TestEnginePool(unittest.TestCase):
+    def setUp(self):
+        self.original_engine_processes = config.engine_processes
+        self.original_pokemon_mode = config.pokemon_mode
+        config.pokemon_mode = 'gen8randombattle'
+
+        self.loop = asyncio.new_event_loop()
+
+        self.battle = BattleBot('battle-gen8randombattle-1')
+        self.battle.battle_type = constants.RANDOM_BATTLE
+        self.battle.generation = 'gen8'
+        self.battle.user.active = Pokemon('pikachu', 100)
+        self.battle.user.active.add_move('thunderbolt')
+        self.battle.user.active.add_move('voltswitch')
+        self.battle.user.reserve = [Pokemon('charizard', 100)]
+        self.battle.opponent.active = Pokemon('caterpie', 100)
+
+    def tearDown(self):
+        shutdown_engine_pool()
+        self.loop.close()
+        config.engine_processes = self.original_engine_processes
+        config.pokemon_mode = self.original_pokemon_mode
+
+    def test_serialized_battle_is_an_independent_copy(self):
+        self.battle.user.side_conditions[constants.REFLECT] = 1
+        self.battle.user.active.boosts[constants.ATTACK] = 2
+
+        battle_copy = deserialize_battle(serialize_battle(self.battle))
+        battle_copy.user.active.boosts[constants.SPEED] += 1
+
+        self.assertEqual(1, battle_copy.user.side_conditions[constants.REFLECT])
+        self.assertEqual(2, battle_copy.user.active.boosts[constants.ATTACK])
+        self.assertEqual(0, self.battle.user.active.boosts[constants.SPEED])
+        self.assertIsNot(self.battle.user.active, battle_copy.user.active)
+
+    def test_decision_in_this_process_is_identical_to_find_best_move(self):
+        config.engine_processes = 0
+        expected_move = self.battle.find_best_move()
+
+        best_move = self.loop.run_until_complete(async_find_best_move(self.battle))
+
+        self.assertEqual(expected_move, best_move)
+
+    def test_decision_in_an_engine_process_is_identical_to_find_best_move(self):
+        config.engine_processes = 1
+        expected_move = self.battle.find_best_move()
+
+        best_move = self.loop.run_until_complete(async_find_best_move(self.battle))
+
+        self.assertEqual(expected_move, best_move)
+
+    def test_ignored_search_processes_are_warned_about(self):
+        config.engine_processes = 1
+
+        with mock.patch.object(config, 'search_processes', 2), mock.patch('showdown.engine_pool.logger') as logger:
+            start_engine_pool()
+
+        logger.warning.assert_called_once()
+
+    def test_only_the_sets_of_the_opponents_pokemon_are_sent_with_a_standard_battle_decision(self):
+        self.battle.battle_type = constants.STANDARD_BATTLE
+        self.battle.opponent.active = Pokemon('charizard', 100)
+        self.battle.opponent.reserve = [Pokemon('toxapex', 100)]
+        pokemon_sets = {'charizard': 1, 'charizardmegax': 2, 'toxapex': 3, 'pikachu': 4}
+
+        with mock.patch('data.pokemon_sets', pokemon_sets):
+            _, _, sent_pokemon_sets = _get_decision_settings(self.battle)
+
+        self.assertEqual({'charizard': 1, 'charizardmegax': 2, 'toxapex': 3}, sent_pokemon_sets)
+
+    def test_every_decision_in_a_battle_is_computed_by_the_same_worker(self):
+        with mock.patch('showdown.engine_pool._engine_workers', ['worker-1', 'worker-2']), \
+                mock.patch('showdown.engine_pool._battle_workers', dict()):
+            first_battle_worker = _get_battle_worker('battle-1')
+            second_battle_worker = _get_battle_worker('battle-2')
+
+            self.assertEqual(first_battle_worker, _get_battle_worker('battle-1'))
+            self.assertNotEqual(first_battle_worker, second_battle_worker)
+
+    def test_new_battle_is_given_to_the_worker_of_a_finished_battle(self):
+        with mock.patch('showdown.engine_pool._engine_workers', ['worker-1', 'worker-2']), \
+                mock.patch('showdown.engine_pool._battle_workers', dict()):
+            first_battle_worker = _get_battle_worker('battle-1')
+            _get_battle_worker('battle-2')
+            finish_battle('battle-1')
+
+            self.assertEqual(first_battle_worker, _get_battle_worker('battle-3'))
+
+    def test_cancelling_the_task_awaiting_a_decision_cancels_the_decision(self):
+        config.engine_processes = 0
+
+        async def pick_move_then_cancel():
+            decision = asyncio.ensure_future(async_find_best_move(self.battle))
+            await asyncio.sleep(0)
+            decision.cancel()
+            return await asyncio.gather(decision, return_exceptions=True)
+
+        result = self.loop.run_until_complete(pick_move_then_cancel())[0]
+
+        self.assertIsInstance(result, asyncio.CancelledError)
+
+
+class BattleConnection:
+    # the parts of a PSRoomConnection that a battle uses
+    def __init__(self, messages):
+        self.messages = asyncio.Queue()
+        for message in messages:
+            self.messages.put_nowait(message)
+        self.sent_messages = []
+
+    async def receive_message(self):
+        return await self.messages.get()
+
+    async def send_message(self, room, message_list):
+        self.sent_messages.append(message_list)
+
+    async def leave_battle(self, battle_tag, save_replay=False):
+        pass
+
+
+class TestPokemonBattle(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+        self.battle = BattleBot('battle-gen8randombattle-1')
+        self.patch('showdown.run_battle.start_battle', return_value=self.battle)
+        self.patch('showdown.run_battle.async_update_battle', return_value=True)
+
+        self.decision_cancelled = False
+
+    def patch(self, target, return_value):
+        async def patched(*args, **kwargs):
+            return return_value
+        patch = mock.patch(target, patched)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    async def pick_move_forever(self, battle):
+        try:
+            await asyncio.Future()
+        except asyncio.CancelledError:
+            self.decision_cancelled = True
+            raise
+
+    def test_battle_ending_while_a_move_is_being_picked_cancels_the_decision(self):
+        connection = BattleConnection([
+            ">battle-gen8randombattle-1\n|request|",
+            ">battle-gen8randombattle-1\n|win|pmariglia",
+        ])
+
+        with mock.patch('showdown.run_battle.async_pick_move', self.pick_move_forever):
+            winner = self.loop.run_until_complete(pokemon_battle(connection, 'gen8randombattle'))
+
+        self.assertEqual('pmariglia', winner)
+        self.assertTrue(self.decision_cancelled)
+
+    def test_picked_move_is_sent(self):
+        async def pick_move(battle):
+            return ["/choose move 1", "1"]
+
+        connection = BattleConnection([">battle-gen8randombattle-1\n|request|"])
+
+        async def play_until_move_is_sent():
+            battle_task = asyncio.ensure_future(pokemon_battle(connection, 'gen8randombattle'))
+            while not connection.sent_messages:
+                await asyncio.sleep(0)
+            battle_task.cancel()
+
+        with mock.patch('showdown.run_battle.async_pick_move', pick_move):
+            self.loop.run_until_complete(play_until_move_is_sent())
+
+        self.assertEqual([["/choose move 1", "1"]], connection.sent_messages)
@@ -0,0 +1,76 @@
+import unittest
+from collections import defaultdict
+
+import constants
+from showdown.engine.objects import State
+from showdown.engine.objects import Side
+from showdown.engine.objects import Pokemon
+from showdown.engine.objects import StateMutator
+from showdown.engine.evaluate import evaluate
+from showdown.engine.evaluate import get_maximum_score
+from showdown.engine.evaluate import Scoring
+from showdown.engine.find_state_instructions import get_all_state_instructions
+from showdown.battle import Pokemon as StatePokemon
+
+
+class TestGetMaximumScore(unittest.TestCase):
+    def setUp(self):
+        self.state = State(
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                            {
+                                "xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict()),
+                                "starmie": Pokemon.from_state_pokemon_dict(StatePokemon("starmie", 81).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(int)
+                        ),
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                            {
+                                "yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict()),
+                                "slurpuff": Pokemon.from_state_pokemon_dict(StatePokemon("slurpuff", 73).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(int)
+                        ),
+                        None,
+                        None,
+                        False
+                    )
+
+        self.state.self.active.moves = [
+            {constants.ID: 'nastyplot', constants.DISABLED: False},
+            {constants.ID: 'thunderbolt', constants.DISABLED: False},
+        ]
+        self.state.opponent.active.moves = [
+            {constants.ID: 'moonblast', constants.DISABLED: False},
+            {constants.ID: 'toxic', constants.DISABLED: False},
+        ]
+
+    def test_maximum_score_is_not_lower_than_the_score_of_any_later_state(self):
+        maximum_score = get_maximum_score(self.state)
+        mutator = StateMutator(self.state)
+
+        # the bot boosts while the opponent's pokemon is worn down
+        for user_move, opponent_move in [('nastyplot', 'toxic'), ('nastyplot', 'toxic'), ('thunderbolt', 'moonblast'), ('thunderbolt', 'moonblast')]:
+            for instructions in get_all_state_instructions(mutator, user_move, opponent_move):
+                mutator.apply_compiled(instructions.compiled_instructions)
+                self.assertLessEqual(evaluate(self.state), maximum_score)
+                mutator.reverse_compiled(instructions.compiled_instructions)
+
+            mutator.apply_compiled(get_all_state_instructions(mutator, user_move, opponent_move)[0].compiled_instructions)
+
+    def test_fainted_pokemon_lower_the_maximum_score(self):
+        maximum_score = get_maximum_score(self.state)
+
+        self.state.self.reserve["xatu"].hp = 0
+
+        self.assertEqual(maximum_score - Scoring.POKEMON_ALIVE_STATIC - Scoring.POKEMON_HP, get_maximum_score(self.state))
+
+    def test_boosts_of_a_reserve_pokemon_are_kept(self):
+        maximum_score = get_maximum_score(self.state)
+
+        self.state.self.reserve["xatu"].attack_boost = 2
+
+        self.assertEqual(maximum_score + 2 * Scoring.POKEMON_BOOSTS[constants.ATTACK], get_maximum_score(self.state))
@@ -4,6 +4,7 @@ from showdown.battle import Move
 from showdown.engine.helpers import get_pokemon_info_from_condition
 from showdown.engine.helpers import normalize_name
 from showdown.engine.helpers import set_makes_sense
+from showdown.engine.helpers import product_by_weight
 from showdown.engine.helpers import spreads_are_alike
 from showdown.engine.helpers import remove_duplicate_spreads
 from showdown.engine.objects import State
@@ -172,6 +173,32 @@ class TestSetMakesSense(unittest.TestCase):
         self.assertTrue(set_makes_sense(nature, spread, item, ability, moves))
 
 
+class TestProductByWeight(unittest.TestCase):
+    def test_combinations_are_made_in_descending_weight(self):
+        combinations = list(product_by_weight([('a', 0.6), ('b', 0.4)], [('c', 0.9), ('d', 0.1)]))
+
+        expected_combinations = [
+            (('a', 'c'), 0.54),
+            (('b', 'c'), 0.36),
+            (('a', 'd'), 0.06),
+            (('b', 'd'), 0.04),
+        ]
+        self.assertEqual([c[0] for c in expected_combinations], [c[0] for c in combinations])
+        for (_, expected_weight), (_, weight) in zip(expected_combinations, combinations):
+            self.assertAlmostEqual(expected_weight, weight)
+
+    def test_every_combination_is_made_once(self):
+        options = [[(i, 1 / (i + 1)) for i in range(4)], [(i, 1 / (i + 2)) for i in range(3)], [(i, 1) for i in range(2)]]
+
+        combinations = [c for c, _ in product_by_weight(*options)]
+
+        self.assertEqual(24, len(combinations))
+        self.assertEqual(24, len(set(combinations)))
+
+    def test_nothing_is_made_when_a_list_is_empty(self):
+        self.assertEqual([], list(product_by_weight([('a', 1)], [])))
+
+
 class TestNormalizeName(unittest.TestCase):
     def test_removes_nonascii_characters(self):
         n = 'Flabébé'
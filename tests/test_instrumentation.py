@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import tempfile
+import unittest
+from unittest import mock
+from collections import defaultdict
+
+import config
+import constants
+from showdown.engine import instrumentation
+from showdown.engine.objects import State
+from showdown.engine.objects import Side
+from showdown.engine.objects import Pokemon
+from showdown.engine.objects import StateMutator
+from showdown.engine.select_best_move import get_payoff_matrix
+from showdown.engine.transposition_table import TranspositionTable
+from showdown.battle import Pokemon as StatePokemon
+
+
+class SearchingBattle:
+    # the parts of a Battle that instrumentation uses, with a search as its decision
+    def __init__(self, state, battle_tag='battle-gen8randombattle-1', turn=3, seconds=0):
+        self.state = state
+        self.battle_tag = battle_tag
+        self.turn = turn
+        self.seconds = seconds
+
+    def find_best_move(self):
+        with instrumentation.phase(instrumentation.SEARCH):
+            time.sleep(self.seconds)
+            user_options, opponent_options = self.state.get_all_options()
+            get_payoff_matrix(StateMutator(self.state), user_options, opponent_options, depth=2, transposition_table=TranspositionTable(1000))
+        return ["/choose move 1", "1"]
+
+
+class TestFindBestMoveWithInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.state = State(
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                            {
+                                "xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(lambda: 0)
+                        ),
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                            {
+                                "yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(lambda: 0)
+                        ),
+                        None,
+                        None,
+                        False
+                    )
+        self.state.self.active.moves = [
+            {constants.ID: 'thunderbolt', constants.DISABLED: False, constants.CURRENT_PP: 16},
+            {constants.ID: 'growl', constants.DISABLED: False, constants.CURRENT_PP: 16},
+        ]
+        self.state.opponent.active.moves = [
+            {constants.ID: 'moonblast', constants.DISABLED: False, constants.CURRENT_PP: 16},
+            {constants.ID: 'charm', constants.DISABLED: False, constants.CURRENT_PP: 16},
+        ]
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.instrumentation_file = os.path.join(self.directory, 'decisions.jsonl')
+
+        self.patch_config('search_instrumentation_file', self.instrumentation_file)
+        self.patch_config('search_profile_decisions', 0)
+        self.addCleanup(instrumentation._profiled_decisions.clear)
+
+    def patch_config(self, name, value):
+        patch = mock.patch.object(config, name, value)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def read_records(self):
+        with open(self.instrumentation_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_nothing_is_recorded_when_instrumentation_is_off(self):
+        self.patch_config('search_instrumentation_file', None)
+
+        decision = instrumentation.find_best_move_with_instrumentation(SearchingBattle(self.state))
+
+        self.assertEqual(["/choose move 1", "1"], decision)
+        self.assertFalse(os.path.exists(self.instrumentation_file))
+        self.assertIsNone(instrumentation.current_record)
+
+    def test_one_line_is_written_for_each_decision(self):
+        instrumentation.find_best_move_with_instrumentation(SearchingBattle(self.state, turn=3))
+        instrumentation.find_best_move_with_instrumentation(SearchingBattle(self.state, turn=4))
+
+        records = self.read_records()
+        self.assertEqual([3, 4], [r['turn'] for r in records])
+        self.assertEqual('battle-gen8randombattle-1', records[0]['battle_tag'])
+        self.assertEqual(["/choose move 1", "1"], records[0]['decision'])
+        self.assertIsNone(instrumentation.current_record)
+
+    def test_record_describes_the_search(self):
+        instrumentation.find_best_move_with_instrumentation(SearchingBattle(self.state))
+
+        record = self.read_records()[0]
+        self.assertEqual(1, record['depths']['2']['nodes'])
+        self.assertEqual(9, record['depths']['2']['branching_factor'])
+        self.assertLess(1, record['depths']['1']['nodes'])
+        self.assertEqual(record['nodes'], sum(d['nodes'] for d in record['depths'].values()))
+        self.assertLess(0, record['counters']['transposition_table_misses'])
+        self.assertLess(0, record['counters']['chance_branches'])
+        self.assertEqual(record['calls']['apply']['count'], record['calls']['reverse']['count'])
+        self.assertLess(0, record['calls']['evaluate']['count'])
+        self.assertLess(0, record['calls']['generate_instructions']['time'])
+        self.assertIn(instrumentation.SEARCH, record['phases'])
+        self.assertLessEqual(record['phases'][instrumentation.SEARCH], record['time'])
+
+    def test_a_phase_inside_the_same_phase_is_only_timed_once(self):
+        record = instrumentation.SearchRecord()
+        with mock.patch.object(instrumentation, 'current_record', record), \
+                mock.patch.object(instrumentation.time, 'perf_counter', side_effect=[1, 3]):
+            with instrumentation.phase(instrumentation.SEARCH):
+                with instrumentation.phase(instrumentation.SEARCH):
+                    pass
+
+        self.assertEqual(2, record.phases[instrumentation.SEARCH])
+
+    def test_only_the_profiles_of_the_slowest_decisions_are_kept(self):
+        self.patch_config('search_profile_decisions', 1)
+
+        instrumentation.find_best_move_with_instrumentation(SearchingBattle(self.state, turn=1, seconds=0.05))
+        instrumentation.find_best_move_with_instrumentation(SearchingBattle(self.state, turn=2, seconds=0))
+        instrumentation.find_best_move_with_instrumentation(SearchingBattle(self.state, turn=3, seconds=0.1))
+
+        records = self.read_records()
+        self.assertIsNone(records[1]['profile'])
+        self.assertFalse(os.path.exists(records[0]['profile']))
+        self.assertTrue(os.path.exists(records[2]['profile']))
+        self.assertEqual(1, len([f for f in os.listdir(self.directory) if f.endswith('.prof')]))
@@ -0,0 +1,221 @@
+import time
+import random
+import unittest
+from copy import deepcopy
+from collections import defaultdict
+
+import constants
+from showdown.engine.objects import State
+from showdown.engine.objects import Side
+from showdown.engine.objects import Pokemon
+from showdown.engine.objects import StateMutator
+from showdown.engine.objects import TransposeInstruction
+from showdown.engine.mcts import EXP3
+from showdown.engine.mcts import UCT
+from showdown.engine.mcts import MonteCarloTreeSearch
+from showdown.engine.mcts import DecisionNode
+from showdown.engine.mcts import ChanceNode
+from showdown.engine.find_state_instructions import get_all_state_instructions
+from showdown.engine.select_best_move import WON_BATTLE
+from showdown.battle import Pokemon as StatePokemon
+from showdown.battle_bots.mcts.main import split_iterations
+from showdown.battle_bots.mcts.main import combine_root_statistics
+from showdown.battle_bots.mcts.main import pick_move_from_statistics
+
+
+class TestMonteCarloTreeSearch(unittest.TestCase):
+    def setUp(self):
+        self.state = State(
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                            {
+                                "xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict()),
+                                "starmie": Pokemon.from_state_pokemon_dict(StatePokemon("starmie", 81).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(int)
+                        ),
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                            {
+                                "yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(int)
+                        ),
+                        None,
+                        None,
+                        False
+                    )
+
+        self.state.self.active.moves = [
+            {constants.ID: 'thunderbolt', constants.DISABLED: False},
+            {constants.ID: 'splash', constants.DISABLED: False},
+        ]
+        self.state.opponent.active.moves = [
+            {constants.ID: 'moonblast', constants.DISABLED: False},
+            {constants.ID: 'splash', constants.DISABLED: False},
+        ]
+        self.mutator = StateMutator(self.state)
+
+    def test_state_is_unchanged_after_searching(self):
+        expected_hash = self.mutator.state_hash
+
+        MonteCarloTreeSearch(self.mutator, rollout_depth=2, rng=random.Random(0)).search(iterations=200)
+
+        self.mutator.rehash()
+        self.assertEqual(expected_hash, self.mutator.state_hash)
+        self.assertEqual('raichu', self.state.self.active.id)
+        self.assertEqual('aromatisse', self.state.opponent.active.id)
+
+    def test_every_iteration_visits_the_root(self):
+        root = MonteCarloTreeSearch(self.mutator, rng=random.Random(0)).search(iterations=50)
+
+        self.assertEqual(50, root.visits)
+        self.assertEqual(50, sum(visits for visits, _ in root.user.get_statistics().values()))
+        self.assertEqual(50, sum(visits for visits, _ in root.opponent.get_statistics().values()))
+
+    def test_uct_visits_the_attacking_move_the_most(self):
+        root = MonteCarloTreeSearch(self.mutator, selection=UCT, rng=random.Random(0)).search(iterations=300)
+
+        statistics = root.user.get_statistics()
+        self.assertEqual('thunderbolt', max(statistics, key=lambda o: statistics[o][0]))
+
+    def test_exp3_visits_the_attacking_move_the_most(self):
+        root = MonteCarloTreeSearch(self.mutator, selection=EXP3, rng=random.Random(0)).search(iterations=300)
+
+        statistics = root.user.get_statistics()
+        self.assertEqual('thunderbolt', max(statistics, key=lambda o: statistics[o][0]))
+
+    def test_search_stops_at_the_deadline(self):
+        search = MonteCarloTreeSearch(self.mutator, rng=random.Random(0))
+        search.search(iterations=1000, deadline=time.time() - 1)
+
+        self.assertEqual(0, search.iterations)
+
+    def test_search_without_a_budget_raises_an_error(self):
+        with self.assertRaises(ValueError):
+            MonteCarloTreeSearch(self.mutator).search()
+
+    def test_invalid_selection_policy_raises_an_error(self):
+        with self.assertRaises(ValueError):
+            MonteCarloTreeSearch(self.mutator, selection='random')
+
+    def test_won_battle_is_not_searched_past(self):
+        self.state.opponent.reserve = {}
+        self.state.opponent.active.hp = 1
+
+        search = MonteCarloTreeSearch(self.mutator, rng=random.Random(0))
+        root = search.search(iterations=100)
+
+        # thunderbolt always wins the battle
+        chance_node = root.children[(0, 0)]
+        for child in chance_node.children:
+            if child is not None:
+                self.assertIsNotNone(child.terminal_score)
+                self.assertGreater(child.terminal_score, WON_BATTLE / 2)
+                self.assertEqual({}, child.children)
+
+    def play_turn(self, user_move, opponent_move):
+        # the state of the next turn, made without the search's mutator like it is in a battle
+        state = deepcopy(self.state)
+        mutator = StateMutator(state)
+        instructions = get_all_state_instructions(mutator, user_move, opponent_move)[0]
+        mutator.apply_compiled(instructions.compiled_instructions)
+        return StateMutator(deepcopy(state))
+
+    def test_search_continues_from_the_state_reached_in_a_previous_search(self):
+        previous_search = MonteCarloTreeSearch(self.mutator, rng=random.Random(0))
+        previous_search.search(iterations=200)
+        expected_root = previous_search.root.children[(2, 1)].children[0]
+
+        search = MonteCarloTreeSearch(self.play_turn('switch xatu', 'splash'), rng=random.Random(0), previous_searches=[previous_search])
+
+        self.assertIs(expected_root, search.root)
+        self.assertEqual(previous_search.root_score, search.root_score)
+
+    def test_continued_search_keeps_the_visits_of_the_previous_search(self):
+        previous_search = MonteCarloTreeSearch(self.mutator, rng=random.Random(0))
+        previous_search.search(iterations=200)
+
+        search = MonteCarloTreeSearch(self.play_turn('switch xatu', 'splash'), rng=random.Random(0), previous_searches=[previous_search])
+        visits = search.root.visits
+        search.search(iterations=10)
+
+        self.assertGreater(visits, 0)
+        self.assertEqual(visits + 10, search.root.visits)
+
+    def test_state_that_was_not_reached_starts_a_new_search(self):
+        previous_search = MonteCarloTreeSearch(self.mutator, rng=random.Random(0))
+        previous_search.search(iterations=1)
+
+        search = MonteCarloTreeSearch(self.play_turn('thunderbolt', 'moonblast'), rng=random.Random(0), previous_searches=[previous_search])
+
+        self.assertEqual(0, search.root.visits)
+        self.assertEqual({}, search.root.children)
+
+    def test_search_continues_from_its_own_root(self):
+        previous_search = MonteCarloTreeSearch(self.mutator, rng=random.Random(0))
+        previous_search.search(iterations=20)
+
+        search = MonteCarloTreeSearch(StateMutator(deepcopy(self.state)), previous_searches=[previous_search])
+
+        self.assertIs(previous_search.root, search.root)
+
+
+    def test_outcome_with_a_different_boost_is_not_continued_from(self):
+        unboost_once = TransposeInstruction(0.5, [(constants.MUTATOR_UNBOOST, constants.OPPONENT, constants.ATTACK, 1)])
+        unboost_twice = TransposeInstruction(0.5, [(constants.MUTATOR_UNBOOST, constants.OPPONENT, constants.ATTACK, 2)])
+        chance_node = ChanceNode([unboost_once, unboost_twice])
+        root = DecisionNode(self.mutator.state_hash, ['splash'], ['splash'])
+        root.children[(0, 0)] = chance_node
+        for i, instruction in enumerate(chance_node.state_instructions):
+            self.mutator.apply(instruction.instructions)
+            chance_node.children[i] = DecisionNode(self.mutator.state_hash, ['splash'], ['splash'])
+            self.mutator.reverse(instruction.instructions)
+
+        self.mutator.apply(unboost_twice.instructions)
+
+        self.assertIs(chance_node.children[1], root.find_descendant(self.mutator.state_hash))
+
+class TestPickMoveFromStatistics(unittest.TestCase):
+    def test_iterations_are_split_by_weight(self):
+        self.assertEqual([750, 250], split_iterations(1000, [0.75, 0.25]))
+
+    def test_every_battle_is_given_an_iteration(self):
+        self.assertEqual([1000, 1], split_iterations(1000, [1, 0.0001]))
+
+    def test_no_iterations_is_no_limit(self):
+        self.assertEqual([None, None], split_iterations(0, [0.5, 0.5]))
+
+    def test_visits_are_combined_by_weight(self):
+        all_statistics = [
+            {'thunderbolt': (75, 0.6), 'splash': (25, 0.4)},
+            {'thunderbolt': (10, 0.4), 'splash': (30, 0.5)},
+        ]
+
+        visit_shares = combine_root_statistics(all_statistics, [0.5, 0.5])
+
+        self.assertAlmostEqual(0.5, visit_shares['thunderbolt'])
+        self.assertAlmostEqual(0.5, visit_shares['splash'])
+
+    def test_an_option_missing_from_a_search_is_combined(self):
+        all_statistics = [
+            {'thunderbolt': (50, 0.6), 'switch xatu': (50, 0.4)},
+            {'thunderbolt': (100, 0.4)},
+        ]
+
+        visit_shares = combine_root_statistics(all_statistics, [0.5, 0.5])
+
+        self.assertAlmostEqual(0.75, visit_shares['thunderbolt'])
+        self.assertAlmostEqual(0.25, visit_shares['switch xatu'])
+
+    def test_uct_picks_the_most_visited_option(self):
+        self.assertEqual('splash', pick_move_from_statistics({'thunderbolt': 0.4, 'splash': 0.6}, UCT))
+
+    def test_exp3_does_not_pick_options_that_were_only_explored(self):
+        visit_shares = {'thunderbolt': 0.96, 'splash': 0.04}
+
+        picks = {pick_move_from_statistics(visit_shares, EXP3, rng=random.Random(i)) for i in range(20)}
+
+        self.assertEqual({'thunderbolt'}, picks)
@@ -0,0 +1,126 @@
+import unittest
+from unittest import mock
+from collections import defaultdict
+
+import constants
+from showdown.engine.objects import State
+from showdown.engine.objects import Side
+from showdown.engine.objects import Pokemon
+from showdown.engine.objects import StateMutator
+from showdown.engine.move_ordering import MoveOrdering
+from showdown.engine.select_best_move import get_payoff_matrix
+from showdown.engine.select_best_move import pick_safest
+from showdown.battle import Pokemon as StatePokemon
+
+
+class TestMoveOrdering(unittest.TestCase):
+    def setUp(self):
+        self.state = State(
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                            {
+                                "xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict()),
+                                "starmie": Pokemon.from_state_pokemon_dict(StatePokemon("starmie", 81).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(lambda: 0)
+                        ),
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                            {
+                                "yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict()),
+                                "slurpuff": Pokemon.from_state_pokemon_dict(StatePokemon("slurpuff", 73).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(lambda: 0)
+                        ),
+                        None,
+                        None,
+                        False
+                    )
+
+        self.state.self.active.moves = [
+            {constants.ID: 'growl', constants.DISABLED: False, constants.CURRENT_PP: 16},
+            {constants.ID: 'thunderbolt', constants.DISABLED: False, constants.CURRENT_PP: 16},
+        ]
+        self.state.opponent.active.moves = [
+            {constants.ID: 'charm', constants.DISABLED: False, constants.CURRENT_PP: 16},
+            {constants.ID: 'moonblast', constants.DISABLED: False, constants.CURRENT_PP: 16},
+        ]
+        self.mutator = StateMutator(self.state)
+
+    def test_invalid_heuristic_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            MoveOrdering(['history', 'not-a-heuristic'])
+
+    def test_options_are_not_reordered_without_heuristics(self):
+        move_ordering = MoveOrdering(())
+        user_options, opponent_options = self.state.get_all_options()
+
+        self.assertIs(user_options, move_ordering.order_user_options(self.mutator, user_options))
+        self.assertIs(opponent_options, move_ordering.order_opponent_options(opponent_options, 2))
+
+    def test_static_estimate_puts_the_most_damaging_move_first(self):
+        move_ordering = MoveOrdering(['static'])
+
+        user_options = move_ordering.order_user_options(self.mutator, ['growl', 'switch xatu', 'thunderbolt'])
+
+        self.assertEqual(['thunderbolt', 'growl', 'switch xatu'], user_options)
+
+    def test_static_estimate_is_calculated_once_for_each_state(self):
+        move_ordering = MoveOrdering(['static'])
+
+        with mock.patch('showdown.engine.move_ordering.get_static_estimates', return_value={}) as get_static_estimates:
+            move_ordering.order_user_options(self.mutator, ['growl', 'thunderbolt'])
+            move_ordering.order_user_options(self.mutator, ['growl', 'thunderbolt'])
+            self.assertEqual(1, get_static_estimates.call_count)
+
+            self.state.opponent.active.hp -= 1
+            self.mutator.rehash()
+            move_ordering.order_user_options(self.mutator, ['growl', 'thunderbolt'])
+            self.assertEqual(2, get_static_estimates.call_count)
+
+    def test_history_puts_the_options_that_were_best_first(self):
+        move_ordering = MoveOrdering(['history'])
+        move_ordering.record_best_option('switch xatu', 1)
+        move_ordering.record_best_option('thunderbolt', 2)
+
+        user_options = move_ordering.order_user_options(self.mutator, ['growl', 'switch xatu', 'thunderbolt'])
+
+        self.assertEqual(['thunderbolt', 'switch xatu', 'growl'], user_options)
+
+    def test_killers_are_tried_first_at_the_depth_they_caused_a_prune(self):
+        move_ordering = MoveOrdering(['killers'])
+        move_ordering.record_prune('moonblast', 2)
+
+        self.assertEqual(['moonblast', 'charm'], move_ordering.order_opponent_options(['charm', 'moonblast'], 2))
+        self.assertEqual(['charm', 'moonblast'], move_ordering.order_opponent_options(['charm', 'moonblast'], 1))
+
+    def test_only_the_latest_killers_are_kept(self):
+        move_ordering = MoveOrdering(['killers'])
+        move_ordering.record_prune('moonblast', 2)
+        move_ordering.record_prune('charm', 2)
+        move_ordering.record_prune('switch yveltal', 2)
+
+        self.assertEqual(['switch yveltal', 'charm'], move_ordering.killers[2])
+
+    def test_move_ordering_does_not_change_the_safest_move(self):
+        user_options, opponent_options = self.state.get_all_options()
+        expected_safest = pick_safest(get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True))
+
+        move_ordering = MoveOrdering()
+        scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True, move_ordering=move_ordering)
+
+        self.assertEqual(expected_safest, pick_safest(scores))
+        self.assertEqual(user_options, list(dict.fromkeys(u for u, _ in scores)))
+
+    def test_prune_rate_counts_the_move_combinations_that_were_pruned(self):
+        user_options, opponent_options = self.state.get_all_options()
+        move_ordering = MoveOrdering(())
+
+        scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=1, prune=True, move_ordering=move_ordering)
+
+        pruned = sum(1 for score in scores.values() if score != score)
+        self.assertEqual(len(scores) - pruned, move_ordering.searched)
+        self.assertEqual(pruned, move_ordering.pruned)
+        self.assertEqual(pruned / len(scores), move_ordering.prune_rate)
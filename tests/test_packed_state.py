@@ -0,0 +1,109 @@
+import pickle
+import unittest
+
+import constants
+from showdown.battle import Battle
+from showdown.battle import Pokemon
+from showdown.battle import Move
+from showdown.engine.objects import hash_state
+from showdown.engine.packed_state import PackedState
+from showdown.engine.packed_state import PackedStateError
+from showdown.engine.packed_state import HP
+from showdown.engine.packed_state import ITEM
+from showdown.engine.packed_state import MAX_VOLATILE_STATUSES
+
+
+# so we can instantiate a Battle object for testing
+Battle.__abstractmethods__ = set()
+
+
+class TestPackedState(unittest.TestCase):
+    def setUp(self):
+        battle = Battle(None)
+        battle.user.active = Pokemon('pikachu', 100)
+        battle.user.active.moves = [Move('thunderbolt'), Move('voltswitch')]
+        battle.user.reserve = [Pokemon('caterpie', 100), Pokemon('weedle', 100)]
+        battle.opponent.active = Pokemon('rattata', 100)
+        battle.opponent.active.moves = [Move('tackle')]
+        battle.opponent.reserve = [Pokemon('pidgey', 100)]
+        battle.weather = constants.RAIN
+
+        self.state = battle.create_state()
+        self.state.self.active.volatile_status.add(constants.SUBSTITUTE)
+        self.state.self.active.moves[1][constants.DISABLED] = True
+        self.state.opponent.active.hp = 150.5
+        self.state.opponent.side_conditions[constants.STEALTH_ROCK] = 1
+        self.state.opponent.wish = (2, 100)
+
+    def test_state_is_unchanged_after_packing_and_unpacking(self):
+        state = PackedState.from_state(self.state).to_state()
+
+        self.assertEqual(str(self.state), str(state))
+        self.assertEqual(hash_state(self.state), hash_state(state))
+
+    def test_fields_can_be_read_and_written(self):
+        packed_state = PackedState.from_state(self.state)
+
+        packed_state.set_pokemon_value(constants.OPPONENT, 0, HP, 10)
+        packed_state.set_pokemon_name(constants.SELF, 1, ITEM, 'leftovers')
+        packed_state.set_side_condition(constants.SELF, constants.SPIKES, 2)
+        packed_state.remove_volatile_status(constants.SELF, 0, constants.SUBSTITUTE)
+
+        state = packed_state.to_state()
+        self.assertEqual(10, state.opponent.active.hp)
+        self.assertEqual('leftovers', state.self.reserve['caterpie'].item)
+        self.assertEqual(2, state.self.side_conditions[constants.SPIKES])
+        self.assertEqual(1, packed_state.get_side_condition(constants.OPPONENT, constants.STEALTH_ROCK))
+        self.assertEqual(set(), state.self.active.volatile_status)
+        self.assertFalse(packed_state.has_volatile_status(constants.SELF, 0, constants.SUBSTITUTE))
+
+    def test_restoring_a_snapshot_undoes_changes(self):
+        packed_state = PackedState.from_state(self.state)
+        snapshot = packed_state.snapshot()
+
+        packed_state.set_pokemon_value(constants.SELF, 0, HP, 1)
+        packed_state.set_pokemon_name(constants.SELF, 0, ITEM, 'choicescarf')
+        packed_state.add_volatile_status(constants.OPPONENT, 0, constants.LEECH_SEED)
+        packed_state.restore(snapshot)
+
+        self.assertEqual(PackedState.from_state(self.state).to_state().__repr__(), packed_state.to_state().__repr__())
+
+    def test_equal_states_have_equal_hashes(self):
+        packed_state = PackedState.from_state(self.state)
+        other_packed_state = PackedState.from_state(self.state)
+
+        self.assertEqual(packed_state, other_packed_state)
+        self.assertEqual(hash(packed_state), hash(other_packed_state))
+
+        other_packed_state.set_pokemon_value(constants.SELF, 0, HP, 1)
+        self.assertNotEqual(packed_state, other_packed_state)
+
+    def test_restored_state_is_equal_to_the_state_the_snapshot_was_taken_of(self):
+        packed_state = PackedState.from_state(self.state)
+        snapshot = packed_state.snapshot()
+
+        packed_state.set_pokemon_name(constants.SELF, 0, ITEM, 'choicescarf')
+        packed_state.add_volatile_status(constants.OPPONENT, 0, constants.LEECH_SEED)
+        packed_state.restore(snapshot)
+
+        self.assertEqual(PackedState.from_state(self.state), packed_state)
+        self.assertEqual(hash(PackedState.from_state(self.state)), hash(packed_state))
+
+    def test_states_with_the_same_values_for_different_names_are_not_equal(self):
+        packed_state = PackedState.from_state(self.state)
+        other_packed_state = PackedState.from_state(self.state)
+        other_packed_state.names[other_packed_state.name_ids['pikachu']] = 'raichu'
+
+        self.assertNotEqual(packed_state, other_packed_state)
+
+    def test_pickled_state_is_unchanged(self):
+        packed_state = PackedState.from_state(self.state)
+
+        self.assertEqual(packed_state, pickle.loads(pickle.dumps(packed_state)))
+
+    def test_too_many_volatile_statuses_raises_an_error(self):
+        packed_state = PackedState.from_state(self.state)
+
+        with self.assertRaises(PackedStateError):
+            for i in range(MAX_VOLATILE_STATUSES):
+                packed_state.add_volatile_status(constants.SELF, 0, 'volatile{}'.format(i))
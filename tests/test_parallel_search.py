@@ -0,0 +1,86 @@
+import math
+import unittest
+from collections import defaultdict
+
+import config
+import constants
+from showdown.engine.objects import State
+from showdown.engine.objects import Side
+from showdown.engine.objects import Pokemon
+from showdown.engine.objects import StateMutator
+from showdown.engine.select_best_move import get_payoff_matrix
+from showdown.engine.parallel_search import get_payoff_matrices_in_parallel
+from showdown.engine.parallel_search import get_mcts_statistics_in_parallel
+from showdown.engine.parallel_search import shutdown_search_pool
+from showdown.battle import Pokemon as StatePokemon
+
+
+class TestGetPayoffMatricesInParallel(unittest.TestCase):
+    def setUp(self):
+        self.original_search_processes = config.search_processes
+        config.search_processes = 2
+
+        self.state = State(
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                            {
+                                "xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict()),
+                                "starmie": Pokemon.from_state_pokemon_dict(StatePokemon("starmie", 81).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(int)
+                        ),
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                            {
+                                "yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict()),
+                                "slurpuff": Pokemon.from_state_pokemon_dict(StatePokemon("slurpuff", 73).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(int)
+                        ),
+                        None,
+                        None,
+                        False
+                    )
+
+        self.state.self.active.moves = [
+            {constants.ID: 'thunderbolt', constants.DISABLED: False},
+            {constants.ID: 'growl', constants.DISABLED: False},
+        ]
+        self.state.opponent.active.moves = [
+            {constants.ID: 'moonblast', constants.DISABLED: False},
+            {constants.ID: 'charm', constants.DISABLED: False},
+        ]
+
+    def tearDown(self):
+        shutdown_search_pool()
+        config.search_processes = self.original_search_processes
+
+    @staticmethod
+    def replace_nan(payoff_matrix):
+        return {k: None if math.isnan(v) else v for k, v in payoff_matrix.items()}
+
+    def test_parallel_search_is_identical_to_serial_search(self):
+        # what each search process learns about the order of the options is not shared
+        original_move_ordering = config.move_ordering
+        config.move_ordering = ()
+        self.addCleanup(setattr, config, 'move_ordering', original_move_ordering)
+
+        user_options, opponent_options = self.state.get_all_options()
+        expected_pruned = get_payoff_matrix(StateMutator(self.state), user_options, opponent_options, depth=2, prune=True)
+        expected_not_pruned = get_payoff_matrix(StateMutator(self.state), user_options, opponent_options, depth=2, prune=False)
+
+        pruned = get_payoff_matrices_in_parallel([(self.state, user_options, opponent_options)], depth=2, prune=True)[0]
+        not_pruned = get_payoff_matrices_in_parallel([(self.state, user_options, opponent_options)], depth=2, prune=False)[0]
+
+        self.assertEqual(self.replace_nan(expected_pruned), self.replace_nan(pruned))
+        self.assertEqual(list(expected_pruned), list(pruned))
+        self.assertEqual(expected_not_pruned, not_pruned)
+
+    def test_each_mcts_search_runs_its_own_iterations(self):
+        all_statistics = get_mcts_statistics_in_parallel([(self.state, 40), (self.state, 60)], 'uct', 1.4, 0)
+
+        self.assertEqual(40, sum(visits for visits, _ in all_statistics[0].values()))
+        self.assertEqual(60, sum(visits for visits, _ in all_statistics[1].values()))
+        self.assertEqual(set(self.state.get_all_options()[0]), set(all_statistics[0]))
@@ -0,0 +1,47 @@
+import unittest
+
+import constants
+from data.random_battle_set_index import RandomBattleSetIndex
+
+
+class TestRandomBattleSetIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = RandomBattleSetIndex({
+            constants.ABILITIES: [["pressure", 40.0], ["insomnia", 60.0]],
+            constants.ITEMS: [["leftovers", 25.0], ["lifeorb", 75.0]],
+            constants.MOVES: [["knockoff", 100.0], ["suckerpunch", 75.0], ["swordsdance", 50.0], ["playrough", 50.0], ["toxic", 25.0]],
+            constants.SETS: {
+                "knockoff|playrough|suckerpunch|toxic": 25.0,
+                "knockoff|playrough|suckerpunch|swordsdance": 25.0,
+                "knockoff|suckerpunch|swordsdance|toxic": 50.0,
+            },
+        })
+
+    def test_possible_moves_come_from_the_sets_with_the_known_moves(self):
+        self.assertEqual(['playrough', 'suckerpunch', 'swordsdance'], self.index.get_possible_moves(['knockoff', 'toxic']))
+
+    def test_possible_moves_are_in_the_order_they_appear_in_the_sets(self):
+        self.assertEqual(['knockoff', 'playrough', 'suckerpunch', 'toxic'], self.index.get_possible_moves(['swordsdance']))
+
+    def test_every_move_is_possible_when_no_set_has_the_known_moves(self):
+        self.assertEqual(['knockoff', 'suckerpunch', 'swordsdance', 'playrough'], self.index.get_possible_moves(['toxic', 'tackle']))
+
+    def test_most_likely_ability_skips_pass_abilities(self):
+        self.assertEqual('insomnia', self.index.get_most_likely_ability())
+        self.assertEqual('pressure', self.index.get_most_likely_ability(pass_abilities={'insomnia'}))
+
+    def test_most_likely_item_skips_pass_items(self):
+        self.assertEqual('lifeorb', self.index.get_most_likely_item())
+        self.assertEqual('leftovers', self.index.get_most_likely_item(pass_items={'lifeorb'}))
+
+    def test_move_candidates_are_weighted_sets_consistent_with_the_known_moves(self):
+        self.assertEqual(
+            [
+                (['knockoff', 'playrough', 'suckerpunch', 'swordsdance'], 1 / 3),
+                (['knockoff', 'suckerpunch', 'toxic', 'swordsdance'], 2 / 3),
+            ],
+            self.index.get_move_candidates(['swordsdance'])
+        )
+
+    def test_there_are_no_move_candidates_when_no_set_has_the_known_moves(self):
+        self.assertEqual([], self.index.get_move_candidates(['tackle']))
@@ -0,0 +1,28 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import config
+import constants
+from run import play_battles
+
+
+class TestPlayBattles(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+        self.ps_websocket_client = mock.Mock()
+        self.ps_websocket_client.receive_message = mock.Mock(side_effect=ConnectionError("websocket closed"))
+        self.ps_websocket_client.send_message = mock.Mock(side_effect=lambda *args: asyncio.sleep(0))
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_connection_closing_while_finding_a_battle_stops_the_bot(self):
+        with mock.patch.object(config, 'bot_mode', constants.SEARCH_LADDER), \
+                mock.patch.object(config, 'run_count', 1), \
+                mock.patch('run.load_team', return_value=''):
+            with self.assertRaises(ConnectionError):
+                self.loop.run_until_complete(asyncio.wait_for(play_battles(self.ps_websocket_client), 5))
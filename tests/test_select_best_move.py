@@ -1,10 +1,25 @@
+import math
 import unittest
+from unittest import mock
+from copy import copy
 from collections import defaultdict
 
+import config
 import constants
+from showdown.engine import instrumentation
 from showdown.engine.objects import State
 from showdown.engine.objects import Side
 from showdown.engine.objects import Pokemon
+from showdown.engine.objects import StateMutator
+from showdown.engine.select_best_move import get_payoff_matrix
+from showdown.engine.select_best_move import pick_safest
+from showdown.engine.select_best_move import merge_payoff_matrix_rows
+from showdown.engine.select_best_move import _get_cached_payoff_matrix
+from showdown.engine.select_best_move import search_with_time_budget
+from showdown.engine.select_best_move import SearchTimeoutError
+from showdown.engine.transposition_table import TranspositionTable
+from showdown.engine.find_state_instructions import get_all_state_instructions
+from showdown.engine.find_state_instructions import state_instruction_cache
 from showdown.battle import Pokemon as StatePokemon
 
 
@@ -527,3 +542,334 @@ class TestGetAllOptions(unittest.TestCase):
         options = self.state.get_all_options()
 
         self.assertEqual(expected_options, options)
+
+
+class TestGetPayoffMatrix(unittest.TestCase):
+    def setUp(self):
+        self.state = State(
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("raichu", 73).to_dict()),
+                            {
+                                "xatu": Pokemon.from_state_pokemon_dict(StatePokemon("xatu", 81).to_dict()),
+                                "starmie": Pokemon.from_state_pokemon_dict(StatePokemon("starmie", 81).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(lambda: 0)
+                        ),
+                        Side(
+                            Pokemon.from_state_pokemon_dict(StatePokemon("aromatisse", 81).to_dict()),
+                            {
+                                "yveltal": Pokemon.from_state_pokemon_dict(StatePokemon("yveltal", 73).to_dict()),
+                                "slurpuff": Pokemon.from_state_pokemon_dict(StatePokemon("slurpuff", 73).to_dict()),
+                            },
+                            (0, 0),
+                            defaultdict(lambda: 0)
+                        ),
+                        None,
+                        None,
+                        False
+                    )
+
+        self.state.self.active.moves = [
+            {constants.ID: 'thunderbolt', constants.DISABLED: False},
+            {constants.ID: 'growl', constants.DISABLED: False},
+        ]
+        self.state.opponent.active.moves = [
+            {constants.ID: 'moonblast', constants.DISABLED: False},
+            {constants.ID: 'charm', constants.DISABLED: False},
+        ]
+        self.mutator = StateMutator(self.state)
+
+    def assertPayoffMatricesEqual(self, expected, actual):
+        # pruned entries are nan, which is not equal to itself
+        self.assertEqual(
+            {k: None if math.isnan(v) else v for k, v in expected.items()},
+            {k: None if math.isnan(v) else v for k, v in actual.items()}
+        )
+
+    def test_transposition_table_does_not_change_the_payoff_matrix(self):
+        user_options, opponent_options = self.state.get_all_options()
+        expected_scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True)
+
+        transposition_table = TranspositionTable(1000)
+        scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True, transposition_table=transposition_table)
+
+        self.assertPayoffMatricesEqual(expected_scores, scores)
+
+    def test_transposition_table_is_used_for_states_that_were_already_searched(self):
+        user_options, opponent_options = self.state.get_all_options()
+        transposition_table = TranspositionTable(1000)
+        get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=False, transposition_table=transposition_table)
+
+        self.assertLess(0, transposition_table.hits)
+
+    def enable_state_instruction_cache(self):
+        state_instruction_cache.clear()
+        self.addCleanup(state_instruction_cache.clear)
+        patch = mock.patch.object(config, 'state_instruction_cache_size', 1000)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_state_instruction_cache_does_not_change_the_payoff_matrix(self):
+        user_options, opponent_options = self.state.get_all_options()
+        expected_scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True)
+
+        self.enable_state_instruction_cache()
+        scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True)
+        scores_from_cache = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True)
+
+        self.assertPayoffMatricesEqual(expected_scores, scores)
+        self.assertPayoffMatricesEqual(expected_scores, scores_from_cache)
+        self.assertLess(0, state_instruction_cache.hits)
+
+    def test_state_instruction_cache_returns_the_same_instructions_for_the_same_state(self):
+        self.enable_state_instruction_cache()
+        expected_instructions = get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        instructions = get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        self.assertIs(expected_instructions, instructions)
+        self.assertEqual(1, state_instruction_cache.hits)
+        self.assertEqual(1, state_instruction_cache.misses)
+
+    def test_instructions_returned_by_the_state_instruction_cache_cannot_be_modified(self):
+        self.enable_state_instruction_cache()
+        instruction = get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')[0]
+
+        with self.assertRaises(AttributeError):
+            instruction.update_percentage(0.5)
+        with self.assertRaises(AttributeError):
+            instruction.add_instruction((constants.MUTATOR_DAMAGE, constants.OPPONENT, 10))
+
+        modifiable_instruction = copy(instruction)
+        modifiable_instruction.add_instruction((constants.MUTATOR_DAMAGE, constants.OPPONENT, 10))
+        self.assertEqual(len(instruction.instructions) + 1, len(modifiable_instruction.instructions))
+
+    def test_state_instruction_cache_misses_when_the_state_changes(self):
+        self.enable_state_instruction_cache()
+        get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        self.mutator.apply([(constants.MUTATOR_DAMAGE, constants.OPPONENT, 10)])
+        get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        self.assertEqual(0, state_instruction_cache.hits)
+        self.assertEqual(2, state_instruction_cache.misses)
+
+    def test_state_instruction_cache_misses_when_the_damage_calculation_changes(self):
+        self.enable_state_instruction_cache()
+        get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        with mock.patch.object(config, 'damage_calc_type', 'min_max'):
+            get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        self.assertEqual(0, state_instruction_cache.hits)
+
+    def test_state_instruction_cache_misses_when_the_outcome_probability_threshold_changes(self):
+        self.enable_state_instruction_cache()
+        get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        with mock.patch.object(config, 'outcome_probability_threshold', 0.2):
+            get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        self.assertEqual(0, state_instruction_cache.hits)
+
+    def test_outcome_probability_threshold_drops_unlikely_outcomes(self):
+        all_instructions = get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        with mock.patch.object(config, 'outcome_probability_threshold', 0.2):
+            likely_instructions = get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        self.assertLess(len(likely_instructions), len(all_instructions))
+        self.assertTrue(all(i.percentage >= 0.2 for i in likely_instructions))
+        self.assertAlmostEqual(1, sum(i.percentage for i in likely_instructions))
+
+    def test_dropped_outcomes_are_counted_by_the_mutator(self):
+        all_instructions = get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        record = instrumentation.SearchRecord()
+        with mock.patch.object(config, 'outcome_probability_threshold', 0.2), \
+                mock.patch.object(instrumentation, 'current_record', record):
+            likely_instructions = get_all_state_instructions(self.mutator, 'thunderbolt', 'moonblast')
+
+        self.assertEqual(len(all_instructions) - len(likely_instructions), self.mutator.dropped_outcomes)
+        self.assertEqual(self.mutator.dropped_outcomes, record.counters['dropped_outcomes'])
+        self.assertAlmostEqual(
+            sum(i.percentage for i in all_instructions if i.percentage < 0.2),
+            self.mutator.dropped_outcome_percentage
+        )
+
+    def test_searching_does_not_change_the_state_hash(self):
+        user_options, opponent_options = self.state.get_all_options()
+        original_hash = self.mutator.state_hash
+        get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True, transposition_table=TranspositionTable(1000))
+
+        self.assertEqual(original_hash, self.mutator.state_hash)
+
+    def test_search_raises_timeout_error_when_deadline_has_passed(self):
+        user_options, opponent_options = self.state.get_all_options()
+        with self.assertRaises(SearchTimeoutError):
+            get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, deadline=0)
+
+    def test_state_is_unchanged_when_search_is_stopped_by_the_deadline(self):
+        user_options, opponent_options = self.state.get_all_options()
+        original_hash = self.mutator.state_hash
+        original_hp = self.state.opponent.active.hp
+
+        # the root node is allowed to start, the first child node raises the error
+        with mock.patch('showdown.engine.select_best_move.time.time', side_effect=[0, 10]):
+            with self.assertRaises(SearchTimeoutError):
+                get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, deadline=5)
+
+        self.assertEqual(original_hp, self.state.opponent.active.hp)
+        self.assertEqual(original_hash, self.mutator.state_hash)
+
+    def test_time_budgeted_search_returns_same_result_as_fixed_depth_search(self):
+        user_options, opponent_options = self.state.get_all_options()
+        expected_scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2)
+
+        scores, depth = search_with_time_budget(
+            lambda d, deadline: get_payoff_matrix(self.mutator, user_options, opponent_options, depth=d, deadline=deadline),
+            2,
+            1000
+        )
+
+        self.assertEqual(2, depth)
+        self.assertPayoffMatricesEqual(expected_scores, scores)
+
+    def test_merging_rows_searched_separately_is_identical_to_searching_all_rows(self):
+        user_options, opponent_options = self.state.get_all_options()
+        expected_scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True)
+
+        rows = {
+            user_option: get_payoff_matrix(self.mutator, [user_option], opponent_options, depth=2, prune=True)
+            for user_option in user_options
+        }
+        scores = merge_payoff_matrix_rows(rows, user_options, opponent_options, prune=True)
+
+        self.assertPayoffMatricesEqual(expected_scores, scores)
+        self.assertEqual(list(expected_scores), list(scores))
+
+    def test_chance_node_pruning_does_not_change_the_safest_move(self):
+        user_options, opponent_options = self.state.get_all_options()
+        scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True)
+
+        with mock.patch('showdown.engine.select_best_move.get_maximum_score', return_value=float('inf')):
+            expected_scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=2, prune=True)
+
+        self.assertEqual(pick_safest(expected_scores), pick_safest(scores))
+
+    def test_outcomes_of_the_returned_matrix_are_always_searched(self):
+        user_options, opponent_options = self.state.get_all_options()
+        expected_scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=1, prune=True)
+
+        # no outcome can score higher than this so every row after the first could stop after its first outcome
+        with mock.patch('showdown.engine.select_best_move.get_maximum_score', return_value=-10000):
+            scores = get_payoff_matrix(self.mutator, user_options, opponent_options, depth=1, prune=True)
+
+        self.assertPayoffMatricesEqual(expected_scores, scores)
+
+    def test_outcomes_below_the_returned_matrix_are_cut_once_a_row_cannot_reach_the_best_score(self):
+        user_options, opponent_options = self.state.get_all_options()
+        expected_scores = _get_cached_payoff_matrix(self.mutator, user_options, opponent_options, 1, True, False, None, None, None)
+
+        with mock.patch('showdown.engine.select_best_move.get_maximum_score', return_value=-10000):
+            scores = _get_cached_payoff_matrix(self.mutator, user_options, opponent_options, 1, True, True, None, None, None)
+
+        # a cut move combination is pruned and the entries that were searched are exact
+        cut_move_combinations = [k for k in scores if math.isnan(scores[k]) and not math.isnan(expected_scores[k])]
+        self.assertNotEqual([], cut_move_combinations)
+        self.assertEqual(
+            {k: v for k, v in expected_scores.items() if not math.isnan(scores[k])},
+            {k: v for k, v in scores.items() if not math.isnan(v)}
+        )
+
+
+class TestMergePayoffMatrixRows(unittest.TestCase):
+    def test_prune_is_replayed_using_best_score_from_previous_rows(self):
+        rows = {
+            'a': {('a', 'c'): 10, ('a', 'd'): 20},
+            'b': {('b', 'c'): 5, ('b', 'd'): 30},
+        }
+
+        scores = merge_payoff_matrix_rows(rows, ['a', 'b'], ['c', 'd'], prune=True)
+
+        self.assertEqual(10, scores[('a', 'c')])
+        self.assertEqual(20, scores[('a', 'd')])
+        self.assertEqual(5, scores[('b', 'c')])
+        self.assertTrue(math.isnan(scores[('b', 'd')]))
+
+    def test_rows_are_combined_without_pruning(self):
+        rows = {
+            'a': {('a', 'c'): 10, ('a', 'd'): 20},
+            'b': {('b', 'c'): 5, ('b', 'd'): 30},
+        }
+
+        scores = merge_payoff_matrix_rows(rows, ['a', 'b'], ['c', 'd'], prune=False)
+
+        self.assertEqual({('a', 'c'): 10, ('a', 'd'): 20, ('b', 'c'): 5, ('b', 'd'): 30}, scores)
+
+    def test_special_case_rows_are_combined(self):
+        rows = {
+            'a': {(constants.DO_NOTHING_MOVE, constants.DO_NOTHING_MOVE): 100},
+            'b': {(constants.DO_NOTHING_MOVE, constants.DO_NOTHING_MOVE): 100},
+        }
+
+        scores = merge_payoff_matrix_rows(rows, ['a', 'b'], ['c', 'd'], prune=True)
+
+        self.assertEqual({(constants.DO_NOTHING_MOVE, constants.DO_NOTHING_MOVE): 100}, scores)
+
+
+class TestSearchWithTimeBudget(unittest.TestCase):
+    def test_searches_until_max_depth_when_there_is_enough_time(self):
+        result, depth = search_with_time_budget(lambda d, deadline: d * 10, 4, 1000)
+
+        self.assertEqual((40, 4), (result, depth))
+
+    def test_returns_deepest_completed_search_when_time_runs_out(self):
+        def search_function(depth, deadline):
+            if depth == 3:
+                raise SearchTimeoutError()
+            return depth * 10
+
+        result, depth = search_with_time_budget(search_function, 5, 1000)
+
+        self.assertEqual((20, 2), (result, depth))
+
+    def test_depth_one_search_is_not_given_a_deadline(self):
+        deadlines = []
+
+        def search_function(depth, deadline):
+            deadlines.append(deadline)
+            return depth
+
+        search_with_time_budget(search_function, 2, 1000)
+
+        self.assertIsNone(deadlines[0])
+        self.assertIsNotNone(deadlines[1])
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        transposition_table = TranspositionTable(2)
+        transposition_table.put('a', 0, {})
+        transposition_table.put('b', 0, {})
+        transposition_table.get('a', 0)
+        transposition_table.put('c', 0, {})
+
+        self.assertIsNone(transposition_table.get('b', 0))
+        self.assertEqual({}, transposition_table.get('a', 0))
+        self.assertEqual(2, len(transposition_table))
+
+    def test_size_of_zero_does_not_store_anything(self):
+        transposition_table = TranspositionTable(0)
+        transposition_table.put('a', 0, {})
+
+        self.assertIsNone(transposition_table.get('a', 0))
+
+    def test_entry_with_a_different_verification_key_is_a_miss(self):
+        transposition_table = TranspositionTable(2)
+        transposition_table.put('a', 1, {})
+
+        self.assertIsNone(transposition_table.get('a', 2))
+        self.assertEqual(0, transposition_table.hits)
+        self.assertEqual(1, transposition_table.misses)
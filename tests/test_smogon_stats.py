@@ -0,0 +1,163 @@
+import os
+import json
+import shutil
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+from data import smogon_stats
+from data.smogon_stats import get_smogon_stats
+from data.smogon_stats import async_get_smogon_stats
+from data.smogon_stats import get_smogon_stats_source
+from data.smogon_stats import SmogonStatsDirectory
+from data.smogon_stats import SmogonStatsFile
+from data.smogon_stats import SmogonStatsWebsite
+from data.smogon_stats import SmogonStatsNotFoundError
+from data.helpers import combine_standard_battle_sets
+from data.parse_smogon_stats import MOVES_STRING
+from data.parse_smogon_stats import SPREADS_STRING
+from data.parse_smogon_stats import ITEM_STRING
+from data.parse_smogon_stats import ABILITY_STRING
+
+
+def get_chaos_stats(pkmn_name, move):
+    return {
+        "data": {
+            pkmn_name: {
+                "Raw count": 100,
+                "Spreads": {"Adamant:0/252/0/0/4/252": 75, "Jolly:0/252/0/0/4/252": 25},
+                "Items": {"Leftovers": 60, "Choice Band": 40},
+                "Moves": {move: 100, "": 10},
+                "Abilities": {"Intimidate": 100},
+                "Teammates": {"Landorus": 50},
+            }
+        }
+    }
+
+
+class TestSmogonStats(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+        bundle_directory_patch = mock.patch('data.bundle.BUNDLE_DIRECTORY', os.path.join(self.directory, 'bundles'))
+        bundle_directory_patch.start()
+        self.addCleanup(bundle_directory_patch.stop)
+
+        month_patch = mock.patch('data.smogon_stats.get_smogon_stats_month', side_effect=lambda delta: "2020-0{}".format(6 - delta))
+        month_patch.start()
+        self.addCleanup(month_patch.stop)
+
+        self.stats_directory = os.path.join(self.directory, 'stats')
+        smogon_stats._loaded_stats.clear()
+        self.addCleanup(smogon_stats._loaded_stats.clear)
+
+    def write_stats(self, path, stats):
+        path = os.path.join(self.stats_directory, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(stats, f)
+        return path
+
+    def test_stats_are_parsed_from_a_directory(self):
+        self.write_stats('2020-05/chaos/gen8ou-0.json', get_chaos_stats('Garchomp', 'Earthquake'))
+
+        stats = get_smogon_stats('gen8ou', source=SmogonStatsDirectory(self.stats_directory))
+
+        expected_stats = {
+            'garchomp': {
+                SPREADS_STRING: [['adamant', '0,252,0,0,4,252', 75.0], ['jolly', '0,252,0,0,4,252', 25.0]],
+                ITEM_STRING: [('Leftovers', 60.0), ('Choice Band', 40.0)],
+                MOVES_STRING: [('Earthquake', 100.0)],
+                ABILITY_STRING: [('Intimidate', 100.0)],
+            }
+        }
+        self.assertEqual(expected_stats, stats)
+
+    def test_previous_month_is_used_when_the_latest_month_is_missing(self):
+        self.write_stats('2020-04/chaos/gen8ou-0.json', get_chaos_stats('Garchomp', 'Earthquake'))
+
+        stats = get_smogon_stats('gen8ou', source=SmogonStatsDirectory(self.stats_directory))
+
+        self.assertIn('garchomp', stats)
+
+    def test_stats_for_every_month_are_used_from_the_top_of_a_directory(self):
+        self.write_stats('gen8ou-0.json', get_chaos_stats('Garchomp', 'Earthquake'))
+
+        stats = get_smogon_stats('gen8oublitz', source=SmogonStatsDirectory(self.stats_directory))
+
+        self.assertIn('garchomp', stats)
+
+    def test_a_single_file_is_used_for_every_format(self):
+        path = self.write_stats('stats.json', get_chaos_stats('Garchomp', 'Earthquake'))
+        source = get_smogon_stats_source(path)
+
+        self.assertIsInstance(source, SmogonStatsFile)
+        self.assertIn('garchomp', get_smogon_stats('gen8uu', source=source))
+
+    def test_missing_stats_raise_an_error(self):
+        with self.assertRaises(SmogonStatsNotFoundError):
+            get_smogon_stats('gen8ou', source=SmogonStatsDirectory(self.stats_directory))
+
+    def test_parsed_stats_are_saved_to_disk(self):
+        path = self.write_stats('2020-05/chaos/gen8ou-0.json', get_chaos_stats('Garchomp', 'Earthquake'))
+        stats = get_smogon_stats('gen8ou', source=SmogonStatsDirectory(self.stats_directory))
+
+        # a new process reads the saved stats instead of the source
+        os.remove(path)
+        smogon_stats._loaded_stats.clear()
+
+        self.assertEqual(stats, get_smogon_stats('gen8ou', source=SmogonStatsDirectory(self.stats_directory)))
+
+    def test_saved_stats_from_another_source_are_not_used(self):
+        self.write_stats('2020-05/chaos/gen8ou-0.json', get_chaos_stats('Garchomp', 'Earthquake'))
+        get_smogon_stats('gen8ou', source=SmogonStatsDirectory(self.stats_directory))
+
+        path = self.write_stats('stats.json', get_chaos_stats('Tyranitar', 'Crunch'))
+
+        self.assertIn('tyranitar', get_smogon_stats('gen8ou', source=SmogonStatsFile(path)))
+
+    def test_website_requests_the_chaos_stats_file(self):
+        response = mock.Mock(status_code=200)
+        response.json.return_value = get_chaos_stats('Garchomp', 'Earthquake')
+
+        with mock.patch('data.smogon_stats.requests.get', return_value=response) as get_mock:
+            stats = get_smogon_stats('gen8ou', source=get_smogon_stats_source())
+
+        get_mock.assert_called_once_with("https://www.smogon.com/stats/2020-05/chaos/gen8ou-0.json")
+        self.assertIn('garchomp', stats)
+
+    def test_website_returns_none_for_a_missing_file(self):
+        with mock.patch('data.smogon_stats.requests.get', return_value=mock.Mock(status_code=404)):
+            self.assertIsNone(SmogonStatsWebsite().fetch('gen8ou', '2020-05'))
+
+    def test_stats_for_several_formats_are_loaded_together(self):
+        self.write_stats('gen8ou-0.json', get_chaos_stats('Garchomp', 'Earthquake'))
+        self.write_stats('gen8uu-0.json', get_chaos_stats('Tyranitar', 'Crunch'))
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        ou_stats, uu_stats = loop.run_until_complete(
+            async_get_smogon_stats(['gen8ou', 'gen8uu'], source=SmogonStatsDirectory(self.stats_directory))
+        )
+
+        self.assertEqual(['garchomp'], list(ou_stats))
+        self.assertEqual(['tyranitar'], list(uu_stats))
+
+
+class TestCombineStandardBattleSets(unittest.TestCase):
+    def test_sets_come_from_the_first_mode_with_the_pokemon(self):
+        lc_stats = {'mienfoo': 'lc-mienfoo'}
+        ou_stats = {'mienfoo': 'ou-mienfoo', 'garchomp': 'ou-garchomp'}
+
+        sets = combine_standard_battle_sets([lc_stats, ou_stats])
+
+        self.assertEqual({'mienfoo': 'lc-mienfoo', 'garchomp': 'ou-garchomp'}, sets)
+
+    def test_only_pokemon_with_similar_names_are_kept(self):
+        stats = {'garchomp': 'garchomp', 'tyranitar': 'tyranitar', 'rotomwash': 'rotomwash'}
+
+        sets = combine_standard_battle_sets([stats], pokemon_names=['garchomp', 'rotom'])
+
+        self.assertEqual({'garchomp': 'garchomp', 'rotomwash': 'rotomwash'}, sets)
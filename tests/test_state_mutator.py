@@ -1,6 +1,8 @@
 import unittest
+from unittest import mock
 
 from collections import defaultdict
+import config
 import constants
 
 from showdown.battle import Pokemon as StatePokemon
@@ -8,6 +10,10 @@ from showdown.engine.objects import State
 from showdown.engine.objects import Side
 from showdown.engine.objects import Pokemon
 from showdown.engine.objects import StateMutator
+from showdown.engine.objects import compile_instructions
+from showdown.engine.objects import decompile_instructions
+from showdown.engine.evaluate import evaluate
+from showdown.engine.evaluate import IncrementalEvaluationError
 
 
 class TestStatemutator(unittest.TestCase):
@@ -860,3 +866,194 @@ class TestStatemutator(unittest.TestCase):
         self.assertEqual(3, self.state.self.active.special_attack)
         self.assertEqual(4, self.state.self.active.special_defense)
         self.assertEqual(5, self.state.self.active.speed)
+
+    def test_state_hash_is_unchanged_after_applying_and_reversing_instructions(self):
+        self.state.self.active.moves = [{constants.ID: 'tackle', constants.DISABLED: False}]
+        self.mutator.rehash()
+        original_hash = self.mutator.state_hash
+        instructions = [
+            (constants.MUTATOR_DAMAGE, constants.SELF, 10),
+            (constants.MUTATOR_BOOST, constants.OPPONENT, constants.ATTACK, 2),
+            (constants.MUTATOR_APPLY_STATUS, constants.SELF, constants.BURN),
+            (constants.MUTATOR_APPLY_VOLATILE_STATUS, constants.OPPONENT, constants.CONFUSION),
+            (constants.MUTATOR_SIDE_START, constants.SELF, constants.SPIKES, 1),
+            (constants.MUTATOR_WISH_START, constants.OPPONENT, 50, 0),
+            (constants.MUTATOR_WEATHER_START, constants.SUN, None),
+            (constants.MUTATOR_FIELD_START, constants.ELECTRIC_TERRAIN, None),
+            (constants.MUTATOR_TOGGLE_TRICKROOM,),
+            (constants.MUTATOR_DISABLE_MOVE, constants.SELF, 'tackle'),
+            (constants.MUTATOR_CHANGE_TYPE, constants.SELF, ['water'], ['electric']),
+            (constants.MUTATOR_CHANGE_ITEM, constants.OPPONENT, 'leftovers', self.state.opponent.active.item),
+            (constants.MUTATOR_CHANGE_STATS, constants.SELF, (1, 2, 3, 4, 5, 6), self.state.self.active.get_stats()),
+            (constants.MUTATOR_SWITCH, constants.SELF, "pikachu", "rattata"),
+        ]
+
+        self.mutator.apply(instructions)
+        self.assertNotEqual(original_hash, self.mutator.state_hash)
+
+        self.mutator.reverse(instructions)
+        self.assertEqual(original_hash, self.mutator.state_hash)
+
+    def test_states_that_only_differ_in_pp_have_different_hashes(self):
+        self.state.self.active.moves = [{constants.ID: 'tackle', constants.DISABLED: True, constants.CURRENT_PP: 16}]
+        self.mutator.rehash()
+        original_hash = self.mutator.state_hash
+
+        # a disabled move is only re-enabled on a switch if it has pp left
+        self.state.self.active.moves[0][constants.CURRENT_PP] = 0
+        self.mutator.rehash()
+
+        self.assertNotEqual(original_hash, self.mutator.state_hash)
+
+    def test_states_that_only_differ_in_a_boost_of_minus_one_and_minus_two_have_different_hashes(self):
+        # hash(-1) == hash(-2) so the state hash cannot be made from hash() of each value
+        self.mutator.state_hash  # start tracking the hash
+        self.mutator.apply([(constants.MUTATOR_UNBOOST, constants.SELF, constants.ATTACK, 1)])
+        minus_one_hash = self.mutator.state_hash
+        self.mutator.apply([(constants.MUTATOR_UNBOOST, constants.SELF, constants.ATTACK, 1)])
+        minus_two_hash = self.mutator.state_hash
+
+        self.assertNotEqual(minus_one_hash, minus_two_hash)
+        self.mutator.rehash()
+        self.assertEqual(minus_two_hash, self.mutator.state_hash)
+
+    def test_incremental_state_hash_matches_recalculated_hash(self):
+        instructions = [
+            (constants.MUTATOR_DAMAGE, constants.SELF, 10),
+            (constants.MUTATOR_SWITCH, constants.OPPONENT, "pikachu", "squirtle"),
+            (constants.MUTATOR_UNBOOST, constants.OPPONENT, constants.SPEED, 1),
+            (constants.MUTATOR_SIDE_START, constants.OPPONENT, constants.STEALTH_ROCK, 1),
+        ]
+        self.mutator.state_hash  # start tracking the hash
+        self.mutator.apply(instructions)
+
+        incremental_hash = self.mutator.state_hash
+        self.mutator.rehash()
+
+        self.assertEqual(self.mutator.state_hash, incremental_hash)
+
+    def test_different_move_orders_reaching_the_same_state_have_the_same_hash(self):
+        first_order = [
+            (constants.MUTATOR_DAMAGE, constants.SELF, 10),
+            (constants.MUTATOR_DAMAGE, constants.OPPONENT, 20),
+        ]
+        second_order = [
+            (constants.MUTATOR_DAMAGE, constants.OPPONENT, 15),
+            (constants.MUTATOR_DAMAGE, constants.SELF, 10),
+            (constants.MUTATOR_DAMAGE, constants.OPPONENT, 5),
+        ]
+
+        self.mutator.apply(first_order)
+        first_hash = self.mutator.state_hash
+        self.mutator.reverse(first_order)
+
+        self.mutator.apply(second_order)
+        second_hash = self.mutator.state_hash
+
+        self.assertEqual(first_hash, second_hash)
+
+    def get_one_of_each_instruction(self):
+        self.state.self.active.moves = [{constants.ID: 'tackle', constants.DISABLED: False}]
+        return [
+            (constants.MUTATOR_DAMAGE, constants.SELF, 10),
+            (constants.MUTATOR_HEAL, constants.OPPONENT, 5),
+            (constants.MUTATOR_BOOST, constants.OPPONENT, constants.ATTACK, 2),
+            (constants.MUTATOR_UNBOOST, constants.SELF, constants.SPEED, 1),
+            (constants.MUTATOR_APPLY_STATUS, constants.SELF, constants.BURN),
+            (constants.MUTATOR_REMOVE_STATUS, constants.SELF, constants.BURN),
+            (constants.MUTATOR_APPLY_VOLATILE_STATUS, constants.OPPONENT, constants.CONFUSION),
+            (constants.MUTATOR_REMOVE_VOLATILE_STATUS, constants.OPPONENT, constants.CONFUSION),
+            (constants.MUTATOR_SIDE_START, constants.SELF, constants.SPIKES, 1),
+            (constants.MUTATOR_SIDE_END, constants.SELF, constants.SPIKES, 1),
+            (constants.MUTATOR_WISH_START, constants.OPPONENT, 50, 0),
+            (constants.MUTATOR_WISH_DECREMENT, constants.OPPONENT),
+            (constants.MUTATOR_WEATHER_START, constants.SUN, None),
+            (constants.MUTATOR_FIELD_START, constants.ELECTRIC_TERRAIN, None),
+            (constants.MUTATOR_FIELD_END, constants.ELECTRIC_TERRAIN),
+            (constants.MUTATOR_TOGGLE_TRICKROOM,),
+            (constants.MUTATOR_DISABLE_MOVE, constants.SELF, 'tackle'),
+            (constants.MUTATOR_ENABLE_MOVE, constants.SELF, 'tackle'),
+            (constants.MUTATOR_CHANGE_TYPE, constants.SELF, ['water'], ['electric']),
+            (constants.MUTATOR_CHANGE_ITEM, constants.OPPONENT, 'leftovers', self.state.opponent.active.item),
+            (constants.MUTATOR_CHANGE_STATS, constants.SELF, (1, 2, 3, 4, 5, 6), self.state.self.active.get_stats()),
+            (constants.MUTATOR_SWITCH, constants.SELF, "pikachu", "rattata"),
+        ]
+
+    def test_decompiling_compiled_instructions_gives_the_original_instructions(self):
+        instructions = self.get_one_of_each_instruction()
+        self.assertEqual(instructions, decompile_instructions(compile_instructions(instructions)))
+
+    def test_compiled_instructions_use_integer_opcodes_and_side_indexes(self):
+        compiled_instructions = compile_instructions([
+            (constants.MUTATOR_DAMAGE, constants.OPPONENT, 10),
+            (constants.MUTATOR_BOOST, constants.SELF, constants.ATTACK, 1),
+        ])
+
+        for opcode, side_index, *_ in compiled_instructions:
+            self.assertIsInstance(opcode, int)
+            self.assertIsInstance(side_index, int)
+        self.assertEqual(1, compiled_instructions[0][1])
+        self.assertEqual(0, compiled_instructions[1][1])
+
+    def test_compiling_a_boost_of_an_invalid_stat_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            compile_instructions([(constants.MUTATOR_BOOST, constants.SELF, 'not_a_stat', 1)])
+
+    def test_applying_compiled_instructions_is_identical_to_applying_instructions(self):
+        instructions = self.get_one_of_each_instruction()
+        compiled_instructions = compile_instructions(instructions)
+        original_hash = self.mutator.state_hash
+
+        self.mutator.apply(instructions)
+        expected_state = str(self.state)
+        expected_hash = self.mutator.state_hash
+        self.mutator.reverse(instructions)
+
+        # switching changes the order of the reserve so this is compared instead of the state before applying
+        original_state = str(self.state)
+
+        self.mutator.apply_compiled(compiled_instructions)
+        self.assertEqual(expected_state, str(self.state))
+        self.assertEqual(expected_hash, self.mutator.state_hash)
+
+        self.mutator.reverse_compiled(compiled_instructions)
+        self.assertEqual(original_state, str(self.state))
+        self.assertEqual(original_hash, self.mutator.state_hash)
+
+    def test_evaluate_matches_evaluate_after_each_instruction(self):
+        self.mutator.evaluate()
+        for instruction in self.get_one_of_each_instruction():
+            self.mutator.apply_one(instruction)
+            self.assertEqual(evaluate(self.state), self.mutator.evaluate())
+
+    def test_evaluate_matches_evaluate_after_compiled_instructions_are_applied_and_reversed(self):
+        instructions = [
+            (constants.MUTATOR_DAMAGE, constants.OPPONENT, 100),
+            (constants.MUTATOR_BOOST, constants.SELF, constants.SPECIAL_ATTACK, 2),
+            (constants.MUTATOR_APPLY_VOLATILE_STATUS, constants.SELF, constants.SUBSTITUTE),
+            (constants.MUTATOR_SIDE_START, constants.OPPONENT, constants.STEALTH_ROCK, 1),
+            (constants.MUTATOR_SWITCH, constants.OPPONENT, "pikachu", "rattata"),
+        ]
+        compiled_instructions = compile_instructions(instructions)
+        original_score = self.mutator.evaluate()
+
+        self.mutator.apply_compiled(compiled_instructions)
+        self.assertEqual(evaluate(self.state), self.mutator.evaluate())
+
+        self.mutator.reverse_compiled(compiled_instructions)
+        self.assertEqual(original_score, self.mutator.evaluate())
+
+    def test_rehash_re_evaluates_a_state_modified_without_the_mutator(self):
+        self.mutator.evaluate()
+        self.state.self.active.hp = 0
+        self.mutator.rehash()
+
+        self.assertEqual(evaluate(self.state), self.mutator.evaluate())
+
+    def test_debug_evaluation_raises_error_when_the_state_is_modified_without_the_mutator(self):
+        self.mutator.evaluate()
+        self.state.self.active.hp = 0
+
+        with mock.patch.object(config, 'debug_incremental_evaluation', True):
+            with self.assertRaises(IncrementalEvaluationError):
+                self.mutator.evaluate()
@@ -0,0 +1,82 @@
+import json
+import asyncio
+import unittest
+from unittest import mock
+
+from showdown.websocket_client import get_battle_tag
+from showdown.websocket_client import MessageRouter
+
+
+class TestGetBattleTag(unittest.TestCase):
+    def test_gets_battle_tag_from_battle_message(self):
+        msg = ">battle-gen8randombattle-123\n|init|battle\n|title|user1 vs. user2"
+        self.assertEqual("battle-gen8randombattle-123", get_battle_tag(msg))
+
+    def test_returns_none_for_global_message(self):
+        msg = "|updatesearch|{\"searching\":[],\"games\":null}"
+        self.assertIsNone(get_battle_tag(msg))
+
+    def test_returns_none_for_non_battle_room(self):
+        msg = ">lobby\n|c|user1|hello"
+        self.assertIsNone(get_battle_tag(msg))
+
+    def test_gets_battle_tag_from_save_replay_response(self):
+        msg = "|queryresponse|savereplay|" + json.dumps({"log": "", "id": "gen8randombattle-123"})
+        self.assertEqual("battle-gen8randombattle-123", get_battle_tag(msg))
+
+
+class TestMessageRouter(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.ps_websocket_client = mock.Mock()
+        self.ps_websocket_client.username = "user1"
+        self.router = MessageRouter(self.ps_websocket_client)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def receive_all(self, connection):
+        messages = []
+        while not connection.messages.empty():
+            messages.append(self.loop.run_until_complete(connection.receive_message()))
+        return messages
+
+    def test_messages_are_routed_to_their_battle(self):
+        self.router.route_message(">battle-gen8randombattle-1\n|init|battle")
+        self.router.route_message(">battle-gen8randombattle-2\n|init|battle")
+        self.router.route_message(">battle-gen8randombattle-1\n|turn|1")
+
+        first = self.loop.run_until_complete(self.router.get_new_battle_connection())
+        second = self.loop.run_until_complete(self.router.get_new_battle_connection())
+
+        self.assertEqual("battle-gen8randombattle-1", first.battle_tag)
+        self.assertEqual("battle-gen8randombattle-2", second.battle_tag)
+        self.assertEqual([">battle-gen8randombattle-1\n|init|battle", ">battle-gen8randombattle-1\n|turn|1"], self.receive_all(first))
+        self.assertEqual([">battle-gen8randombattle-2\n|init|battle"], self.receive_all(second))
+
+    def test_global_messages_are_routed_to_the_global_connection(self):
+        self.router.route_message("|pm| user2| user1|/challenge gen8randombattle")
+        self.router.route_message(">battle-gen8randombattle-1\n|init|battle")
+
+        lobby = self.router.get_global_connection()
+
+        self.assertEqual(["|pm| user2| user1|/challenge gen8randombattle"], self.receive_all(lobby))
+
+    def test_messages_for_a_finished_battle_are_ignored(self):
+        self.router.route_message(">battle-gen8randombattle-1\n|init|battle")
+        self.router.finish_battle("battle-gen8randombattle-1")
+        self.router.route_message(">battle-gen8randombattle-1\n|deinit")
+
+        self.assertEqual(1, self.router.new_battles.qsize())
+        self.assertNotIn("battle-gen8randombattle-1", self.router.battle_messages)
+
+    def test_battle_connection_sends_with_the_shared_client(self):
+        self.ps_websocket_client.send_message = mock.Mock(return_value=asyncio.sleep(0))
+        self.router.route_message(">battle-gen8randombattle-1\n|init|battle")
+        connection = self.loop.run_until_complete(self.router.get_new_battle_connection())
+
+        self.loop.run_until_complete(connection.send_message(connection.battle_tag, ["/choose move 1"]))
+
+        self.ps_websocket_client.send_message.assert_called_once_with("battle-gen8randombattle-1", ["/choose move 1"])